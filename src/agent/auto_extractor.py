@@ -3,13 +3,21 @@
 """
 
 import os
-import json
+import gzip
+import time
+import hashlib
+import asyncio
 import argparse
 import logging
-from datetime import datetime
-from typing import Optional, Dict, Any
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
 from pathlib import Path
-import requests
+from urllib.parse import urlsplit
+import httpx
+import orjson
+from cachetools import TTLCache
+from src.filenames import URL_TRANS
 from src.logger import setup_logger
 from src.protections import ProtectionDetector
 from src.protections.strategy_handler import StrategyHandler
@@ -20,53 +28,147 @@ logger = setup_logger(__name__)
 class AutoExtractor:
     """Агент для автоматического обхода защит веб-сайтов."""
 
-    def __init__(self, db_path: str = "data/strategies.db"):
+    def __init__(
+        self,
+        db_path: str = "data/strategies.db",
+        result_sink: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ):
         """
         Инициализация авто-экстрактора.
 
         Args:
             db_path: путь к файлу базы данных SQLite
+            result_sink: приемник результатов (например, list.append или очередь
+                записи); если не задан, результаты сохраняются в файлы output/
         """
         self.detector = ProtectionDetector()
         self.handler = StrategyHandler(db_path)
+        self.result_sink = result_sink
+
+        # Общий асинхронный HTTP-клиент с пулом соединений
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=30,
+        )
+
+        # Кэш результатов проверки защиты по хосту и блокировки для single-flight
+        self._protection_cache = TTLCache(maxsize=1024, ttl=600)
+        self._protection_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
 
         # Создаем директорию для результатов
         self.output_dir = Path("output")
         self.output_dir.mkdir(exist_ok=True)
 
+        # Пул потоков для записи результатов, чтобы диск не блокировал event loop
+        self._write_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="result-writer")
+
         logger.info("Инициализирован AutoExtractor")
 
-    def _detect_protection(self, url: str) -> tuple[bool, Optional[str], Optional[List[str]]]:
+    async def __aenter__(self):
+        """Возвращает экстрактор при входе в контекст."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Освобождает ресурсы при выходе из контекста."""
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Закрывает HTTP-клиент и дожидается завершения записи результатов."""
+        await self.client.aclose()
+        self._write_pool.shutdown(wait=True)
+
+    async def _detect_protection(
+        self, url: str
+    ) -> tuple[bool, Optional[str], Optional[List[str]], Optional[httpx.Response]]:
         """
         Определяет наличие защиты на странице.
 
+        Результат кэшируется по хосту; при попадании в кэш ответ сервера
+        не запрашивается и возвращается как None.
+
         Args:
             url: URL для проверки
 
         Returns:
-            tuple: (найдена_защита, тип_защиты, признаки_защиты)
+            tuple: (найдена_защита, тип_защиты, признаки_защиты, ответ_сервера)
         """
-        try:
-            # Пробуем сделать обычный запрос
-            response = requests.get(url, timeout=30)
+        host = urlsplit(url).netloc
+        if host in self._protection_cache:
+            return (*self._protection_cache[host], None)
 
-            # Проверяем признаки защиты
-            protection_type, protection_signs = self.detector.detect_protection(response)
+        async with self._protection_locks[host]:
+            if host in self._protection_cache:
+                return (*self._protection_cache[host], None)
 
-            if protection_type:
-                logger.info(f"Обнаружена защита {protection_type} на {url}")
-                return True, protection_type, protection_signs
-            else:
-                logger.info(f"Защита не обнаружена на {url}")
-                return False, None, None
+            try:
+                # Пробуем сделать обычный запрос
+                response = await self.client.get(url)
+
+                # Проверяем признаки защиты
+                protection_type, protection_signs = self.detector.detect_protection(response)
+
+                if protection_type:
+                    logger.info(f"Обнаружена защита {protection_type} на {url}")
+                    result = (True, protection_type, protection_signs)
+                else:
+                    logger.info(f"Защита не обнаружена на {url}")
+                    result = (False, None, None)
+
+                self._protection_cache[host] = result
+                # Блокировка нужна только до заполнения кэша; ожидающие ее запросы
+                # держат свою ссылку и после пробуждения найдут результат в кэше
+                self._protection_locks.pop(host, None)
+                return (*result, response)
+
+            except httpx.HTTPError as e:
+                logger.error(f"Ошибка при проверке защиты на {url}: {str(e)}")
+                return True, "unknown", ["request_error"], None
+
+    def _store_html(self, html: str) -> tuple[str, Path]:
+        """
+        Сохраняет HTML в сжатый файл, адресуемый по содержимому.
+
+        Одинаковые страницы записываются на диск только один раз.
+
+        Args:
+            html: HTML страницы
+
+        Returns:
+            tuple: (sha256 содержимого, путь к файлу)
+        """
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        html_path = self.output_dir / f"{digest}.html.gz"
 
-        except requests.RequestException as e:
-            logger.error(f"Ошибка при проверке защиты на {url}: {str(e)}")
-            return True, "unknown", ["request_error"]
+        if not html_path.exists():
+            with gzip.open(html_path, "wb", compresslevel=1) as f:
+                f.write(data)
 
-    def _save_result(self, url: str, html: str, status: str, strategy: Optional[str] = None) -> str:
+        return digest, html_path
+
+    def _write_result(self, filepath: Path, data: Dict[str, Any], html: str) -> None:
+        """
+        Записывает HTML и JSON результата на диск (выполняется в пуле потоков).
+
+        Args:
+            filepath: путь к JSON-файлу результата
+            data: данные результата без HTML
+            html: полученный HTML
+        """
+        # HTML храним отдельным файлом, в JSON оставляем только ссылку на него
+        html_sha256, html_path = self._store_html(html) if html else (None, None)
+        data["html_sha256"] = html_sha256
+        data["html_path"] = str(html_path) if html_path else None
+
+        # Сохраняем в JSON одной записью
+        filepath.write_bytes(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+
+    async def _save_result(
+        self, url: str, html: str, status: str, strategy: Optional[str] = None
+    ) -> str:
         """
-        Сохраняет результат в файл.
+        Сохраняет результат в файл или передает его в result_sink.
 
         Args:
             url: URL страницы
@@ -75,11 +177,11 @@ class AutoExtractor:
             strategy: примененная стратегия
 
         Returns:
-            str: путь к сохраненному файлу
+            str: путь к сохраненному файлу (для result_sink — идентификатор вида "sink:<имя файла>")
         """
         # Создаем имя файла из URL и timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{url.replace('://', '_').replace('/', '_')}_{timestamp}.json"
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        filename = f"{url.translate(URL_TRANS)}_{timestamp}.json"
         filepath = self.output_dir / filename
 
         # Формируем данные для сохранения
@@ -88,17 +190,19 @@ class AutoExtractor:
             "timestamp": timestamp,
             "status": status,
             "strategy": strategy,
-            "html": html,
         }
 
-        # Сохраняем в JSON
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if self.result_sink is not None:
+            self.result_sink({**data, "html": html})
+            return f"sink:{filename}"
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._write_pool, self._write_result, filepath, data, html)
 
         logger.info(f"Результат сохранен в {filepath}")
         return str(filepath)
 
-    def run_agent(self, url: str, **kwargs) -> Dict[str, Any]:
+    async def run_agent(self, url: str, **kwargs) -> Dict[str, Any]:
         """
         Запускает агента для обработки URL.
 
@@ -112,24 +216,30 @@ class AutoExtractor:
         logger.info(f"Запуск агента для {url}")
 
         # Проверяем защиту
-        has_protection, protection_type, protection_signs = self._detect_protection(url)
+        has_protection, protection_type, protection_signs, response = await self._detect_protection(
+            url
+        )
 
         if not has_protection:
-            # Если защиты нет, просто получаем HTML
+            # Если защиты нет, используем уже полученный ответ
             try:
-                response = requests.get(url, timeout=30)
+                if response is None:
+                    response = await self.client.get(url)
                 response.raise_for_status()
                 html = response.text
                 status = "success"
                 strategy = None
-            except requests.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.error(f"Ошибка при получении HTML с {url}: {str(e)}")
                 html = ""
                 status = "error"
                 strategy = None
         else:
-            # Если защита есть, пробуем стратегии
-            html = self.handler.try_strategies(protection_type, protection_signs, url, **kwargs)
+            # Если защита есть, пробуем стратегии в отдельном потоке,
+            # чтобы синхронные обходчики не блокировали event loop
+            html = await asyncio.to_thread(
+                self.handler.try_strategies, protection_type, protection_signs, url, **kwargs
+            )
 
             if html:
                 status = "success"
@@ -139,7 +249,7 @@ class AutoExtractor:
                 strategy = None
 
         # Сохраняем результат
-        output_file = self._save_result(url, html, status, strategy)
+        output_file = await self._save_result(url, html, status, strategy)
 
         return {
             "url": url,
@@ -151,6 +261,28 @@ class AutoExtractor:
         }
 
 
+def load_result(path: str) -> Dict[str, Any]:
+    """
+    Загружает сохраненный результат вместе с HTML из связанного файла.
+
+    Args:
+        path: путь к JSON-файлу результата
+
+    Returns:
+        Dict: данные результата с полем html
+    """
+    data = orjson.loads(Path(path).read_bytes())
+
+    html_path = data.get("html_path")
+    if html_path:
+        with gzip.open(html_path, "rt", encoding="utf-8") as f:
+            data["html"] = f.read()
+    else:
+        data["html"] = ""
+
+    return data
+
+
 def main():
     """Точка входа для CLI."""
     parser = argparse.ArgumentParser(description="Авто-экстрактор для обхода защит веб-сайтов")
@@ -159,8 +291,11 @@ def main():
 
     args = parser.parse_args()
 
-    extractor = AutoExtractor(args.db)
-    result = extractor.run_agent(args.url)
+    async def run() -> Dict[str, Any]:
+        async with AutoExtractor(args.db) as extractor:
+            return await extractor.run_agent(args.url)
+
+    result = asyncio.run(run())
 
     print(f"Результат обработки {args.url}:")
     print(f"Статус: {result['status']}")
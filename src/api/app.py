@@ -2,15 +2,33 @@
 FastAPI приложение для предоставления API к авто-экстрактору.
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, List, Dict, Any
+from fastapi.responses import ORJSONResponse
+from pydantic import AfterValidator, BaseModel, ConfigDict
+from typing import Annotated, Optional, List, Dict, Any
+import importlib.util
+import os
+import time
+import uuid
 import logging
+import uvicorn
+from collections import Counter
 from datetime import datetime
+from cachetools import TTLCache
 from src.agent.auto_extractor import AutoExtractor
 from src.logger import setup_logger
 
+try:
+    import uvloop
+except ImportError:  # uvloop доступен только на POSIX-системах
+    uvloop = None
+else:
+    uvloop.install()
+
+# Без httptools Uvicorn сам выбирает доступный HTTP-парсер
+_HTTPTOOLS = importlib.util.find_spec("httptools") is not None
+
 # Настройка логгера
 logger = setup_logger(__name__)
 
@@ -19,6 +37,7 @@ app = FastAPI(
     title="Web Protection Bypass API",
     description="API для автоматического обхода защит веб-сайтов",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Настройка CORS
@@ -31,17 +50,32 @@ app.add_middleware(
 )
 
 
+def _check_url(url: str) -> str:
+    """Проверяет, что URL использует схему http или https."""
+    if not url.startswith(("http://", "https://")):
+        raise ValueError("URL должен начинаться с http:// или https://")
+    return url
+
+
+# URL хранится строкой: полный разбор HttpUrl не нужен, т.к. дальше URL используется как str
+Url = Annotated[str, AfterValidator(_check_url)]
+
+
 # Модели данных
 class ExtractionRequest(BaseModel):
     """Модель запроса на извлечение."""
 
-    url: HttpUrl
+    model_config = ConfigDict(defer_build=True, str_strip_whitespace=True)
+
+    url: Url
     options: Optional[Dict[str, Any]] = None
 
 
 class ExtractionResponse(BaseModel):
     """Модель ответа на запрос извлечения."""
 
+    model_config = ConfigDict(defer_build=True)
+
     status: str
     url: str
     strategy_used: Optional[str] = None
@@ -56,81 +90,290 @@ class ExtractionResponse(BaseModel):
 class ErrorResponse(BaseModel):
     """Модель ответа с ошибкой."""
 
+    model_config = ConfigDict(defer_build=True)
+
     status: str
     error: str
     timestamp: str
 
 
+class TaskResponse(BaseModel):
+    """Модель ответа со статусом фоновой задачи извлечения."""
+
+    model_config = ConfigDict(defer_build=True)
+
+    task_id: str
+    status: str
+    timestamp: str
+    result: Optional[ExtractionResponse] = None
+    error: Optional[str] = None
+
+
+class HealthResponse(BaseModel):
+    """Модель ответа проверки работоспособности."""
+
+    model_config = ConfigDict(defer_build=True)
+
+    status: str
+    timestamp: str
+
+
+class StatsResponse(BaseModel):
+    """Модель ответа со статистикой работы API."""
+
+    model_config = ConfigDict(defer_build=True)
+
+    status: str
+    timestamp: str
+    total_requests: int
+    success_rate: float
+    most_common_protection: Optional[str] = None
+
+
 # Создаем экземпляр экстрактора
 extractor = AutoExtractor()
 
+# Счетчики запросов на извлечение и обнаруженных защит
+request_stats = {"total": 0, "success": 0}
+protection_stats: Counter = Counter()
+
+# Метка времени с точностью до секунды, пересчитывается не чаще раза в секунду
+_now_cache = {"second": 0, "iso": ""}
+
+
+def _now_iso() -> str:
+    """Возвращает текущее время в ISO-формате, кэшируя его на одну секунду."""
+    second = int(time.time())
+    if second != _now_cache["second"]:
+        _now_cache["second"] = second
+        _now_cache["iso"] = datetime.fromtimestamp(second).isoformat()
+    return _now_cache["iso"]
+
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    """
+    Считает синхронные запросы на извлечение и их успешность для /stats.
+
+    Запросы, не прошедшие валидацию (422), извлечением не являются; фоновые задачи
+    /extract/async учитываются по завершении в _run_extraction_task.
+    """
+    response = await call_next(request)
+    if request.method == "POST" and request.url.path == "/extract" and response.status_code != 422:
+        request_stats["total"] += 1
+        if response.status_code < 400:
+            request_stats["success"] += 1
+    return response
+
+
+# Хранилище состояний фоновых задач извлечения: задача хранится TASK_TTL секунд
+# после создания и повторно столько же после завершения, не более MAX_TASKS задач
+MAX_TASKS = 10_000
+TASK_TTL = 3600
+tasks: "TTLCache[str, Dict[str, Any]]" = TTLCache(maxsize=MAX_TASKS, ttl=TASK_TTL)
+
+
+def _build_response(url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Формирует ответ API из результата работы агента.
+
+    Args:
+        url: URL страницы
+        result: результат работы агента
+
+    Returns:
+        Dict: данные для ExtractionResponse
+    """
+    return {
+        "status": "success",
+        "url": url,
+        "strategy_used": result.get("strategy"),
+        "html_snippet": result.get("html", "")[:500] if result.get("html") else None,
+        "has_protection": result.get("has_protection"),
+        "protection_type": result.get("protection_type"),
+        "output_file": result.get("output_file"),
+        "timestamp": datetime.now().isoformat(),
+        "log": [],  # Здесь можно добавить логи из экстрактора
+    }
+
 
-@app.post("/extract", response_model=ExtractionResponse, responses={500: {"model": ErrorResponse}})
-async def extract(request: ExtractionRequest, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+async def _run_extraction_task(task: Dict[str, Any], url: str, options: Dict[str, Any]) -> None:
+    """
+    Выполняет извлечение в фоне и сохраняет результат в хранилище задач.
+
+    Запись задачи могла быть вытеснена из кэша, пока задача ждала или выполнялась,
+    поэтому обновляется переданный словарь, а по завершении он кладется в кэш заново.
+
+    Args:
+        task: запись задачи из хранилища
+        url: URL для обработки
+        options: дополнительные параметры агента
+    """
+    task_id = task["task_id"]
+    task["status"] = "running"
+    try:
+        result = await extractor.run_agent(url, **options)
+        if result.get("protection_type"):
+            protection_stats[result["protection_type"]] += 1
+        task.update({"status": "success", "result": _build_response(url, result)})
+        request_stats["success"] += 1
+        logger.info(f"Фоновая задача {task_id} завершена: {url}")
+    except Exception as e:
+        logger.error(f"Ошибка фоновой задачи {task_id} для {url}: {str(e)}")
+        task.update({"status": "error", "error": str(e)})
+    request_stats["total"] += 1
+    task["timestamp"] = datetime.now().isoformat()
+    tasks[task_id] = task
+
+
+@app.on_event("shutdown")
+async def shutdown_extractor() -> None:
+    """Освобождает ресурсы экстрактора при остановке приложения."""
+    await extractor.aclose()
+
+
+@app.post(
+    "/extract",
+    response_model=None,
+    responses={200: {"model": ExtractionResponse}, 500: {"model": ErrorResponse}},
+)
+async def extract(request: ExtractionRequest, background_tasks: BackgroundTasks) -> ORJSONResponse:
     """
     Извлекает содержимое веб-страницы, обходя защиту при необходимости.
 
+    Ответ собирается вручную и отдается без повторной валидации через response_model;
+    модель ExtractionResponse используется только для документации OpenAPI.
+
     Args:
         request: запрос на извлечение
         background_tasks: задачи для выполнения в фоне
 
     Returns:
-        Dict: результат извлечения
+        ORJSONResponse: результат извлечения
     """
     try:
         logger.info(f"Получен запрос на извлечение: {request.url}")
 
         # Запускаем экстрактор
-        result = extractor.run_agent(str(request.url), **(request.options or {}))
+        result = await extractor.run_agent(request.url, **(request.options or {}))
+        if result.get("protection_type"):
+            protection_stats[result["protection_type"]] += 1
 
         # Формируем ответ
-        response = {
-            "status": "success",
-            "url": str(request.url),
-            "strategy_used": result.get("strategy"),
-            "html_snippet": result.get("html", "")[:500] if result.get("html") else None,
-            "has_protection": result.get("has_protection"),
-            "protection_type": result.get("protection_type"),
-            "output_file": result.get("output_file"),
-            "timestamp": datetime.now().isoformat(),
-            "log": [],  # Здесь можно добавить логи из экстрактора
-        }
+        response = _build_response(request.url, result)
 
         logger.info(f"Успешно обработан запрос: {request.url}")
-        return response
+        return ORJSONResponse(response)
 
     except Exception as e:
         logger.error(f"Ошибка при обработке запроса {request.url}: {str(e)}")
+        return ORJSONResponse(
+            {"status": "error", "error": str(e), "timestamp": _now_iso()}, status_code=500
+        )
+
+
+@app.post("/extract/async", response_model=TaskResponse, status_code=202)
+async def extract_async(
+    request: ExtractionRequest, background_tasks: BackgroundTasks
+) -> Dict[str, Any]:
+    """
+    Ставит извлечение в очередь фоновых задач и сразу возвращает ID задачи.
+
+    Args:
+        request: запрос на извлечение
+        background_tasks: задачи для выполнения в фоне
+
+    Returns:
+        Dict: идентификатор и статус задачи
+    """
+    task_id = uuid.uuid4().hex
+    task = tasks[task_id] = {
+        "task_id": task_id,
+        "status": "pending",
+        "timestamp": datetime.now().isoformat(),
+    }
+    background_tasks.add_task(_run_extraction_task, task, request.url, request.options or {})
+
+    logger.info(f"Создана фоновая задача {task_id} для {request.url}")
+    return task
+
+
+@app.get(
+    "/extract/{task_id}", response_model=TaskResponse, responses={404: {"model": ErrorResponse}}
+)
+async def get_extract_task(task_id: str) -> Dict[str, Any]:
+    """
+    Возвращает состояние фоновой задачи извлечения.
+
+    Args:
+        task_id: идентификатор задачи
+
+    Returns:
+        Dict: статус и результат задачи
+    """
+    task = tasks.get(task_id)
+    if task is None:
         raise HTTPException(
-            status_code=500,
-            detail={"status": "error", "error": str(e), "timestamp": datetime.now().isoformat()},
+            status_code=404,
+            detail={
+                "status": "error",
+                "error": f"Задача {task_id} не найдена",
+                "timestamp": datetime.now().isoformat(),
+            },
         )
+    return task
 
 
-@app.get("/health")
-async def health_check() -> Dict[str, str]:
+@app.get("/health", response_model=HealthResponse)
+async def health_check() -> ORJSONResponse:
     """
     Проверка работоспособности API.
 
     Returns:
-        Dict: статус API
+        ORJSONResponse: статус API
     """
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+    return ORJSONResponse({"status": "ok", "timestamp": _now_iso()})
 
 
-@app.get("/stats")
-async def get_stats() -> Dict[str, Any]:
+@app.get("/stats", response_model=StatsResponse)
+async def get_stats() -> ORJSONResponse:
     """
     Получение статистики работы API.
 
     Returns:
-        Dict: статистика
+        ORJSONResponse: статистика
     """
-    # Здесь можно добавить сбор статистики
-    return {
-        "status": "ok",
-        "timestamp": datetime.now().isoformat(),
-        "total_requests": 0,  # TODO: добавить счетчик запросов
-        "success_rate": 0.0,  # TODO: добавить расчет успешности
-        "most_common_protection": None,  # TODO: добавить статистику по защитам
-    }
+    total = request_stats["total"]
+    most_common = protection_stats.most_common(1)
+    return ORJSONResponse(
+        {
+            "status": "ok",
+            "timestamp": _now_iso(),
+            "total_requests": total,
+            "success_rate": request_stats["success"] / total if total else 0.0,
+            "most_common_protection": most_common[0][0] if most_common else None,
+        }
+    )
+
+
+def main():
+    """
+    Запускает API под Uvicorn с uvloop и httptools, если они установлены.
+
+    Хранилище задач и статистика /stats живут в памяти процесса, поэтому по
+    умолчанию запускается один воркер: с несколькими воркерами опрос задачи мог бы
+    попасть в другой процесс и получить 404. API_WORKERS стоит увеличивать только
+    после переноса этого состояния в общее хранилище.
+    """
+    uvicorn.run(
+        "src.api.app:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=int(os.getenv("API_WORKERS", "1")),
+        loop="uvloop" if uvloop else "asyncio",
+        http="httptools" if _HTTPTOOLS else "auto",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,30 +2,100 @@
 Модуль для автоматического извлечения данных с учетом защиты.
 """
 
+import re
 import asyncio
 import aiohttp
-from typing import Dict, Optional
-from src.protections.strategy_selector import StrategySelector
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from cachetools import TTLCache
+from src.protections.strategy_selector import get_selector
 from src.evaluation.ab_tester import ABTester
 from src.logger import logger
 
+# Заголовки запроса по умолчанию; копия создается только при замене User-Agent
+_DEFAULT_HEADERS = MappingProxyType(
+    {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+        "Accept-Language": "ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3",
+        "Connection": "keep-alive",
+        "Upgrade-Insecure-Requests": "1",
+    }
+)
+
+# Признаки защит ищутся в начале страницы, баннеры всегда находятся в <head>
+PROTECTION_SCAN_BYTES = 64 * 1024
+
+PROTECTION_RE = re.compile(rb"cloudflare|ddos-guard|recaptcha", re.I)
+
+# Признак -> тип защиты, в порядке приоритета
+PROTECTION_MARKERS = {
+    b"cloudflare": "cloudflare",
+    b"ddos-guard": "ddos_guard",
+    b"recaptcha": "recaptcha",
+}
+
+
+async def _read_head(response: aiohttp.ClientResponse) -> bytes:
+    """
+    Читает первые PROTECTION_SCAN_BYTES байт тела ответа.
+
+    StreamReader.read(n) возвращает то, что уже пришло в буфер, поэтому чтение
+    повторяется до лимита или конца тела.
+
+    Args:
+        response: ответ aiohttp
+
+    Returns:
+        bytes: начало тела ответа
+    """
+    parts = []
+    remaining = PROTECTION_SCAN_BYTES
+    while remaining > 0:
+        part = await response.content.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b"".join(parts)
+
 
 class AutoExtractor:
     """Класс для автоматического извлечения данных."""
 
     def __init__(self):
         """Инициализация экстрактора."""
-        self.selector = StrategySelector()
+        self.selector = get_selector()
         self.tester = ABTester()
         self.session = None
 
+        # Кэш типов защиты по хосту и блокировки для single-flight
+        self._protection_cache = TTLCache(maxsize=1024, ttl=600)
+        self._protection_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+        # Запросы на выбор стратегии, накопленные за одну итерацию цикла событий:
+        # их предсказания выполняются одним вызовом модели
+        self._pending_selections: List[Tuple[str, Dict, asyncio.Future]] = []
+
     async def __aenter__(self):
-        """Создает сессию при входе в контекст."""
-        self.session = aiohttp.ClientSession()
+        """Создает сессию с пулом keep-alive соединений при входе в контекст."""
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=16,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True,
+            ),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Закрывает сессию при выходе из контекста."""
+        """Закрывает сессию и сбрасывает буфер A/B тестера при выходе из контекста."""
+        self.tester.flush()
         if self.session:
             await self.session.close()
 
@@ -48,9 +118,7 @@ class AutoExtractor:
             context = {"url": url, "protection_type": protection_type, "options": options or {}}
 
             # Выбираем стратегию через A/B тестер
-            strategy_name, method = self.tester.select_strategy(
-                protection_type=protection_type, context=context
-            )
+            strategy_name, method = await self._select_strategy(protection_type, context)
 
             # Применяем стратегию
             start_time = asyncio.get_event_loop().time()
@@ -78,9 +146,46 @@ class AutoExtractor:
             logger.error(f"Ошибка извлечения данных: {e}")
             return {"success": False, "error": str(e)}
 
+    async def _select_strategy(self, protection_type: str, context: Dict) -> Tuple[str, str]:
+        """
+        Ставит выбор стратегии в очередь и ждет его результата.
+
+        Запросы от одновременно обрабатываемых URL собираются до конца текущей
+        итерации цикла событий и передаются A/B тестеру одной пачкой.
+
+        Args:
+            protection_type: Тип защиты
+            context: Контекст запроса
+
+        Returns:
+            Tuple[str, str]: (название стратегии, метод выбора)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending_selections:
+            loop.call_soon(self._drain_selections)
+        self._pending_selections.append((protection_type, context, future))
+        return await future
+
+    def _drain_selections(self) -> None:
+        """Выбирает стратегии для всех накопленных запросов одним вызовом A/B тестера."""
+        pending, self._pending_selections = self._pending_selections, []
+        try:
+            results = self.tester.select_strategies(
+                [(protection_type, context) for protection_type, context, _ in pending]
+            )
+        except Exception as e:
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
     async def _detect_protection(self, url: str) -> str:
         """
-        Определяет тип защиты.
+        Определяет тип защиты с кэшированием результата по хосту.
 
         Args:
             url: URL для проверки
@@ -88,28 +193,52 @@ class AutoExtractor:
         Returns:
             str: Тип защиты
         """
-        try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
+        host = urlsplit(url).netloc
+        if host in self._protection_cache:
+            return self._protection_cache[host]
+
+        async with self._protection_locks[host]:
+            if host in self._protection_cache:
+                return self._protection_cache[host]
+
+            protection_type = await self._probe_protection(url)
+            if protection_type is None:
+                # Сетевая ошибка не кэшируется: следующий запрос к хосту проверит его заново
+                return "unknown"
+
+            self._protection_cache[host] = protection_type
+            # Блокировка нужна только до заполнения кэша; ожидающие ее запросы
+            # держат свою ссылку и после пробуждения найдут результат в кэше
+            self._protection_locks.pop(host, None)
+            return protection_type
+
+    async def _probe_protection(self, url: str) -> Optional[str]:
+        """
+        Запрашивает страницу и определяет тип защиты.
 
+        Args:
+            url: URL для проверки
+
+        Returns:
+            Optional[str]: Тип защиты или None, если запрос не удался
+        """
+        try:
             async with self.session.get(url) as response:
-                html = await response.text()
-
-                # Проверяем признаки различных защит
-                if "cloudflare" in html.lower():
-                    return "cloudflare"
-                elif "ddos-guard" in html.lower():
-                    return "ddos_guard"
-                elif "recaptcha" in html.lower():
-                    return "recaptcha"
-                elif response.status == 403:
+                chunk = await _read_head(response)
+
+                # Проверяем признаки различных защит за один проход
+                found = {match.lower() for match in PROTECTION_RE.findall(chunk)}
+                for marker, protection_type in PROTECTION_MARKERS.items():
+                    if marker in found:
+                        return protection_type
+
+                if response.status == 403:
                     return "ip_block"
-                else:
-                    return "unknown"
+                return "unknown"
 
         except Exception as e:
             logger.error(f"Ошибка определения защиты: {e}")
-            return "unknown"
+            return None
 
     async def _apply_strategy(
         self, strategy_name: str, url: str, options: Optional[Dict] = None
@@ -126,25 +255,19 @@ class AutoExtractor:
             Dict: Результат применения
         """
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
+            options = options or {}
 
             # Формируем заголовки
-            headers = {
-                "User-Agent": options.get(
-                    "user_agent",
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                ),
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-            }
+            user_agent = options.get("user_agent")
+            headers = (
+                _DEFAULT_HEADERS
+                if user_agent is None
+                else {**_DEFAULT_HEADERS, "User-Agent": user_agent}
+            )
 
             # Пробуем получить страницу
-            async with self.session.get(
-                url, headers=headers, timeout=options.get("timeout", 30)
-            ) as response:
+            timeout = aiohttp.ClientTimeout(total=options.get("timeout", 30))
+            async with self.session.get(url, headers=headers, timeout=timeout) as response:
                 if response.status == 200:
                     html = await response.text()
                     return {
@@ -10,35 +10,42 @@ from src.logger import logger
 from typing import List
 
 
-async def analyze_site(url: str, output_dir: str) -> None:
+async def analyze_site(
+    analyzer: EnhancedSiteAnalyzer, url: str, include_request_log: bool = False
+) -> None:
     """
     Анализирует сайт и сохраняет результаты.
 
     Args:
+        analyzer: Открытый анализатор с пулом страниц
         url: URL для анализа
-        output_dir: Директория для сохранения результатов
+        include_request_log: Сохранять лог запросов страницы
     """
     try:
-        async with EnhancedSiteAnalyzer(output_dir) as analyzer:
-            result = await analyzer.analyze(url)
-            logger.info(f"Анализ {url} завершен успешно")
-            logger.info(f"Найдено {len(result['categories'])} категорий")
-            logger.info(f"Найдено {len(result['products'])} продуктов")
-            logger.info(f"Найдено {len(result['links'])} ссылок")
+        result = await analyzer.analyze(url, include_request_log=include_request_log)
+        logger.info(f"Анализ {url} завершен успешно")
+        logger.info(f"Найдено {len(result['categories'])} категорий")
+        logger.info(f"Найдено {len(result['products'])} продуктов")
+        logger.info(f"Найдено {len(result['links'])} ссылок")
     except Exception as e:
         logger.error(f"Ошибка при анализе {url}: {e}")
 
 
-async def analyze_multiple_sites(urls: List[str], output_dir: str) -> None:
+async def analyze_multiple_sites(
+    urls: List[str], output_dir: str, include_request_log: bool = False
+) -> None:
     """
     Анализирует несколько сайтов параллельно.
 
     Args:
         urls: Список URL для анализа
         output_dir: Директория для сохранения результатов
+        include_request_log: Сохранять лог запросов страниц
     """
-    tasks = [analyze_site(url, output_dir) for url in urls]
-    await asyncio.gather(*tasks)
+    # Один браузер и пул страниц на все сайты
+    async with EnhancedSiteAnalyzer(output_dir, pool_size=min(len(urls), 8)) as analyzer:
+        tasks = [analyze_site(analyzer, url, include_request_log) for url in urls]
+        await asyncio.gather(*tasks)
 
 
 def main():
@@ -49,6 +56,9 @@ def main():
         "--output-dir", "-o", default="data", help="Директория для сохранения результатов"
     )
     parser.add_argument("--verbose", "-v", action="store_true", help="Подробный вывод")
+    parser.add_argument(
+        "--request-log", action="store_true", help="Сохранять лог запросов страницы"
+    )
 
     args = parser.parse_args()
 
@@ -63,7 +73,7 @@ def main():
         logger.setLevel("INFO")
 
     # Запускаем анализ
-    asyncio.run(analyze_multiple_sites(args.urls, str(output_dir)))
+    asyncio.run(analyze_multiple_sites(args.urls, str(output_dir), args.request_log))
 
 
 if __name__ == "__main__":
@@ -2,86 +2,182 @@
 Модуль для анализа структуры веб-сайтов и извлечения данных.
 """
 
+import re
+import time
 import asyncio
-import json
+import functools
+import orjson
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union
-from playwright.async_api import async_playwright, Browser, Page
+from typing import Deque, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+from cachetools import TTLCache
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import Error as PlaywrightError
+from selectolax.parser import HTMLParser, Node
+from src.filenames import URL_TRANS
 from src.logger import logger
 
+# Максимальное количество запросов в логе одного анализа
+REQUEST_LOG_MAXLEN = 2000
+
+# Признаки страниц, которые без выполнения JavaScript не содержат контента
+_JS_REQUIRED_RE = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt)[\"'][^>]*>\s*</div>"
+    r"|__NEXT_DATA__|window\.__NUXT__|cf-browser-verification|challenge-platform",
+    re.I,
+)
+
+# Минимальный объем видимого текста, при котором страница считается отрендеренной
+_MIN_STATIC_TEXT = 200
+
+# Таблица разделов страницы: (ключ, селектор, множественный, поля).
+# Поле задается как (вид, подселектор): вид "text", "html" или "href"; если подселектор
+# указан, значение берется из первого вложенного элемента, а при его отсутствии равно "".
+# Раздел без полей собирает непустые href подходящих элементов.
+_SECTIONS = (
+    ("navigation", "nav a, .nav a, .menu a", True, {"text": ("text", None), "url": ("href", None)}),
+    ("mainContent", "main, .main, #main", False, {"text": ("text", None), "html": ("html", None)}),
+    (
+        "sidebar",
+        "aside, .sidebar, #sidebar",
+        False,
+        {"text": ("text", None), "html": ("html", None)},
+    ),
+    ("footer", "footer, .footer, #footer", False, {"text": ("text", None), "html": ("html", None)}),
+    (
+        "categories",
+        ".category, .cat, [class*='category'] a",
+        True,
+        {"name": ("text", None), "url": ("href", None)},
+    ),
+    (
+        "products",
+        ".product, .item, [class*='product']",
+        True,
+        {
+            "name": ("text", ".name, .title, h3"),
+            "price": ("text", ".price, .cost"),
+            "url": ("href", "a"),
+        },
+    ),
+    ("links", "a", True, None),
+)
+
+# Однопроходный обход DOM по таблице _SECTIONS. Для одиночных разделов берется первый
+# подходящий элемент в порядке документа, как при page.query_selector.
+_WALK_JS = """(sections) => {
+    const value = (el, [kind, sub]) => {
+        const target = sub ? el.querySelector(sub) : el;
+        if (!target) return "";
+        if (kind === "text") return target.textContent;
+        if (kind === "html") return target.innerHTML;
+        return sub ? target.getAttribute("href") || "" : target.getAttribute("href");
+    };
+    const row = (el, fields) =>
+        Object.fromEntries(Object.entries(fields).map(([key, field]) => [key, value(el, field)]));
+
+    const result = {};
+    const found = new Set();
+    for (const [name, , multi] of sections) result[name] = multi ? [] : {};
+
+    for (const el of document.querySelectorAll("*")) {
+        for (const [name, selector, multi, fields] of sections) {
+            if (found.has(name) || !el.matches(selector)) continue;
+            if (!fields) {
+                const href = el.getAttribute("href");
+                if (href) result[name].push(href);
+            } else if (multi) {
+                result[name].push(row(el, fields));
+            } else {
+                result[name] = row(el, fields);
+                found.add(name);
+            }
+        }
+    }
+    return result;
+}"""
+
 
 class EnhancedSiteAnalyzer:
     """Класс для анализа структуры веб-сайтов."""
 
-    def __init__(self, output_dir: str = "data"):
+    def __init__(self, output_dir: str = "data", pool_size: int = 8):
         """
         Инициализация анализатора.
 
         Args:
             output_dir: Директория для сохранения результатов
+            pool_size: Количество заранее открытых страниц в пуле
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.pool_size = pool_size
         self.browser: Optional[Browser] = None
-        self.request_log: List[Dict] = []
+        self.context: Optional[BrowserContext] = None
+        self.page_pool: Optional[asyncio.Queue] = None
+
+        # Хосты, которым нужен рендеринг в браузере (True) или достаточно статики (False)
+        self._js_hosts = TTLCache(maxsize=1024, ttl=600)
 
     async def __aenter__(self):
-        """Создает браузер при входе в контекст."""
+        """Создает браузер и пул страниц при входе в контекст."""
         playwright = await async_playwright().start()
         self.browser = await playwright.chromium.launch(headless=True)
+        self.context = await self.browser.new_context()
+
+        self.page_pool = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self.page_pool.put_nowait(await self.context.new_page())
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Закрывает браузер при выходе из контекста."""
+        if self.context:
+            await self.context.close()
         if self.browser:
             await self.browser.close()
 
-    async def analyze(self, url: str) -> Dict:
+    async def analyze(self, url: str, include_request_log: bool = False) -> Dict:
         """
         Анализирует структуру сайта.
 
         Args:
             url: URL для анализа
+            include_request_log: Добавить в результат лог запросов страницы
 
         Returns:
             Dict: Результаты анализа
         """
-        try:
-            if not self.browser:
-                raise RuntimeError("Браузер не инициализирован")
-
-            page = await self.browser.new_page()
-
-            # Настраиваем перехват запросов
-            await page.route("**/*", self._log_request)
-
-            # Загружаем страницу
-            await page.goto(url, wait_until="networkidle")
-
-            # Извлекаем структуру
-            structure = await self._extract_structure(page)
-
-            # Извлекаем категории
-            categories = await self._extract_categories(page)
+        if not self.page_pool:
+            raise RuntimeError("Браузер не инициализирован")
 
-            # Извлекаем продукты
-            products = await self._extract_products(page)
-
-            # Извлекаем ссылки
-            links = await self._extract_links(page)
+        try:
+            # Пробуем быстрый путь без рендеринга; лог запросов доступен только в браузере
+            data = None
+            if not include_request_log:
+                data = await self._analyze_static(url)
+            if data is None:
+                data = await self._analyze_in_browser(url, include_request_log)
 
             # Формируем результат
             result = {
                 "url": url,
-                "title": await page.title(),
-                "structure": structure,
-                "categories": categories,
-                "products": products,
-                "links": links,
-                "request_log": self.request_log,
+                "title": data["title"],
+                "structure": {
+                    "navigation": data["navigation"],
+                    "mainContent": data["mainContent"],
+                    "sidebar": data["sidebar"],
+                    "footer": data["footer"],
+                },
+                "categories": data["categories"],
+                "products": data["products"],
+                "links": data["links"],
                 "timestamp": datetime.now().isoformat(),
             }
+            if include_request_log:
+                result["request_log"] = data["request_log"]
 
             # Сохраняем результат
             await self._save_result(result)
@@ -92,97 +188,171 @@ class EnhancedSiteAnalyzer:
             logger.error(f"Ошибка анализа {url}: {e}")
             raise
 
-    async def _log_request(self, route, request):
-        """Логирует информацию о запросе."""
-        self.request_log.append(
-            {
-                "url": request.url,
-                "method": request.method,
-                "headers": request.headers,
-                "timestamp": datetime.now().isoformat(),
-            }
-        )
-        await route.continue_()
+    async def _analyze_static(self, url: str) -> Optional[Dict]:
+        """
+        Извлекает данные из статического HTML без рендеринга страницы.
 
-    async def _extract_structure(self, page: Page) -> Dict:
-        """Извлекает структуру страницы."""
-        return {
-            "navigation": await self._extract_navigation(page),
-            "mainContent": await self._extract_main_content(page),
-            "sidebar": await self._extract_sidebar(page),
-            "footer": await self._extract_footer(page),
-        }
+        Args:
+            url: URL для анализа
+
+        Returns:
+            Optional[Dict]: Данные страницы или None, если нужен браузер
+            (в том числе при сетевой ошибке запроса)
+        """
+        host = urlsplit(url).netloc
+        if self._js_hosts.get(host):
+            return None
 
-    async def _extract_navigation(self, page: Page) -> List[Dict]:
-        """Извлекает навигационное меню."""
-        nav_items = await page.query_selector_all("nav a, .nav a, .menu a")
-        return [
-            {"text": await item.text_content(), "url": await item.get_attribute("href")}
-            for item in nav_items
-        ]
-
-    async def _extract_main_content(self, page: Page) -> Dict:
-        """Извлекает основной контент."""
-        main = await page.query_selector("main, .main, #main")
-        if main:
-            return {"text": await main.text_content(), "html": await main.inner_html()}
-        return {}
-
-    async def _extract_sidebar(self, page: Page) -> Dict:
-        """Извлекает боковую панель."""
-        sidebar = await page.query_selector("aside, .sidebar, #sidebar")
-        if sidebar:
-            return {"text": await sidebar.text_content(), "html": await sidebar.inner_html()}
-        return {}
-
-    async def _extract_footer(self, page: Page) -> Dict:
-        """Извлекает подвал."""
-        footer = await page.query_selector("footer, .footer, #footer")
-        if footer:
-            return {"text": await footer.text_content(), "html": await footer.inner_html()}
-        return {}
-
-    async def _extract_categories(self, page: Page) -> List[Dict]:
-        """Извлекает категории."""
-        category_links = await page.query_selector_all(".category, .cat, [class*='category'] a")
-        return [
-            {"name": await link.text_content(), "url": await link.get_attribute("href")}
-            for link in category_links
-        ]
-
-    async def _extract_products(self, page: Page) -> List[Dict]:
-        """Извлекает продукты."""
-        product_elements = await page.query_selector_all(".product, .item, [class*='product']")
-        products = []
-
-        for element in product_elements:
-            name = await element.query_selector(".name, .title, h3")
-            price = await element.query_selector(".price, .cost")
-            url = await element.query_selector("a")
-
-            products.append(
-                {
-                    "name": await name.text_content() if name else "",
-                    "price": await price.text_content() if price else "",
-                    "url": await url.get_attribute("href") if url else "",
-                }
-            )
-
-        return products
-
-    async def _extract_links(self, page: Page) -> List[str]:
-        """Извлекает все ссылки."""
-        links = await page.query_selector_all("a")
-        return [
-            await link.get_attribute("href") for link in links if await link.get_attribute("href")
-        ]
+        try:
+            response = await self.context.request.get(url)
+            content_type = response.headers.get("content-type", "")
+            if response.status != 200 or "text/html" not in content_type:
+                return None
+            html = await response.text()
+        except PlaywrightError as e:
+            # Сетевая ошибка быстрого пути не прерывает анализ: страницу откроет браузер
+            logger.debug(f"Статический запрос {url} не удался, открываем в браузере: {e}")
+            return None
+
+        tree = HTMLParser(html)
+        if _needs_js(html, tree):
+            self._js_hosts[host] = True
+            return None
+
+        self._js_hosts[host] = False
+        logger.debug(f"Статический анализ {url} без браузера")
+        return self._extract_static(tree)
+
+    async def _analyze_in_browser(self, url: str, include_request_log: bool) -> Dict:
+        """
+        Извлекает данные страницы, отрендеренной в браузере.
+
+        Args:
+            url: URL для анализа
+            include_request_log: Собрать лог запросов страницы
+
+        Returns:
+            Dict: Данные страницы
+        """
+        page = await self.page_pool.get()
+        request_log: Deque[Tuple[str, str]] = deque(maxlen=REQUEST_LOG_MAXLEN)
+        log_handler = functools.partial(self._log_request, log=request_log)
+        try:
+            # Настраиваем перехват запросов только если лог нужен
+            if include_request_log:
+                await page.route("**/*", log_handler)
+
+            # Загружаем страницу
+            await page.goto(url, wait_until="networkidle")
+
+            # Извлекаем все данные страницы одним обходом DOM
+            data, title = await asyncio.gather(self._extract_page(page), page.title())
+            data["title"] = title
+            if include_request_log:
+                data["request_log"] = list(request_log)
+            return data
+
+        finally:
+            # Возвращаем очищенную страницу в пул; страница, которую не удалось очистить,
+            # заменяется новой, чтобы пул не уменьшался и page_pool.get() не зависал
+            try:
+                if include_request_log:
+                    await page.unroute("**/*", log_handler)
+                await page.goto("about:blank")
+            except Exception as e:
+                logger.warning(f"Не удалось очистить страницу пула: {e}")
+                page = await self._replace_page(page)
+            finally:
+                self.page_pool.put_nowait(page)
+
+    async def _replace_page(self, page: Page) -> Page:
+        """Закрывает страницу и открывает вместо нее новую; при ошибке возвращает исходную."""
+        try:
+            await page.close()
+        except Exception:
+            pass
+        try:
+            return await self.context.new_page()
+        except Exception as e:
+            logger.error(f"Не удалось открыть новую страницу пула: {e}")
+            return page
+
+    async def _log_request(self, route, request, log: Deque[Tuple[str, str]]):
+        """Логирует URL и метод запроса в лог текущего анализа."""
+        log.append((request.url, request.method))
+        await route.continue_()
+
+    async def _extract_page(self, page: Page) -> Dict:
+        """Извлекает структуру, категории, продукты и ссылки за один обход DOM."""
+        return await page.evaluate(_WALK_JS, _SECTIONS)
+
+    def _extract_static(self, tree: HTMLParser) -> Dict:
+        """Извлекает те же данные, что и _WALK_JS, из разобранного статического HTML."""
+        title = tree.css_first("title")
+        data = {"title": title.text() if title else ""}
+
+        for name, selector, multi, fields in _SECTIONS:
+            if not fields:
+                data[name] = [
+                    node.attributes["href"]
+                    for node in tree.css(selector)
+                    if node.attributes.get("href")
+                ]
+            elif multi:
+                data[name] = [_static_row(node, fields) for node in tree.css(selector)]
+            else:
+                node = tree.css_first(selector)
+                data[name] = _static_row(node, fields) if node is not None else {}
+
+        return data
 
     async def _save_result(self, result: Dict) -> None:
         """Сохраняет результат в JSON файл."""
-        filename = f"{result['url'].replace('https://', '').replace('/', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        filename = f"{result['url'].translate(URL_TRANS)}_{time.strftime('%Y%m%d_%H%M%S')}.json"
         filepath = self.output_dir / filename
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        # Пишем результат без лога запросов, а лог выводим поэлементно,
+        # чтобы не держать в памяти сериализованную копию всего списка
+        head = orjson.dumps(
+            {key: value for key, value in result.items() if key != "request_log"},
+            option=orjson.OPT_NON_STR_KEYS,
+        )
+        with open(filepath, "wb") as f:
+            if "request_log" not in result:
+                f.write(head)
+            else:
+                f.write(head[:-1])
+                f.write(b',"request_log":[' if len(head) > 2 else b'"request_log":[')
+                for i, entry in enumerate(result["request_log"]):
+                    if i:
+                        f.write(b",")
+                    f.write(orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS))
+                f.write(b"]}")
 
         logger.info(f"Результаты сохранены в {filepath}")
+
+
+def _needs_js(html: str, tree: HTMLParser) -> bool:
+    """Проверяет, требуется ли выполнение JavaScript для получения контента страницы."""
+    if _JS_REQUIRED_RE.search(html):
+        return True
+    body = tree.body
+    return body is None or len(body.text(strip=True)) < _MIN_STATIC_TEXT
+
+
+def _static_row(node: Node, fields: Dict[str, Tuple[str, Optional[str]]]) -> Dict:
+    """Собирает значения полей раздела для узла, как row() в _WALK_JS."""
+    return {key: _static_value(node, kind, sub) for key, (kind, sub) in fields.items()}
+
+
+def _static_value(node: Node, kind: str, sub: Optional[str]) -> Optional[str]:
+    """Возвращает значение поля узла, как value() в _WALK_JS."""
+    target = node.css_first(sub) if sub else node
+    if target is None:
+        return ""
+    if kind == "text":
+        return target.text()
+    if kind == "html":
+        return "".join(child.html or "" for child in target.iter(include_text=True))
+    href = target.attributes.get("href")
+    return (href or "") if sub else href
@@ -2,56 +2,81 @@
 Модуль для A/B тестирования ML и Rule-Based стратегий.
 """
 
-import os
 import random
 import pandas as pd
-from typing import Dict, Tuple
-from datetime import datetime
-from src.protections.strategy_selector import StrategySelector
-from src.protections.strategy_predictor import StrategyPredictor
+import pyarrow as pa
+from typing import Dict, List, Tuple
+import time
+from src.protections.strategy_selector import get_selector
+from src.protections.strategy_predictor import get_predictor
+from src.parquet_log import ParquetLog
 from src.logger import logger
 
+# Время записи хранится как epoch-микросекунды (Parquet timestamp[us, UTC]):
+# без форматирования строки на каждое событие
+_now = time.time
+
+# Методы выбора стратегии, по которым считается статистика
+METHODS = ("ML", "RuleBased")
+
+# Схема записей с результатами A/B тестирования
+RESULT_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("strategy_name", pa.string()),
+        ("method", pa.string()),
+        ("success", pa.bool_()),
+        ("duration", pa.float64()),
+        ("protection_type", pa.string()),
+        ("url", pa.string()),
+        ("ip_region", pa.string()),
+        ("user_agent", pa.string()),
+        ("has_captcha", pa.bool_()),
+    ]
+)
+
 
 class ABTester:
     """Класс для A/B тестирования стратегий."""
 
-    def __init__(self, results_path: str = "data/ab_test_results.csv", ml_weight: float = 0.5):
+    def __init__(
+        self,
+        results_path: str = "data/ab_test_results.parquet",
+        ml_weight: float = 0.5,
+        batch_size: int = 50,
+    ):
         """
         Инициализация A/B тестера.
 
         Args:
-            results_path: Путь к файлу с результатами
+            results_path: Путь к каталогу с результатами (Parquet, по месяцам)
             ml_weight: Вероятность выбора ML-стратегии (0-1)
+            batch_size: Сколько записей копить в памяти перед сбросом на диск
         """
-        self.results_path = results_path
+        self._log = ParquetLog(results_path, schema=RESULT_SCHEMA)
+        self.results_path = self._log.path
         self.ml_weight = ml_weight
-        self.selector = StrategySelector()
-        self.predictor = StrategyPredictor()
-
-        # Создаем директорию для результатов
-        os.makedirs(os.path.dirname(results_path), exist_ok=True)
-
-        # Инициализируем файл с результатами, если его нет
-        if not os.path.exists(results_path):
-            self._init_results_file()
-
-    def _init_results_file(self) -> None:
-        """Создает файл с результатами тестирования."""
-        df = pd.DataFrame(
-            columns=[
-                "timestamp",
-                "strategy_name",
-                "method",
-                "success",
-                "duration",
-                "protection_type",
-                "url",
-                "ip_region",
-                "user_agent",
-                "has_captcha",
-            ]
-        )
-        df.to_csv(self.results_path, index=False)
+        self.selector = get_selector()
+        self.predictor = get_predictor()
+        self._batch = max(1, batch_size)
+        self._buffer: List[Dict] = []
+
+    def flush(self) -> None:
+        """Сбрасывает накопленные записи отдельным Parquet-файлом."""
+        if self._buffer:
+            self._log.write(self._buffer)
+            self._buffer.clear()
+
+    def close(self) -> None:
+        """Сбрасывает остаток буфера."""
+        self.flush()
+
+    def __del__(self):
+        if getattr(self, "_buffer", None):
+            try:
+                self.flush()
+            except Exception:
+                pass
 
     def select_strategy(self, protection_type: str, context: Dict) -> Tuple[str, str]:
         """
@@ -77,6 +102,31 @@ class ABTester:
         logger.info(f"Выбрана стратегия {strategy} методом {method}")
         return strategy, method
 
+    def select_strategies(self, requests: List[Tuple[str, Dict]]) -> List[Tuple[str, str]]:
+        """
+        Выбирает стратегии для пачки запросов.
+
+        Запросы, попавшие в ML-группу, предсказываются одним вызовом модели.
+
+        Args:
+            requests: Список пар (тип защиты, контекст запроса)
+
+        Returns:
+            List[Tuple[str, str]]: (название стратегии, метод выбора) для каждого запроса
+        """
+        ml_indices = [i for i in range(len(requests)) if random.random() < self.ml_weight]
+        predicted = self.predictor.predict_best_strategy_batch([requests[i][1] for i in ml_indices])
+
+        results: List[Tuple[str, str]] = [None] * len(requests)
+        for i, strategy in zip(ml_indices, predicted):
+            results[i] = (strategy, "ML")
+        for i, (protection_type, _) in enumerate(requests):
+            if results[i] is None:
+                results[i] = (self.selector.get_best_strategy(protection_type), "RuleBased")
+
+        logger.info(f"Выбраны стратегии для {len(requests)} запросов (ML: {len(ml_indices)})")
+        return results
+
     def log_result(
         self, strategy_name: str, method: str, success: bool, duration: float, metadata: Dict
     ) -> None:
@@ -93,7 +143,7 @@ class ABTester:
         try:
             # Формируем запись
             record = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": int(_now() * 1_000_000),
                 "strategy_name": strategy_name,
                 "method": method,
                 "success": success,
@@ -105,9 +155,10 @@ class ABTester:
                 "has_captcha": metadata.get("has_captcha", False),
             }
 
-            # Добавляем запись в файл
-            df = pd.DataFrame([record])
-            df.to_csv(self.results_path, mode="a", header=False, index=False)
+            # Копим записи и пишем их в файл пачками
+            self._buffer.append(record)
+            if len(self._buffer) >= self._batch:
+                self.flush()
 
             logger.info(f"Записан результат A/B теста: {strategy_name} ({method})")
 
@@ -122,22 +173,22 @@ class ABTester:
             Dict: Статистика по методам
         """
         try:
-            df = pd.read_csv(self.results_path)
-
-            stats = {
-                "ML": {
-                    "total": len(df[df["method"] == "ML"]),
-                    "success_rate": df[df["method"] == "ML"]["success"].mean(),
-                    "avg_duration": df[df["method"] == "ML"]["duration"].mean(),
-                },
-                "RuleBased": {
-                    "total": len(df[df["method"] == "RuleBased"]),
-                    "success_rate": df[df["method"] == "RuleBased"]["success"].mean(),
-                    "avg_duration": df[df["method"] == "RuleBased"]["duration"].mean(),
-                },
-            }
-
-            return stats
+            self.flush()
+            df = self._log.read(columns=["method", "success", "duration"])
+
+            # Все метрики считаются за один проход groupby
+            stats = (
+                df.groupby("method")
+                .agg(
+                    total=pd.NamedAgg(column="method", aggfunc="size"),
+                    success_rate=pd.NamedAgg(column="success", aggfunc="mean"),
+                    avg_duration=pd.NamedAgg(column="duration", aggfunc="mean"),
+                )
+                .reindex(list(METHODS))
+            )
+            stats["total"] = stats["total"].fillna(0).astype(int)
+
+            return stats.to_dict("index")
 
         except Exception as e:
             logger.error(f"Ошибка получения статистики: {e}")
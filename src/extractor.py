@@ -33,10 +33,99 @@
 """
 
 import re
-from typing import Optional
-from bs4 import BeautifulSoup
+from operator import mul
+from typing import Dict, List, Optional, Tuple
 from src.logger import log_event
 
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:  # pragma: no cover - запасной вариант без selectolax
+    HTMLParser = None
+    import lxml.html
+
+# Паттерны для поиска ИНН (в каждом ровно одна группа с номером)
+_PATTERNS = (
+    # Стандартные форматы
+    r"ИНН\s*[:：]?\s*(\d{10,12})",
+    r"ИНН&nbsp;(\d{10,12})",
+    r"ИНН\s+(\d{10,12})",
+    r"ИНН\s*=\s*(\d{10,12})",
+    r"ИНН/КПП\s*[:：]?\s*(\d{10,12})",
+    r"Идентификационный номер\s*[:：]?\s*(\d{10,12})",
+    r"ИНН организации\s*[:：]?\s*(\d{10,12})",
+    r"ИНН компании\s*[:：]?\s*(\d{10,12})",
+    r"ИНН\s*\((\d{10,12})\)",
+    r"ИНН\s*№\s*(\d{10,12})",
+    # Дополнительные форматы
+    r"ИНН.*?(\d{10})",
+    r"ИНН.*?(\d{12})",
+    r"инн.*?(\d{10})",
+    r"инн.*?(\d{12})",
+    r"ИНН\s*[^0-9]{0,20}(\d{10})",
+    r"ИНН\s*[^0-9]{0,20}(\d{12})",
+    # Поиск в реквизитах
+    r"реквизиты.*?ИНН.*?(\d{10,12})",
+    r"реквизиты.*?инн.*?(\d{10,12})",
+    r"огрн.*?инн.*?(\d{10,12})",
+    r"ОГРН.*?ИНН.*?(\d{10,12})",
+    # Поиск в контактах
+    r"контакты.*?ИНН.*?(\d{10,12})",
+    r"контакты.*?инн.*?(\d{10,12})",
+    # Поиск в JSON-данных
+    r'"inn"\s*:\s*"(\d{10,12})"',
+    r'"ИНН"\s*:\s*"(\d{10,12})"',
+    r'"inn"\s*:\s*(\d{10,12})',
+    r'"ИНН"\s*:\s*(\d{10,12})',
+)
+
+# Паттерны компилируются один раз при импорте. Объединять их в одну альтернацию
+# нельзя: порядок паттернов задает приоритет, а ленивые ветки вида "ИНН.*?(\d{10})"
+# забрали бы первые 10 цифр 12-значного ИНН раньше точных паттернов
+_INN_RES = tuple((pattern, re.compile(pattern, re.IGNORECASE | re.DOTALL)) for pattern in _PATTERNS)
+_INN_DIGITS_RE = re.compile(r"^\d{10,12}$")
+
+# Весовые коэффициенты контрольных сумм и поправки на код символа "0" (48):
+# сумма произведений считается прямо по байтам, без int() для каждой цифры
+_W10 = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+_W12_1 = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+_W12_2 = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+_W10_BIAS = 48 * sum(_W10)
+_W12_1_BIAS = 48 * sum(_W12_1)
+_W12_2_BIAS = 48 * sum(_W12_2)
+
+# Признаки, без которых ни один паттерн и ни один атрибут сработать не может
+# (без учета регистра, как у паттернов); "inn" покрывает и атрибуты data-inn/data-company-inn
+_INN_HINT_RE = re.compile(r"инн|inn|идентификационн|data-tax-id", re.I)
+
+# Атрибуты тегов, в которых может храниться ИНН
+_INN_ATTRS = ("data-inn", "data-tax-id", "data-company-inn", "inn")
+_INN_ATTR_CSS = ",".join(f"[{attr}]" for attr in _INN_ATTRS)
+_INN_ATTR_XPATH = "//*[" + " or ".join(f"@{attr}" for attr in _INN_ATTRS) + "]"
+
+
+def _parse_html(html: str) -> Tuple[str, List[Dict[str, Optional[str]]]]:
+    """
+    Разбирает HTML C-парсером (selectolax, при его отсутствии lxml).
+
+    Args:
+        html: HTML-код страницы
+
+    Returns:
+        Tuple[str, List[Dict]]: текст без скриптов и стилей и атрибуты тегов,
+        у которых есть хотя бы один из атрибутов с ИНН
+    """
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        tree.strip_tags(["script", "style"])
+        return tree.text(), [node.attributes for node in tree.css(_INN_ATTR_CSS)]
+
+    if not html.strip():
+        return "", []
+    doc = lxml.html.document_fromstring(html)
+    for node in doc.xpath("//script|//style"):
+        node.drop_tree()
+    return doc.text_content(), [dict(node.attrib) for node in doc.xpath(_INN_ATTR_XPATH)]
+
 
 def extract_inn_from_html(html: str) -> Optional[str]:
     """
@@ -51,74 +140,37 @@ def extract_inn_from_html(html: str) -> Optional[str]:
     # Логируем начало извлечения
     log_event({"event": "inn_extraction_started", "html_length": len(html)})
 
-    # Парсим HTML
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Удаляем скрипты и стили
-    for script in soup(["script", "style"]):
-        script.decompose()
-
-    # Получаем чистый текст
-    text = soup.get_text()
-
-    # Паттерны для поиска ИНН
-    patterns = [
-        # Стандартные форматы
-        r"ИНН\s*[:：]?\s*(\d{10,12})",
-        r"ИНН&nbsp;(\d{10,12})",
-        r"ИНН\s+(\d{10,12})",
-        r"ИНН\s*=\s*(\d{10,12})",
-        r"ИНН/КПП\s*[:：]?\s*(\d{10,12})",
-        r"Идентификационный номер\s*[:：]?\s*(\d{10,12})",
-        r"ИНН организации\s*[:：]?\s*(\d{10,12})",
-        r"ИНН компании\s*[:：]?\s*(\d{10,12})",
-        r"ИНН\s*\((\d{10,12})\)",
-        r"ИНН\s*№\s*(\d{10,12})",
-        # Дополнительные форматы
-        r"ИНН.*?(\d{10})",
-        r"ИНН.*?(\d{12})",
-        r"инн.*?(\d{10})",
-        r"инн.*?(\d{12})",
-        r"ИНН\s*[^0-9]{0,20}(\d{10})",
-        r"ИНН\s*[^0-9]{0,20}(\d{12})",
-        # Поиск в реквизитах
-        r"реквизиты.*?ИНН.*?(\d{10,12})",
-        r"реквизиты.*?инн.*?(\d{10,12})",
-        r"огрн.*?инн.*?(\d{10,12})",
-        r"ОГРН.*?ИНН.*?(\d{10,12})",
-        # Поиск в контактах
-        r"контакты.*?ИНН.*?(\d{10,12})",
-        r"контакты.*?инн.*?(\d{10,12})",
-        # Поиск в JSON-данных
-        r'"inn"\s*:\s*"(\d{10,12})"',
-        r'"ИНН"\s*:\s*"(\d{10,12})"',
-        r'"inn"\s*:\s*(\d{10,12})',
-        r'"ИНН"\s*:\s*(\d{10,12})',
-    ]
-
-    # Ищем ИНН в тексте
-    for pattern in patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE | re.DOTALL)
-        for match in matches:
+    # Быстрая проверка по сырому HTML: без нужных подстрок разбирать страницу незачем
+    # Страницу с числовыми ссылками на символы (&#1048;) проверить так нельзя: ИНН может
+    # проявиться только после разбора HTML
+    if "&#" not in html and not _INN_HINT_RE.search(html):
+        log_event({"event": "inn_not_found", "error": "В HTML нет упоминаний ИНН"})
+        return None
+
+    # Парсим HTML и получаем чистый текст без скриптов и стилей
+    text, tagged = _parse_html(html)
+
+    # Ищем ИНН в тексте, перебирая паттерны в порядке приоритета
+    for pattern, regex in _INN_RES:
+        for match in regex.finditer(text):
             inn = match.group(1)
 
             # Проверяем валидность ИНН
-            if len(inn) in [10, 12] and is_valid_inn(inn):
+            if len(inn) in (10, 12) and is_valid_inn(inn):
                 # Логируем успешное извлечение
                 log_event({"event": "inn_extracted", "inn": inn, "pattern_used": pattern})
 
                 return inn
 
     # Ищем ИНН в атрибутах HTML
-    for tag in soup.find_all(["div", "span", "p", "td"]):
-        for attr in ["data-inn", "data-tax-id", "data-company-inn", "inn"]:
-            if attr in tag.attrs:
-                inn = tag[attr]
-                if re.match(r"^\d{10,12}$", inn) and is_valid_inn(inn):
-                    log_event(
-                        {"event": "inn_extracted", "inn": inn, "source": f"HTML attribute: {attr}"}
-                    )
-                    return inn
+    for attrs in tagged:
+        for attr in _INN_ATTRS:
+            inn = attrs.get(attr)
+            if inn and _INN_DIGITS_RE.match(inn) and is_valid_inn(inn):
+                log_event(
+                    {"event": "inn_extracted", "inn": inn, "source": f"HTML attribute: {attr}"}
+                )
+                return inn
 
     # Логируем неудачное извлечение
     log_event({"event": "inn_not_found", "error": "ИНН не найден в HTML"})
@@ -136,25 +188,20 @@ def is_valid_inn(inn: str) -> bool:
     Returns:
         bool: True если ИНН валиден, False если нет
     """
-    if not inn.isdigit():
+    if not (inn.isascii() and inn.isdigit()):
         return False
 
-    if len(inn) == 10:  # ИНН юридического лица
-        weights = [2, 4, 10, 3, 5, 9, 4, 6, 8]
-        control_sum = sum(int(inn[i]) * weights[i] for i in range(9))
-        control_digit = control_sum % 11 % 10
-        return int(inn[9]) == control_digit
-
-    elif len(inn) == 12:  # ИНН физического лица
-        weights1 = [7, 2, 4, 10, 3, 5, 9, 4, 6, 8]
-        weights2 = [3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8]
+    # Байты ASCII-цифр: значение цифры равно коду минус 48
+    digits = inn.encode("ascii")
 
-        control_sum1 = sum(int(inn[i]) * weights1[i] for i in range(10))
-        control_sum2 = sum(int(inn[i]) * weights2[i] for i in range(11))
+    if len(digits) == 10:  # ИНН юридического лица
+        control_digit = (sum(map(mul, digits, _W10)) - _W10_BIAS) % 11 % 10
+        return digits[9] - 48 == control_digit
 
-        control_digit1 = control_sum1 % 11 % 10
-        control_digit2 = control_sum2 % 11 % 10
+    elif len(digits) == 12:  # ИНН физического лица
+        control_digit1 = (sum(map(mul, digits, _W12_1)) - _W12_1_BIAS) % 11 % 10
+        control_digit2 = (sum(map(mul, digits, _W12_2)) - _W12_2_BIAS) % 11 % 10
 
-        return int(inn[10]) == control_digit1 and int(inn[11]) == control_digit2
+        return digits[10] - 48 == control_digit1 and digits[11] - 48 == control_digit2
 
     return False
@@ -1,54 +1,244 @@
+import atexit
+import os
 import requests
+import shelve
+import threading
 import time
-from typing import Optional
+from typing import List, Optional
 from bs4 import BeautifulSoup
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException
 from logger import log_event
 
-def fetch_html(url: str) -> Optional[str]:
+
+class DriverPool:
+    """
+    Пул браузеров undetected-chromedriver: по одному драйверу на поток.
+
+    Браузер запускается лениво при первом обращении из потока и переиспользуется
+    для следующих URL; все драйверы закрываются при завершении процесса.
+    """
+
+    _local = threading.local()
+    _drivers: List[uc.Chrome] = []
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _make_options() -> uc.ChromeOptions:
+        """Создает опции запуска Chrome."""
+        options = uc.ChromeOptions()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--window-size=1920,1080')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+
+        # Добавляем дополнительные заголовки
+        options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+        return options
+
+    @classmethod
+    def get(cls) -> uc.Chrome:
+        """
+        Возвращает драйвер текущего потока, запуская его при необходимости.
+
+        Returns:
+            uc.Chrome: драйвер браузера
+        """
+        driver = getattr(cls._local, 'driver', None)
+        if driver is None:
+            driver = uc.Chrome(options=cls._make_options())
+
+            # Устанавливаем таймауты
+            driver.set_page_load_timeout(30)
+            driver.implicitly_wait(10)
+
+            cls._local.driver = driver
+            with cls._lock:
+                cls._drivers.append(driver)
+        return driver
+
+    @classmethod
+    def discard(cls) -> None:
+        """Закрывает драйвер текущего потока (например, после падения браузера)."""
+        driver = getattr(cls._local, 'driver', None)
+        if driver is None:
+            return
+        cls._local.driver = None
+        with cls._lock:
+            if driver in cls._drivers:
+                cls._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Закрывает все запущенные драйверы."""
+        with cls._lock:
+            drivers, cls._drivers = cls._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+atexit.register(DriverPool.close_all)
+
+
+# Дисковый кэш загруженного HTML: повторные запуски по тем же URL не поднимают браузер
+CACHE_PATH = os.getenv('HTML_CACHE_PATH', 'data/http_cache')
+CACHE_TTL = int(os.getenv('HTML_CACHE_TTL', '3600'))
+
+_cache: Optional[shelve.Shelf] = None
+_cache_lock = threading.Lock()
+
+
+def _cache_open() -> shelve.Shelf:
+    """Открывает кэш при первом обращении (вызывать под _cache_lock)."""
+    global _cache
+    if _cache is None:
+        os.makedirs(os.path.dirname(CACHE_PATH) or '.', exist_ok=True)
+        _cache = shelve.open(CACHE_PATH)
+    return _cache
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """
+    Возвращает HTML из кэша, если запись не старше CACHE_TTL.
+
+    Args:
+        key: ключ записи
+
+    Returns:
+        Optional[str]: HTML-код или None, если записи нет или она устарела
+    """
+    with _cache_lock:
+        entry = _cache_open().get(key)
+    if entry is None:
+        return None
+    stored_at, html = entry
+    if time.time() - stored_at >= CACHE_TTL:
+        return None
+    return html
+
+
+def _cache_put(key: str, html: str) -> None:
+    """Сохраняет HTML в кэш вместе со временем загрузки."""
+    with _cache_lock:
+        cache = _cache_open()
+        cache[key] = (time.time(), html)
+        cache.sync()
+
+
+def _cache_close() -> None:
+    """Закрывает кэш при завершении процесса."""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+
+atexit.register(_cache_close)
+
+
+def _wait_ready(driver: uc.Chrome, timeout: float = 10) -> None:
+    """
+    Ждет, пока документ полностью загрузится (document.readyState == 'complete').
+
+    Args:
+        driver: драйвер браузера
+        timeout: максимальное время ожидания в секундах
+    """
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+    except TimeoutException:
+        pass
+
+
+def _wait_height_stable(driver: uc.Chrome, timeout: float = 5) -> None:
+    """
+    Ждет, пока высота страницы перестанет меняться после прокрутки.
+
+    Args:
+        driver: драйвер браузера
+        timeout: максимальное время ожидания в секундах
+    """
+    last_height = [None]
+
+    def height_stable(d) -> bool:
+        height = d.execute_script("return document.body.scrollHeight")
+        stable = height == last_height[0]
+        last_height[0] = height
+        return stable
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.3).until(height_stable)
+    except TimeoutException:
+        pass
+
+
+# Скрипт поиска ссылок на страницы с контактами (не более трех)
+_CONTACT_LINKS_JS = """
+const keywords = ['контакт', 'о компании', 'реквизит'];
+return Array.from(document.querySelectorAll('a'))
+    .filter(a => a.href && keywords.some(k => a.innerText.toLowerCase().includes(k)))
+    .map(a => a.href)
+    .slice(0, 3);
+"""
+
+
+def fetch_html(url: str, force_refresh: bool = False) -> Optional[str]:
     """
     Загружает HTML с сайта, обходя различные типы защиты.
     
     Args:
         url: URL сайта
+        force_refresh: загрузить страницу заново, минуя кэш
         
     Returns:
         Optional[str]: HTML-код страницы или None в случае ошибки
     """
     # Сразу используем Selenium для всех сайтов
-    return fetch_with_selenium(url)
+    return fetch_with_selenium(url, force_refresh=force_refresh)
 
-def fetch_with_selenium(url: str) -> Optional[str]:
+def fetch_with_selenium(url: str, force_refresh: bool = False) -> Optional[str]:
     """
     Загружает HTML с сайта с использованием Selenium и undetected-chromedriver.
     
+    Результат кэшируется на диске на CACHE_TTL секунд.
+    
     Args:
         url: URL сайта
+        force_refresh: загрузить страницу заново, минуя кэш
         
     Returns:
         Optional[str]: HTML-код страницы или None в случае ошибки
     """
+    cache_key = f"selenium:{url}"
+    if not force_refresh:
+        html = _cache_get(cache_key)
+        if html is not None:
+            log_event({
+                "event": "html_fetched",
+                "url": url,
+                "method": "cache"
+            })
+            return html
+    
     try:
-        options = uc.ChromeOptions()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--window-size=1920,1080')
-        options.add_argument('--disable-blink-features=AutomationControlled')
-        
-        # Добавляем дополнительные заголовки
-        options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-        
-        driver = uc.Chrome(options=options)
-        
-        # Устанавливаем таймауты
-        driver.set_page_load_timeout(30)
-        driver.implicitly_wait(10)
+        # Берем уже запущенный браузер текущего потока
+        driver = DriverPool.get()
         
         # Загружаем страницу
         driver.get(url)
@@ -58,24 +248,19 @@ def fetch_with_selenium(url: str) -> Optional[str]:
             EC.presence_of_element_located((By.TAG_NAME, "body"))
         )
         
-        # Даем время на выполнение JavaScript
-        time.sleep(5)
+        # Ждем окончания загрузки документа вместо фиксированной паузы
+        _wait_ready(driver)
         
         # Прокручиваем страницу для загрузки динамического контента
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
+        _wait_height_stable(driver)
         
         # Пытаемся найти ссылки на страницы с контактами
-        contact_links = []
+        # Ссылки фильтруются на стороне браузера одним вызовом вместо запроса на каждый элемент
         try:
-            links = driver.find_elements(By.TAG_NAME, "a")
-            for link in links:
-                href = link.get_attribute("href")
-                text = link.text.lower()
-                if href and any(keyword in text for keyword in ["контакт", "о компании", "реквизит"]):
-                    contact_links.append(href)
+            contact_links = driver.execute_script(_CONTACT_LINKS_JS) or []
         except:
-            pass
+            contact_links = []
         
         # Собираем HTML со всех найденных страниц
         all_html = [driver.page_source]
@@ -83,12 +268,13 @@ def fetch_with_selenium(url: str) -> Optional[str]:
         for link in contact_links[:3]:  # Ограничиваем количество дополнительных страниц
             try:
                 driver.get(link)
-                time.sleep(3)
+                _wait_ready(driver)
                 all_html.append(driver.page_source)
             except:
                 continue
         
-        driver.quit()
+        # Очищаем cookies, чтобы следующий сайт начинал с чистой сессии
+        driver.delete_all_cookies()
         
         log_event({
             "event": "html_fetched",
@@ -97,9 +283,13 @@ def fetch_with_selenium(url: str) -> Optional[str]:
             "additional_pages": len(all_html) - 1
         })
         
-        return "\n".join(all_html)
+        html = "\n".join(all_html)
+        _cache_put(cache_key, html)
+        return html
         
     except Exception as e:
+        # Браузер мог оказаться в неизвестном состоянии: следующий запрос запустит новый
+        DriverPool.discard()
         log_event({
             "event": "selenium_error",
             "url": url,
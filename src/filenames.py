@@ -0,0 +1,6 @@
+"""
+Модуль с общими правилами построения имен файлов результатов.
+"""
+
+# Таблица замены символов URL, недопустимых в имени файла
+URL_TRANS = str.maketrans({":": "_", "/": "_", "?": "_", "&": "_", "=": "_"})
@@ -2,13 +2,20 @@
 Модуль для логирования.
 """
 
+import atexit
+import json
 import os
 import sys
+import threading
+import time
+from typing import Any, Callable, Dict
 from loguru import logger
 
 # Удаляем стандартный обработчик
 logger.remove()
 
+# Все обработчики пишут через фоновый поток (enqueue=True): форматирование и запись
+# на диск не выполняются в потоке, который вызвал логгер
 # Добавляем обработчик для вывода в файл
 logger.add(
     "logs/app.log",
@@ -16,7 +23,69 @@ logger.add(
     level="INFO",
     rotation="1 day",
     compression="zip",
+    enqueue=True,
+    backtrace=False,
+    diagnose=False,
 )
 
 # Добавляем обработчик для вывода в консоль
-logger.add(sys.stderr, format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}", level="INFO")
+logger.add(
+    sys.stderr,
+    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+    level="INFO",
+    enqueue=True,
+    backtrace=False,
+    diagnose=False,
+)
+
+# Структурированные события пишутся напрямую в один постоянно открытый файл
+# с буфером 64 КБ: без open()/close() и без разбора записи loguru на каждое событие
+EVENTS_LOG = "logs/events.log"
+# Запись событий отключается переменной окружения LOG_EVENTS=0
+EVENTS_ENABLED = os.getenv("LOG_EVENTS", "1").lower() not in ("0", "false", "no", "off")
+os.makedirs(os.path.dirname(EVENTS_LOG), exist_ok=True)
+_events_file = open(EVENTS_LOG, "a", encoding="utf-8", buffering=1 << 16)
+_events_lock = threading.Lock()
+atexit.register(_events_file.flush)
+
+_ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+_ts_cache = [0, ""]
+
+
+def _timestamp() -> str:
+    """Возвращает локальное время в ISO-формате, форматируя его не чаще раза в секунду."""
+    now = time.time()
+    second = int(now)
+    if second != _ts_cache[0]:
+        _ts_cache[0] = second
+        _ts_cache[1] = time.strftime(_ISO_FORMAT, time.localtime(second))
+    return f"{_ts_cache[1]}.{int((now - second) * 1000):03d}"
+
+
+def log_event(data: Dict[str, Any], _now=_timestamp, _dumps=json.dumps) -> None:
+    """
+    Записывает структурированное событие в logs/events.log (одна JSON-строка).
+
+    Args:
+        data: данные события; ключ "event" содержит его название
+    """
+    if not EVENTS_ENABLED:
+        return
+    line = _dumps({"timestamp": _now(), **data}, ensure_ascii=False, default=str)
+    with _events_lock:
+        _events_file.write(line + "\n")
+
+
+def log_event_lazy(
+    category: str, action: str, payload_factory: Callable[[], Dict[str, Any]]
+) -> None:
+    """
+    Записывает событие "<category>_<action>", собирая его данные только при включенной записи.
+
+    Args:
+        category: категория события (например, "strategy")
+        action: действие внутри категории (например, "found")
+        payload_factory: функция без аргументов, возвращающая данные события
+    """
+    if EVENTS_ENABLED:
+        log_event({"event": f"{category}_{action}", **payload_factory()})
@@ -1,10 +1,38 @@
 import os
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 from extractor import extract_inn_from_html
 from protections import detect_protection, load_strategies, save_strategy
 from logger import log_event
 from fetcher import fetch_html
 
+# URL обрабатываются в нескольких потоках: проверка и сохранение стратегии должны быть атомарны
+_strategies_lock = threading.Lock()
+
+# Индекс стратегий по типу защиты; строится при первом обращении (под _strategies_lock)
+_strategies_index: Optional[Dict[str, Dict]] = None
+
+
+def _get_strategies_index() -> Dict[str, Dict]:
+    """
+    Возвращает индекс стратегий {protection_type: стратегия}.
+
+    Для каждого типа защиты берется первая стратегия из файла, как и при
+    последовательном поиске. Вызывать под _strategies_lock.
+
+    Returns:
+        Dict[str, Dict]: индекс стратегий
+    """
+    global _strategies_index
+    if _strategies_index is None:
+        index = {}
+        for strategy in load_strategies():
+            index.setdefault(strategy["protection_type"], strategy)
+        _strategies_index = index
+    return _strategies_index
+
+
 def process_url(url: str) -> Optional[str]:
     """
     Обрабатывает URL и извлекает ИНН.
@@ -25,35 +53,32 @@ def process_url(url: str) -> Optional[str]:
         protection_type = detect_protection(html)
         
         # Проверяем наличие стратегии для защиты
-        strategies = load_strategies()
-        strategy_used = None
-        
-        for strategy in strategies:
-            if strategy["protection_type"] == protection_type:
-                strategy_used = strategy["strategy"]
-                break
+        with _strategies_lock:
+            index = _get_strategies_index()
+            strategy_used = index.get(protection_type, {}).get("strategy")
         
-        if strategy_used:
-            log_event({
-                "event": "strategy_applied",
-                "url": url,
-                "protection_type": protection_type,
-                "strategy_used": strategy_used
-            })
-        else:
-            log_event({
-                "event": "no_strategy_found",
-                "url": url,
-                "protection_type": protection_type
-            })
+            if strategy_used:
+                log_event({
+                    "event": "strategy_applied",
+                    "url": url,
+                    "protection_type": protection_type,
+                    "strategy_used": strategy_used
+                })
+            else:
+                log_event({
+                    "event": "no_strategy_found",
+                    "url": url,
+                    "protection_type": protection_type
+                })
             
-            # Создаем новую стратегию
-            new_strategy = {
-                "protection_type": protection_type,
-                "strategy": "use_selenium",
-                "created_at": "2024-04-20T21:00:00"
-            }
-            save_strategy(new_strategy)
+                # Создаем новую стратегию
+                new_strategy = {
+                    "protection_type": protection_type,
+                    "strategy": "use_selenium",
+                    "created_at": "2024-04-20T21:00:00"
+                }
+                save_strategy(new_strategy)
+                index[protection_type] = new_strategy
         
         # Извлекаем ИНН
         inn = extract_inn_from_html(html)
@@ -79,10 +104,11 @@ if __name__ == "__main__":
     ]
     
     print("Начинаем поиск ИНН на сайтах...")
-    for url in urls:
-        print(f"\nПроверяем {url}")
-        inn = process_url(url)
-        if inn:
-            print(f"Найден ИНН: {inn}")
-        else:
-            print("ИНН не найден")
+    # Каждый поток использует свой браузер из DriverPool
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for url, inn in zip(urls, executor.map(process_url, urls)):
+            print(f"\nПроверяем {url}")
+            if inn:
+                print(f"Найден ИНН: {inn}")
+            else:
+                print("ИНН не найден")
@@ -4,12 +4,11 @@
 
 import os
 import json
-import hashlib
-import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from sklearn.linear_model import SGDClassifier
-from src.protections.strategy_predictor import StrategyPredictor
+from src.protections.strategy_predictor import get_predictor
+from src.parquet_log import ParquetLog
 from src.logger import logger
 import numpy as np
 
@@ -19,28 +18,36 @@ class OnlineTrainer:
 
     def __init__(
         self,
-        log_path: str = "data/strategy_logs.csv",
+        log_path: str = "data/strategy_logs.parquet",
         meta_path: str = "models/model_meta.json",
         update_threshold: int = 100,
         update_interval_hours: int = 24,
+        batch_size: int = 50,
     ):
         """
         Инициализация online trainer.
 
         Args:
-            log_path: Путь к файлу с логами
+            log_path: Путь к каталогу с логами (Parquet, по месяцам)
             meta_path: Путь к файлу с метаданными модели
             update_threshold: Порог количества новых записей для обновления
             update_interval_hours: Интервал обновления в часах
+            batch_size: Сколько записей копить в памяти перед сбросом в лог
         """
-        self.log_path = log_path
+        self._log = ParquetLog(log_path)
+        self.log_path = self._log.path
         self.meta_path = meta_path
         self.update_threshold = update_threshold
         self.update_interval_hours = update_interval_hours
-        self.predictor = StrategyPredictor()
+        self.predictor = get_predictor()
+        self._batch = max(1, batch_size)
+        self._buffer: List[Dict] = []
+
+        # Число записей в логе (с учетом буфера) берется из метаданных Parquet один раз
+        self._record_count = self._log.count()
 
         # Создаем необходимые директории
-        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
         os.makedirs(os.path.dirname(meta_path), exist_ok=True)
 
         # Инициализируем метаданные, если файл не существует
@@ -53,6 +60,7 @@ class OnlineTrainer:
             "last_update": datetime.now().isoformat(),
             "last_hash": "",
             "total_records": 0,
+            "classes": [],
             "update_count": 0,
         }
         self._save_meta(meta)
@@ -75,29 +83,39 @@ class OnlineTrainer:
             logger.error(f"Ошибка сохранения метаданных: {e}")
 
     def _get_file_hash(self) -> str:
-        """Вычисляет хэш файла с логами."""
+        """Возвращает отпечаток журнала (число файлов, размер, mtime) без чтения данных."""
         try:
-            with open(self.log_path, "rb") as f:
-                return hashlib.md5(f.read()).hexdigest()
+            return self._log.fingerprint()
         except Exception:
             return ""
 
+    def flush(self) -> None:
+        """Сбрасывает накопленные записи в журнал отдельным Parquet-файлом."""
+        if not self._buffer:
+            return
+        self._log.write(self._buffer)
+        self._buffer.clear()
+
+    def __del__(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+
     def append_to_log(self, record: Dict) -> None:
         """
         Добавляет запись в лог-файл.
 
+        Записи копятся в памяти и пишутся в файл пачками по batch_size.
+
         Args:
             record: Словарь с данными о применении стратегии
         """
         try:
-            # Преобразуем запись в DataFrame
-            df = pd.DataFrame([record])
-
-            # Добавляем запись в файл
-            if os.path.exists(self.log_path):
-                df.to_csv(self.log_path, mode="a", header=False, index=False)
-            else:
-                df.to_csv(self.log_path, index=False)
+            self._buffer.append(record)
+            self._record_count += 1
+            if len(self._buffer) >= self._batch:
+                self.flush()
 
             logger.info(f"Добавлена запись в лог: {record['strategy_name']}")
 
@@ -111,16 +129,15 @@ class OnlineTrainer:
         Returns:
             bool: True, если модель нужно обновить
         """
-        if not os.path.exists(self.log_path):
+        if not self._record_count:
             return False
 
         meta = self._load_meta()
         if not meta:
             return True
 
-        # Проверяем количество новых записей
-        current_records = sum(1 for _ in open(self.log_path)) - 1  # -1 для заголовка
-        new_records = current_records - meta.get("total_records", 0)
+        # Проверяем количество новых записей по счетчику в памяти
+        new_records = self._record_count - meta.get("total_records", 0)
 
         if new_records >= self.update_threshold:
             return True
@@ -135,10 +152,26 @@ class OnlineTrainer:
         return False
 
     def update_model(self) -> None:
-        """Обновляет модель на новых данных."""
+        """
+        Дообучает модель только на записях, добавленных после прошлого обновления.
+
+        Число уже учтенных записей и полный список классов хранятся в метаданных,
+        поэтому стоимость обновления зависит от объема новых данных, а не всего лога.
+        """
         try:
-            # Загружаем данные
-            df = pd.read_csv(self.log_path)
+            # Дописываем буфер и читаем только новые строки нужных колонок
+            self.flush()
+            meta = self._load_meta()
+            trained = meta.get("total_records", 0)
+            df = self._log.read(
+                columns=[*self.predictor.feature_names, "strategy_name"], skip_rows=trained
+            )
+            total = trained + len(df)
+            self._record_count = total
+
+            if df.empty:
+                logger.info("Новых записей для обновления модели нет")
+                return
 
             # Подготавливаем признаки
             X = df[self.predictor.feature_names]
@@ -150,19 +183,34 @@ class OnlineTrainer:
                     loss="log_loss", learning_rate="adaptive", eta0=0.01, max_iter=1000
                 )
 
+            model = self.predictor.model
+            if hasattr(model, "classes_"):
+                # Набор классов обученной модели менять нельзя: новые метки пропускаем
+                classes = list(model.classes_)
+                known = y.isin(classes)
+                if not known.all():
+                    logger.warning(
+                        f"Пропущено {int((~known).sum())} записей с новыми стратегиями: "
+                        f"{sorted(set(y[~known]))}"
+                    )
+                    X, y = X[known], y[known]
+            else:
+                classes = sorted(set(meta.get("classes", [])) | set(y))
+
             # Обновляем модель
-            self.predictor.model.partial_fit(X, y, classes=np.unique(y))
+            if len(y):
+                model.partial_fit(X, y, classes=np.array(classes))
 
             # Сохраняем модель
             self.predictor.save_model()
 
             # Обновляем метаданные
-            meta = self._load_meta()
             meta.update(
                 {
                     "last_update": datetime.now().isoformat(),
                     "last_hash": self._get_file_hash(),
-                    "total_records": len(df),
+                    "total_records": total,
+                    "classes": [str(c) for c in classes],
                     "update_count": meta.get("update_count", 0) + 1,
                 }
             )
@@ -0,0 +1,180 @@
+"""
+Модуль для хранения журналов (результаты A/B тестов, логи стратегий) в Parquet.
+
+Журнал представляет собой каталог с Parquet-файлами, разбитыми по месяцам:
+
+    data/strategy_logs.parquet/
+        month=2024-01/part-20240101T120000123456-1a2b3c4d.parquet
+        month=2024-02/...
+
+Каждый сброс буфера записывается отдельным файлом, поэтому дописывать данные
+можно из разных запусков, а читать — только нужные колонки. Имена файлов
+упорядочены по времени записи (с точностью до микросекунд), так что порядок
+строк журнала стабилен и можно читать только записи, добавленные после N-й.
+"""
+
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.logger import logger
+
+
+def parquet_path(path: str) -> str:
+    """
+    Возвращает путь к каталогу Parquet-журнала для переданного пути.
+
+    Старые пути вида ``*.csv`` переводятся в ``*.parquet``; записи из существующего
+    CSV-файла переносит ParquetLog при первом открытии журнала.
+
+    Args:
+        path: путь к журналу
+
+    Returns:
+        str: путь к каталогу журнала
+    """
+    root, ext = os.path.splitext(path)
+    return root + ".parquet" if ext == ".csv" else path
+
+
+class ParquetLog:
+    """Журнал записей в виде набора Parquet-файлов, разбитого по месяцам."""
+
+    def __init__(self, path: str, schema: Optional[pa.Schema] = None, compression: str = "zstd"):
+        """
+        Инициализация журнала.
+
+        Args:
+            path: путь к каталогу журнала (``*.csv`` заменяется на ``*.parquet``,
+                записи существующего CSV-файла переносятся в пустой журнал)
+            schema: схема записей; если не задана, выводится из данных
+            compression: алгоритм сжатия Parquet
+        """
+        self.path = parquet_path(path)
+        self.schema = schema
+        self.compression = compression
+        # Число строк по каждому файлу: футер каждого файла читается не более одного раза
+        self._row_counts: Dict[str, int] = {}
+        self._import_legacy_csv()
+
+    def _import_legacy_csv(self) -> None:
+        """
+        Переносит записи из CSV-журнала прежнего формата (``<журнал>.csv``).
+
+        Перенос выполняется, только пока Parquet-журнал пуст, поэтому CSV читается один раз.
+        Если файл прочитать не удалось, он не используется, о чем пишется предупреждение.
+        """
+        root, ext = os.path.splitext(self.path)
+        legacy = root + ".csv"
+        if ext != ".parquet" or not os.path.isfile(legacy) or self.exists():
+            return
+        try:
+            df = pd.read_csv(legacy)
+            for field in self.schema or []:
+                if pa.types.is_timestamp(field.type) and field.name in df:
+                    df[field.name] = pd.to_datetime(df[field.name], utc=True)
+            self.write(df.astype(object).where(df.notna(), None).to_dict("records"))
+        except Exception as e:
+            logger.warning(f"CSV-журнал {legacy} не перенесен в {self.path} и не используется: {e}")
+            return
+        logger.info(f"Записи CSV-журнала {legacy} перенесены в {self.path}")
+
+    def _parts(self) -> List[str]:
+        """Возвращает отсортированный список файлов журнала."""
+        parts = []
+        for dirpath, _, filenames in os.walk(self.path):
+            parts.extend(
+                os.path.join(dirpath, name) for name in filenames if name.endswith(".parquet")
+            )
+        return sorted(parts)
+
+    def exists(self) -> bool:
+        """Проверяет, что в журнале есть хотя бы один файл."""
+        return bool(self._parts())
+
+    def write(self, records: List[Dict]) -> None:
+        """
+        Записывает пачку записей отдельным файлом в раздел текущего месяца.
+
+        Args:
+            records: список записей
+        """
+        if not records:
+            return
+        now = datetime.now()
+        partition = os.path.join(self.path, f"month={now:%Y-%m}")
+        os.makedirs(partition, exist_ok=True)
+
+        table = pa.Table.from_pylist(records, schema=self.schema)
+        filename = f"part-{now:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}.parquet"
+        part = os.path.join(partition, filename)
+        pq.write_table(table, part, compression=self.compression)
+        self._row_counts[part] = table.num_rows
+
+    def read(self, columns: Optional[Sequence[str]] = None, skip_rows: int = 0) -> pd.DataFrame:
+        """
+        Читает журнал, загружая только запрошенные колонки.
+
+        Args:
+            columns: список колонок; None — все колонки записей
+            skip_rows: сколько первых записей пропустить; файлы, целиком
+                попадающие в пропуск, не читаются
+
+        Returns:
+            pd.DataFrame: данные журнала (пустой DataFrame, если записей нет)
+        """
+        # Файлы читаются напрямую: колонка раздела month в данные не попадает
+        columns = list(columns) if columns is not None else None
+        tables = []
+        for part in self._parts():
+            if skip_rows > 0:
+                rows = self._num_rows(part)
+                if rows <= skip_rows:
+                    skip_rows -= rows
+                    continue
+            table = pq.read_table(part, columns=columns)
+            if skip_rows > 0:
+                table = table.slice(skip_rows)
+                skip_rows = 0
+            tables.append(table)
+        if not tables:
+            return pd.DataFrame(columns=columns or (self.schema.names if self.schema else []))
+        return pa.concat_tables(tables, promote_options="default").to_pandas()
+
+    def _num_rows(self, part: str) -> int:
+        """Возвращает число строк файла, читая его футер не более одного раза."""
+        rows = self._row_counts.get(part)
+        if rows is None:
+            rows = self._row_counts[part] = pq.read_metadata(part).num_rows
+        return rows
+
+    def count(self) -> int:
+        """
+        Возвращает число записей без чтения данных.
+
+        Для новых файлов читаются только метаданные (футер), уже известные
+        файлы берутся из кэша, а файлы, записанные этим журналом, не читаются вовсе.
+
+        Returns:
+            int: число записей в журнале
+        """
+        return sum(self._num_rows(part) for part in self._parts())
+
+    def fingerprint(self) -> str:
+        """
+        Возвращает отпечаток журнала для обнаружения изменений.
+
+        Содержимое файлов не читается: используются только данные os.stat.
+
+        Returns:
+            str: строка вида ``<число файлов>:<суммарный размер>:<последний mtime_ns>``
+        """
+        stats = [os.stat(part) for part in self._parts()]
+        size = sum(st.st_size for st in stats)
+        mtime = max((st.st_mtime_ns for st in stats), default=0)
+        return f"{len(stats)}:{size}:{mtime}"
@@ -21,24 +21,131 @@
 - undetected_chromedriver: модифицированный ChromeDriver
 """
 
+import atexit
+import hashlib
 import json
 import os
+import queue
+import random
 import re
-from typing import Dict, Optional, Any
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, Optional, Any, Tuple
 from datetime import datetime
 from src.logger import log_event
 import undetected_chromedriver as uc
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from playwright.sync_api import sync_playwright
 import cloudscraper
 from fake_useragent import UserAgent
-import requests
+from src.protections.http_session import session_for
 from stem import Signal
 from stem.control import Controller
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_line(obj: Any) -> bytes:
+        """Сериализует объект в строку JSONL (байты с переводом строки)."""
+        return orjson.dumps(obj) + b"\n"
+
+except ImportError:  # pragma: no cover - запасной вариант на стандартном json
+    _json_loads = json.loads
+
+    def _json_line(obj: Any) -> bytes:
+        """Сериализует объект в строку JSONL (байты с переводом строки)."""
+        return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+try:
+    import hyperscan
+except ImportError:  # pragma: no cover - hyperscan не обязателен
+    hyperscan = None
+
 # Путь к директории скрипта
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Признаки защит в порядке приоритета: (тип защиты, выражение)
+_PROTECTION_PATTERNS = (
+    ("captcha", r"captcha|recaptcha|g-recaptcha"),
+    ("cloudflare", r"cloudflare|cf-browser-verification"),
+    ("403", r"403 Forbidden|Access Denied"),
+    ("js_challenge", r"javascript challenge|js challenge"),
+)
+
+# Выражения компилируются один раз и проверяются по отдельности в порядке приоритета:
+# первое совпадение и есть ответ, а поиск каждого выражения сохраняет ускорение re
+# по литеральному префиксу, которого нет у объединенного выражения с группами
+_PROTECTION_RES = tuple((name, re.compile(pattern, re.I)) for name, pattern in _PROTECTION_PATTERNS)
+
+# База Hyperscan (если библиотека установлена) компилируется при первом вызове;
+# общий scratch базы не допускает параллельных сканирований, поэтому scan под блокировкой
+_hs_db = None
+_hs_lock = threading.Lock()
+
+
+def _hs_database():
+    """Возвращает скомпилированную базу Hyperscan со всеми признаками защит."""
+    global _hs_db
+    if _hs_db is None:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[pattern.encode() for _, pattern in _PROTECTION_PATTERNS],
+            ids=list(range(len(_PROTECTION_PATTERNS))),
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH]
+            * len(_PROTECTION_PATTERNS),
+        )
+        _hs_db = db
+    return _hs_db
+
+
+def _scan_protection(html: str) -> str:
+    """
+    Находит самый приоритетный признак защиты на странице.
+
+    Использует Hyperscan (один проход по HTML), если он установлен, иначе выражения re
+    по отдельности в порядке приоритета.
+
+    Args:
+        html: HTML-код страницы
+
+    Returns:
+        str: Тип защиты или "none"
+    """
+    if hyperscan is not None:
+        found = [len(_PROTECTION_PATTERNS)]
+
+        def on_match(rank, start, end, flags, context):
+            if rank < found[0]:
+                found[0] = rank
+            # Признак наивысшего приоритета останавливает сканирование
+            return rank == 0
+
+        db = _hs_database()
+        with _hs_lock:
+            try:
+                db.scan(html.encode("utf-8", "ignore"), match_event_handler=on_match)
+            except hyperscan.ScanTerminated:
+                # Так Hyperscan сообщает об остановке сканирования из on_match
+                pass
+        if found[0] < len(_PROTECTION_PATTERNS):
+            return _PROTECTION_PATTERNS[found[0]][0]
+        return "none"
+
+    for name, regex in _PROTECTION_RES:
+        if regex.search(html):
+            return name
+    return "none"
+
 
 def detect_protection(html: str) -> str:
     """
@@ -50,17 +157,9 @@ def detect_protection(html: str) -> str:
     Returns:
         str: Тип защиты ("captcha", "cloudflare", "403", "js_challenge", "none")
     """
-    protection_type = "none"
-
-    # Проверяем различные типы защиты
-    if re.search(r"captcha|recaptcha|g-recaptcha", html, re.I):
-        protection_type = "captcha"
-    elif re.search(r"cloudflare|cf-browser-verification", html, re.I):
-        protection_type = "cloudflare"
-    elif re.search(r"403 Forbidden|Access Denied", html, re.I):
-        protection_type = "403"
-    elif re.search(r"javascript challenge|js challenge", html, re.I):
-        protection_type = "js_challenge"
+    # Поиск признака наивысшего приоритета останавливается на первом совпадении,
+    # поэтому капча в начале большой страницы находится без ее полного просмотра
+    protection_type = _scan_protection(html)
 
     # Логируем обнаружение защиты
     log_event(
@@ -74,28 +173,102 @@ def detect_protection(html: str) -> str:
     return protection_type
 
 
-def load_strategies() -> Dict:
+# Кэш стратегий в памяти: файл перечитывается только при изменении его mtime.
+# Снимок кэша заменяется целиком, поэтому читатели всегда видят согласованные данные
+_strategies_cache: Dict[str, Any] = {"mtime": -1, "strategies": [], "index": {}}
+_strategies_lock = threading.RLock()
+
+
+def _strategies_path() -> str:
+    """Возвращает путь к файлу стратегий (JSONL: одна стратегия на строку)."""
+    return os.path.join(SCRIPT_DIR, "strategies.jsonl")
+
+
+def _migrate_legacy_strategies(strategies_path: str) -> None:
     """
-    Загружает стратегии обхода защит из файла.
+    Однократно переносит стратегии из старого strategies.json (JSON-массив) в JSONL.
 
-    Returns:
-        Dict: Словарь со стратегиями
+    Args:
+        strategies_path: путь к JSONL-файлу стратегий
     """
-    strategies_path = os.path.join(SCRIPT_DIR, "strategies.json")
+    legacy_path = os.path.join(SCRIPT_DIR, "strategies.json")
+    if os.path.exists(strategies_path) or not os.path.exists(legacy_path):
+        return
     try:
-        with open(strategies_path, "r", encoding="utf-8") as f:
-            strategies = json.load(f)
-            print(f"Загружено {len(strategies)} стратегий из {strategies_path}")
-    except FileNotFoundError:
-        print(f"Файл стратегий не найден: {strategies_path}")
-        strategies = []
+        with open(legacy_path, "rb") as f:
+            strategies = _json_loads(f.read())
     except json.JSONDecodeError as e:
         print(f"Ошибка при чтении файла стратегий: {e}")
-        strategies = []
+        return
+    with open(strategies_path, "wb") as f:
+        f.writelines(_json_line(strategy) for strategy in strategies)
+    print(f"Стратегии перенесены из {legacy_path} в {strategies_path}")
 
-    log_event({"event": "strategies_loaded", "strategies_count": len(strategies)})
 
-    return strategies
+def _set_strategies_cache(mtime: Optional[int], strategies: list) -> Dict[str, Any]:
+    """Заменяет снимок кэша стратегий и индекс {protection_type: стратегия} (под блокировкой)."""
+    global _strategies_cache
+    index = {}
+    for strategy in strategies:
+        index.setdefault(strategy["protection_type"], strategy)
+    _strategies_cache = {"mtime": mtime, "strategies": strategies, "index": index}
+    return _strategies_cache
+
+
+def _cached_strategies() -> Dict[str, Any]:
+    """
+    Возвращает кэш стратегий, перечитывая файл только если он изменился.
+
+    Returns:
+        Dict[str, Any]: кэш с ключами "strategies" и "index"
+    """
+    strategies_path = _strategies_path()
+    if _strategies_cache["mtime"] == -1:
+        with _strategies_lock:
+            _migrate_legacy_strategies(strategies_path)
+    try:
+        mtime = os.stat(strategies_path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    cache = _strategies_cache
+    if mtime == cache["mtime"]:
+        return cache
+
+    with _strategies_lock:
+        if mtime == _strategies_cache["mtime"]:
+            return _strategies_cache
+
+        if mtime is None:
+            print(f"Файл стратегий не найден: {strategies_path}")
+            strategies = []
+        else:
+            strategies = []
+            with open(strategies_path, "rb") as f:
+                for line_no, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        strategies.append(_json_loads(line))
+                    except json.JSONDecodeError as e:
+                        print(f"Ошибка при чтении стратегии в строке {line_no}: {e}")
+            print(f"Загружено {len(strategies)} стратегий из {strategies_path}")
+
+        cache = _set_strategies_cache(mtime, strategies)
+        log_event({"event": "strategies_loaded", "strategies_count": len(strategies)})
+        return cache
+
+
+def load_strategies() -> Dict:
+    """
+    Загружает стратегии обхода защит из файла.
+
+    Файл читается только при изменении; возвращается копия списка из кэша.
+
+    Returns:
+        Dict: Словарь со стратегиями
+    """
+    return list(_cached_strategies()["strategies"])
 
 
 def save_strategy(strategy: Dict) -> None:
@@ -105,12 +278,18 @@ def save_strategy(strategy: Dict) -> None:
     Args:
         strategy: Словарь с данными стратегии
     """
-    strategies_path = os.path.join(SCRIPT_DIR, "strategies.json")
-    strategies = load_strategies()
-    strategies.append(strategy)
+    strategies_path = _strategies_path()
 
-    with open(strategies_path, "w", encoding="utf-8") as f:
-        json.dump(strategies, f, ensure_ascii=False, indent=2)
+    with _strategies_lock:
+        # Актуализируем кэш до записи, чтобы не потерять чужие изменения файла
+        strategies = load_strategies()
+        strategies.append(strategy)
+
+        # Дописываем одну строку вместо перезаписи всего файла
+        with open(strategies_path, "ab") as f:
+            f.write(_json_line(strategy))
+        # Кэш обновляется сразу, без повторного чтения только что записанного файла
+        _set_strategies_cache(os.stat(strategies_path).st_mtime_ns, strategies)
 
     log_event({"event": "strategy_saved", "strategy": strategy})
 
@@ -125,17 +304,53 @@ def get_strategy(protection_type: str) -> Optional[Dict]:
     Returns:
         Optional[Dict]: Стратегия обхода или None
     """
-    strategies = load_strategies()
-    for strategy in strategies:
-        if strategy["protection_type"] == protection_type:
-            return strategy["strategy"]
-    return None
+    strategy = _cached_strategies()["index"].get(protection_type)
+    return strategy["strategy"] if strategy else None
+
+
+# Кэш успешно полученных страниц: (url, отпечаток стратегии) -> (время записи, HTML)
+HTML_CACHE_SIZE = 1024
+HTML_CACHE_TTL = 60.0
+_html_cache: "OrderedDict[Tuple[str, bytes], Tuple[float, str]]" = OrderedDict()
+_html_cache_lock = threading.Lock()
+
+
+def _html_cache_key(url: str, strategy: Dict) -> Tuple[str, bytes]:
+    """Возвращает ключ кэша страниц: URL и отпечаток стратегии."""
+    encoded = json.dumps(strategy, sort_keys=True, default=str).encode("utf-8")
+    return url, hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+def _html_cache_get(key: Tuple[str, bytes]) -> Optional[str]:
+    """Возвращает HTML из кэша, если запись моложе HTML_CACHE_TTL секунд."""
+    with _html_cache_lock:
+        entry = _html_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > HTML_CACHE_TTL:
+            del _html_cache[key]
+            return None
+        _html_cache.move_to_end(key)
+        return entry[1]
+
+
+def _html_cache_put(key: Tuple[str, bytes], html: str) -> None:
+    """Сохраняет HTML в кэш, вытесняя самую давно использованную запись."""
+    with _html_cache_lock:
+        _html_cache[key] = (time.monotonic(), html)
+        _html_cache.move_to_end(key)
+        if len(_html_cache) > HTML_CACHE_SIZE:
+            _html_cache.popitem(last=False)
 
 
 def apply_strategy(url: str, strategy: Dict) -> Optional[str]:
     """
     Применяет стратегию обхода защиты.
 
+    Успешный результат кэшируется в памяти на HTML_CACHE_TTL секунд: повторный
+    вызов с тем же URL и той же стратегией не загружает страницу заново.
+    Чтобы отключить кэш, передайте в стратегии "cache": False.
+
     Args:
         url: URL страницы
         strategy: Стратегия обхода
@@ -146,38 +361,116 @@ def apply_strategy(url: str, strategy: Dict) -> Optional[str]:
     method = strategy["method"]
     params = strategy.get("params", {})
 
+    use_cache = strategy.get("cache", True)
+    if use_cache:
+        cache_key = _html_cache_key(url, strategy)
+        html = _html_cache_get(cache_key)
+        if html is not None:
+            return html
+
     try:
-        if method == "selenium":
-            return _use_selenium(url, params)
-        elif method == "playwright":
-            return _use_playwright(url, params)
-        elif method == "cloudscraper":
-            return _use_cloudscraper(url, params)
-        elif method == "rotating_proxy":
-            return _use_rotating_proxy(url, params)
-        elif method == "undetected_chromedriver":
-            return _use_undetected_chromedriver(url, params)
-        else:
+        use_method = _METHODS.get(method)
+        if use_method is None:
             raise ValueError(f"Неизвестный метод: {method}")
+        html = use_method(url, params)
     except Exception as e:
         log_event({"event": "strategy_failed", "method": method, "error": str(e)})
         return None
 
+    if use_cache and html:
+        _html_cache_put(cache_key, html)
+    return html
+
+
+# Запущенные браузеры, ожидающие следующего запроса: очередь на каждый набор опций.
+# Больше MAX_IDLE_DRIVERS свободных браузеров на набор опций не держим: лишние закрываются
+MAX_IDLE_DRIVERS = 4
+_driver_pools: Dict[Tuple, "queue.Queue"] = {}
+_driver_pools_lock = threading.Lock()
+
+
+def _quit_driver(driver: Any) -> None:
+    """Закрывает браузер, не пропуская наружу ошибки уже неработающей сессии."""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+@contextmanager
+def _pooled_driver(key: Tuple, factory: Callable[[], Any]) -> Iterator[Any]:
+    """
+    Выдает свободный браузер из пула (или запускает новый) и возвращает его в пул.
+
+    Браузер, на котором возникла ошибка (в том числе при очистке cookies после
+    запроса), закрывается и в пул не возвращается; ошибка очистки не выбрасывается,
+    так как страница уже получена.
+
+    Args:
+        key: ключ пула (тип драйвера и опции запуска)
+        factory: функция запуска нового драйвера
+
+    Yields:
+        WebDriver: драйвер браузера
+    """
+    with _driver_pools_lock:
+        drivers = _driver_pools.setdefault(key, queue.Queue(maxsize=MAX_IDLE_DRIVERS))
+    try:
+        driver = drivers.get_nowait()
+    except queue.Empty:
+        driver = factory()
+    try:
+        yield driver
+    except BaseException:
+        _quit_driver(driver)
+        raise
+    try:
+        driver.delete_all_cookies()
+        drivers.put_nowait(driver)
+    except queue.Full:
+        _quit_driver(driver)
+    except Exception as e:
+        log_event({"event": "driver_discarded", "error": str(e)})
+        _quit_driver(driver)
+
+
+@atexit.register
+def _close_pooled_drivers() -> None:
+    """Закрывает все браузеры пула при завершении процесса."""
+    with _driver_pools_lock:
+        pools = list(_driver_pools.values())
+        _driver_pools.clear()
+    for drivers in pools:
+        while True:
+            try:
+                driver = drivers.get_nowait()
+            except queue.Empty:
+                break
+            _quit_driver(driver)
+
+
+def _wait_for_body(driver: Any, timeout: float) -> None:
+    """Ждет появления <body> на странице (не дольше timeout секунд)."""
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    except TimeoutException:
+        pass
+
 
 def _use_selenium(url: str, params: Dict[str, Any]) -> Optional[str]:
     """Использует Selenium для получения страницы"""
-    options = webdriver.ChromeOptions()
-    if not params.get("js_enabled", True):
-        options.add_argument("--disable-javascript")
+    js_enabled = params.get("js_enabled", True)
 
-    driver = webdriver.Chrome(options=options)
-    try:
+    def launch() -> webdriver.Chrome:
+        options = webdriver.ChromeOptions()
+        if not js_enabled:
+            options.add_argument("--disable-javascript")
+        return webdriver.Chrome(options=options)
+
+    with _pooled_driver(("selenium", js_enabled), launch) as driver:
         driver.get(url)
-        if params.get("wait_time", 0) > 0:
-            driver.implicitly_wait(params["wait_time"])
+        _wait_for_body(driver, params.get("wait_time") or 10)
         return driver.page_source
-    finally:
-        driver.quit()
 
 
 def _use_playwright(url: str, params: Dict[str, Any]) -> Optional[str]:
@@ -198,11 +491,7 @@ def _use_playwright(url: str, params: Dict[str, Any]) -> Optional[str]:
 
 def _use_cloudscraper(url: str, params: Dict[str, Any]) -> Optional[str]:
     """Использует CloudScraper для получения страницы"""
-    scraper = cloudscraper.create_scraper(
-        browser={
-            "browser": params.get("browser_type", "chrome"),
-        }
-    )
+    scraper = _scraper(params.get("browser_type", "chrome"))
 
     for _ in range(params.get("retry_count", 1)):
         try:
@@ -214,43 +503,112 @@ def _use_cloudscraper(url: str, params: Dict[str, Any]) -> Optional[str]:
     return None
 
 
-def _use_rotating_proxy(url: str, params: Dict[str, Any]) -> Optional[str]:
-    """Использует ротацию прокси для получения страницы"""
-    ua = UserAgent()
-    headers = {"User-Agent": ua.random}
+# Tor не выполняет NEWNYM чаще раза в 10 секунд; время последнего сигнала общее для вызовов
+_NEWNYM_INTERVAL = 10.0
+_last_newnym = [float("-inf")]
+_newnym_lock = threading.Lock()
 
-    for _ in range(params.get("retry_count", 1)):
-        try:
-            # Обновляем IP через Tor
-            with Controller.from_port(port=9051) as controller:
-                controller.authenticate()
-                controller.signal(Signal.NEWNYM)
 
-            proxies = {"http": "socks5h://localhost:9050", "https": "socks5h://localhost:9050"}
+# User-Agent'ы на случай, если база fake_useragent недоступна
+_FALLBACK_USER_AGENTS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0",
+)
 
-            response = requests.get(url, headers=headers, proxies=proxies, timeout=30)
 
-            if response.status_code == 200:
-                return response.text
+@lru_cache(maxsize=1)
+def _user_agents() -> Optional[UserAgent]:
+    """Возвращает общий экземпляр UserAgent (создание читает базу с диска или из сети)."""
+    try:
+        return UserAgent()
+    except Exception:
+        return None
 
-        except Exception:
-            continue
+
+def _random_user_agent() -> str:
+    """Возвращает случайный User-Agent из общей базы или из запасного списка."""
+    user_agents = _user_agents()
+    if user_agents is not None:
+        return user_agents.random
+    return random.choice(_FALLBACK_USER_AGENTS)
+
+
+@lru_cache(maxsize=None)
+def _scraper(browser_type: str) -> cloudscraper.CloudScraper:
+    """Возвращает общий CloudScraper для типа браузера (cookies решенных проверок сохраняются)."""
+    return cloudscraper.create_scraper(browser={"browser": browser_type})
+
+
+def _request_new_tor_identity(controller: Controller) -> bool:
+    """
+    Посылает NEWNYM, если с предыдущего сигнала прошло не меньше _NEWNYM_INTERVAL.
+
+    Returns:
+        bool: True, если сигнал был отправлен
+    """
+    with _newnym_lock:
+        now = time.monotonic()
+        if now - _last_newnym[0] < _NEWNYM_INTERVAL:
+            return False
+        controller.signal(Signal.NEWNYM)
+        _last_newnym[0] = now
+        return True
+
+
+def _use_rotating_proxy(url: str, params: Dict[str, Any]) -> Optional[str]:
+    """Использует ротацию прокси для получения страницы"""
+    headers = {"User-Agent": _random_user_agent()}
+    proxies = {"http": "socks5h://localhost:9050", "https": "socks5h://localhost:9050"}
+    session = session_for(proxies)
+
+    try:
+        # Одно подключение к управляющему порту Tor на все попытки
+        with Controller.from_port(port=9051) as controller:
+            controller.authenticate()
+
+            for _ in range(params.get("retry_count", 1)):
+                try:
+                    # Новая цепочка Tor применяется только к новым соединениям, поэтому
+                    # после NEWNYM сбрасываем keep-alive соединения старой цепочки
+                    if _request_new_tor_identity(controller):
+                        session.close()
+
+                    response = session.get(url, headers=headers, timeout=30)
+
+                    if response.status_code == 200:
+                        return response.text
+
+                except Exception:
+                    continue
+    except Exception:
+        pass
     return None
 
 
 def _use_undetected_chromedriver(url: str, params: Dict[str, Any]) -> Optional[str]:
     """Использует undetected_chromedriver для получения страницы"""
-    options = uc.ChromeOptions()
-    options.headless = params.get("headless", False)
+    headless = params.get("headless", False)
 
-    driver = uc.Chrome(options=options)
-    try:
+    def launch() -> uc.Chrome:
+        options = uc.ChromeOptions()
+        options.headless = headless
+        return uc.Chrome(options=options)
+
+    with _pooled_driver(("undetected_chromedriver", headless), launch) as driver:
         driver.get(url)
-        if params.get("wait_time", 0) > 0:
-            driver.implicitly_wait(params["wait_time"])
+        _wait_for_body(driver, params.get("wait_time") or 10)
         return driver.page_source
-    finally:
-        driver.quit()
+
+
+# Методы обхода для apply_strategy: название метода -> функция (url, params)
+_METHODS: Dict[str, Callable[[str, Dict[str, Any]], Optional[str]]] = {
+    "selenium": _use_selenium,
+    "playwright": _use_playwright,
+    "cloudscraper": _use_cloudscraper,
+    "rotating_proxy": _use_rotating_proxy,
+    "undetected_chromedriver": _use_undetected_chromedriver,
+}
 
 
 def create_new_strategy(protection_type: str, method: str, params: Dict[str, Any]) -> None:
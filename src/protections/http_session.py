@@ -0,0 +1,114 @@
+"""
+Модуль с общими HTTP-сессиями requests для синхронных обходчиков
+и чтением HTML из ответов requests и aiohttp.
+
+Сессия держит пул keep-alive соединений, поэтому повторные запросы к тому же
+хосту не повторяют DNS-разрешение и TLS-рукопожатие. Пул соединений привязан
+к адаптеру сессии, так что для каждого прокси заводится своя сессия.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Сколько сессий с разными прокси держать одновременно
+MAX_PROXY_SESSIONS = 16
+
+# Ответ длиннее этого размера обрезается: HTML читается потоково, целиком в память не грузится
+MAX_HTML_BYTES = 10 * 1024 * 1024
+_CHUNK_SIZE = 64 * 1024
+_HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+_sessions: "OrderedDict[Optional[frozenset], requests.Session]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _make_session(proxies: Optional[Dict[str, str]]) -> requests.Session:
+    """Создает сессию с увеличенным пулом соединений и без автоматических повторов."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=0))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if proxies:
+        session.proxies.update(proxies)
+    return session
+
+
+def session_for(proxies: Optional[Dict[str, str]] = None) -> requests.Session:
+    """
+    Возвращает общую сессию для указанных прокси (LRU на MAX_PROXY_SESSIONS сессий).
+
+    Args:
+        proxies: словарь прокси в формате requests ({"http": ..., "https": ...}) или None
+
+    Returns:
+        requests.Session: сессия с пулом keep-alive соединений
+    """
+    key = frozenset(proxies.items()) if proxies else None
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = _make_session(proxies)
+            if len(_sessions) > MAX_PROXY_SESSIONS:
+                _, evicted = _sessions.popitem(last=False)
+                evicted.close()
+        else:
+            _sessions.move_to_end(key)
+    return session
+
+
+def read_html(response: requests.Response, max_bytes: int = MAX_HTML_BYTES) -> Optional[str]:
+    """
+    Читает тело потокового ответа (stream=True) как HTML.
+
+    Ответ с типом содержимого, отличным от HTML, отклоняется без чтения тела;
+    тело длиннее max_bytes обрезается.
+
+    Args:
+        response: ответ requests, полученный с stream=True
+        max_bytes: максимальный размер читаемого тела в байтах
+
+    Returns:
+        Optional[str]: HTML страницы или None, если ответ не является HTML
+    """
+    content_type = response.headers.get("Content-Type", "")
+    if content_type and not any(kind in content_type for kind in _HTML_CONTENT_TYPES):
+        return None
+
+    body = bytearray()
+    for chunk in response.iter_content(_CHUNK_SIZE):
+        body += chunk
+        if len(body) >= max_bytes:
+            del body[max_bytes:]
+            break
+    return body.decode(response.encoding or "utf-8", errors="replace")
+
+
+async def read_html_async(
+    response: aiohttp.ClientResponse, max_bytes: int = MAX_HTML_BYTES
+) -> Optional[str]:
+    """
+    Читает тело ответа aiohttp как HTML с теми же правилами, что и read_html.
+
+    Args:
+        response: ответ aiohttp
+        max_bytes: максимальный размер читаемого тела в байтах
+
+    Returns:
+        Optional[str]: HTML страницы или None, если ответ не является HTML
+    """
+    content_type = response.headers.get("Content-Type", "")
+    if content_type and not any(kind in content_type for kind in _HTML_CONTENT_TYPES):
+        return None
+
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+        body += chunk
+        if len(body) >= max_bytes:
+            del body[max_bytes:]
+            break
+    return body.decode(response.charset or "utf-8", errors="replace")
@@ -0,0 +1,238 @@
+"""
+Модуль с общими пулами браузеров Playwright для обходчиков.
+
+Запуск Chromium занимает секунды, поэтому браузер стартует один раз на поток
+(или на цикл событий для async API) и переиспользуется, а каждому вызову
+выдается новый контекст и страница.
+"""
+
+import asyncio
+import atexit
+import re
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from playwright.async_api import Browser as AsyncBrowser
+from playwright.async_api import Page as AsyncPage
+from playwright.async_api import Playwright as AsyncPlaywright
+from playwright.async_api import Route as AsyncRoute
+from playwright.async_api import async_playwright
+from playwright.sync_api import Browser, Page, Playwright, Route, sync_playwright
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+# Типы ресурсов, не нужные для получения HTML
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet"})
+
+# Страница считается готовой после DOMContentLoaded, если в ней не меньше
+# MIN_COMPLETE_HTML символов и нет признаков страницы проверки; иначе дополнительно
+# ждем networkidle, но не дольше NETWORKIDLE_TIMEOUT мс
+MIN_COMPLETE_HTML = 2048
+NETWORKIDLE_TIMEOUT = 5000
+# Выражение записано так, чтобы работать и в re, и в JavaScript
+_CHALLENGE_PATTERN = (
+    r"cf-browser-verification|challenge-platform|just a moment|checking your browser|captcha"
+)
+_CHALLENGE_RE = re.compile(_CHALLENGE_PATTERN, re.I)
+_LOOKS_COMPLETE_JS = (
+    "() => { const html = document.documentElement ? document.documentElement.outerHTML : '';"
+    f" return html.length >= {MIN_COMPLETE_HTML} && !/{_CHALLENGE_PATTERN}/i.test(html); }}"
+)
+
+
+def looks_complete(html: str) -> bool:
+    """Проверяет, что HTML достаточно длинный и не похож на страницу проверки."""
+    return len(html) >= MIN_COMPLETE_HTML and _CHALLENGE_RE.search(html) is None
+
+
+def goto_settled(page: Page, url: str, timeout: int = 30000) -> str:
+    """
+    Открывает URL и возвращает HTML, не дожидаясь networkidle без необходимости.
+
+    Args:
+        page: страница Playwright
+        url: URL страницы
+        timeout: таймаут загрузки до DOMContentLoaded в миллисекундах
+
+    Returns:
+        str: HTML страницы
+    """
+    page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+    html = page.content()
+    if looks_complete(html):
+        return html
+    try:
+        page.wait_for_load_state("networkidle", timeout=NETWORKIDLE_TIMEOUT)
+    except PlaywrightTimeoutError:
+        pass
+    return page.content()
+
+
+async def goto_settled_async(page: AsyncPage, url: str, timeout: int = 30000) -> None:
+    """
+    Открывает URL (async API) и ждет networkidle, только если страница не выглядит готовой.
+
+    Готовность проверяется в браузере, разметка через CDP не передается.
+
+    Args:
+        page: страница Playwright (async API)
+        url: URL страницы
+        timeout: таймаут загрузки до DOMContentLoaded в миллисекундах
+    """
+    await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+    if await page.evaluate(_LOOKS_COMPLETE_JS):
+        return
+    try:
+        await page.wait_for_load_state("networkidle", timeout=NETWORKIDLE_TIMEOUT)
+    except PlaywrightTimeoutError:
+        pass
+
+
+def _block_heavy_resources(route: Route) -> None:
+    """Отклоняет загрузку картинок, шрифтов, медиа и стилей."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+
+async def _block_heavy_resources_async(route: AsyncRoute) -> None:
+    """Отклоняет загрузку картинок, шрифтов, медиа и стилей (async API)."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class PlaywrightPool:
+    """Пул браузеров Chromium: по одному на поток (sync API привязан к потоку)."""
+
+    def __init__(self, headless: bool = True):
+        """
+        Инициализация пула.
+
+        Args:
+            headless: запускать браузеры в headless-режиме
+        """
+        self.headless = headless
+        self._local = threading.local()
+        self._sessions: List[Tuple[Playwright, Browser]] = []
+        self._lock = threading.Lock()
+
+    def _browser(self) -> Browser:
+        """Возвращает браузер текущего потока, запуская его при необходимости."""
+        browser = getattr(self._local, "browser", None)
+        if browser is None or not browser.is_connected():
+            playwright = sync_playwright().start()
+            browser = playwright.chromium.launch(headless=self.headless)
+            self._local.browser = browser
+            with self._lock:
+                self._sessions.append((playwright, browser))
+        return browser
+
+    @contextmanager
+    def page(self, block_resources: bool = True, **context_kwargs) -> Iterator[Page]:
+        """
+        Выдает новую страницу в отдельном контексте браузера.
+
+        Контекст (cookies, storage) закрывается при выходе, браузер остается запущенным.
+
+        Args:
+            block_resources: не загружать картинки, шрифты, медиа и стили
+                (отключите, если странице нужен CSS, например для отрисовки капчи)
+            **context_kwargs: параметры browser.new_context (viewport, geolocation и т.д.)
+
+        Yields:
+            Page: страница Playwright
+        """
+        context = self._browser().new_context(**context_kwargs)
+        try:
+            page = context.new_page()
+            if block_resources:
+                page.route("**/*", _block_heavy_resources)
+            yield page
+        finally:
+            context.close()
+
+    def close(self) -> None:
+        """Закрывает все запущенные браузеры."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for playwright, browser in sessions:
+            try:
+                browser.close()
+                playwright.stop()
+            except Exception:
+                pass
+
+
+class AsyncPlaywrightPool:
+    """
+    Один браузер Chromium для async API.
+
+    Объекты async API привязаны к циклу событий, поэтому пул используется
+    из одного цикла: браузер запускается при первом обращении и живет до close().
+    """
+
+    def __init__(self, headless: bool = True):
+        """
+        Инициализация пула.
+
+        Args:
+            headless: запускать браузер в headless-режиме
+        """
+        self.headless = headless
+        self._playwright: Optional[AsyncPlaywright] = None
+        self._browser: Optional[AsyncBrowser] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _get_browser(self) -> AsyncBrowser:
+        """Возвращает браузер, запуская его при необходимости."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        return self._browser
+
+    @asynccontextmanager
+    async def page(
+        self, block_resources: bool = True, **context_kwargs
+    ) -> AsyncIterator[AsyncPage]:
+        """
+        Выдает новую страницу в отдельном контексте браузера.
+
+        Args:
+            block_resources: не загружать картинки, шрифты, медиа и стили
+            **context_kwargs: параметры browser.new_context (viewport, geolocation и т.д.)
+
+        Yields:
+            Page: страница Playwright (async API)
+        """
+        browser = await self._get_browser()
+        context = await browser.new_context(**context_kwargs)
+        try:
+            page = await context.new_page()
+            if block_resources:
+                await page.route("**/*", _block_heavy_resources_async)
+            yield page
+        finally:
+            await context.close()
+
+    async def close(self) -> None:
+        """Закрывает браузер и останавливает Playwright."""
+        browser, self._browser = self._browser, None
+        playwright, self._playwright = self._playwright, None
+        try:
+            if browser is not None:
+                await browser.close()
+            if playwright is not None:
+                await playwright.stop()
+        except Exception:
+            pass
+
+
+# Общий пул для всех обходчиков процесса
+playwright_pool = PlaywrightPool()
+atexit.register(playwright_pool.close)
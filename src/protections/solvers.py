@@ -3,24 +3,37 @@
 Каждая функция реализует конкретную стратегию обхода защиты.
 """
 
-import time
+import asyncio
 import random
 import logging
+from contextlib import nullcontext
 from typing import Optional, Dict, Any
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import aiohttp
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 import requests
 from src.logger import setup_logger
+from src.protections.http_session import read_html, read_html_async, session_for
+from src.protections.playwright_pool import goto_settled, playwright_pool
 
 logger = setup_logger(__name__)
 
+# Задержка перед попыткой N (с нуля) выбирается случайно из
+# [0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**N)] секунд (экспоненциальная
+# задержка с полным джиттером): повторы разных клиентов не идут в такт
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
 
-def solve_with_playwright(url: str, timeout: int = 30000, **kwargs) -> Optional[str]:
+
+def solve_with_playwright(
+    url: str, timeout: int = 30000, block_resources: bool = True, **kwargs
+) -> Optional[str]:
     """
     Открывает страницу в headless-браузере, дожидается полного рендера и возвращает HTML.
 
     Args:
         url: URL страницы для обхода
         timeout: таймаут ожидания загрузки страницы в миллисекундах
+        block_resources: не загружать картинки, шрифты, медиа и стили
         **kwargs: дополнительные параметры для playwright (например, user_agent)
 
     Returns:
@@ -28,22 +41,15 @@ def solve_with_playwright(url: str, timeout: int = 30000, **kwargs) -> Optional[
     """
     logger.info(f"Попытка обхода защиты через playwright для {url}")
 
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context()
-
-            if "user_agent" in kwargs:
-                context.set_extra_http_headers({"User-Agent": kwargs["user_agent"]})
-
-            page = context.new_page()
-            page.goto(url, timeout=timeout)
+    context_kwargs = {}
+    if "user_agent" in kwargs:
+        context_kwargs["extra_http_headers"] = {"User-Agent": kwargs["user_agent"]}
 
-            # Ждем полной загрузки страницы
-            page.wait_for_load_state("networkidle")
-
-            html = page.content()
-            browser.close()
+    try:
+        # Браузер берется из общего пула, на вызов создается только новый контекст
+        with playwright_pool.page(block_resources=block_resources, **context_kwargs) as page:
+            # networkidle ждем, только если после DOMContentLoaded страница не готова
+            html = goto_settled(page, url, timeout=timeout)
 
             logger.info(f"Успешно получен HTML через playwright для {url}")
             return html
@@ -86,11 +92,16 @@ def solve_with_headers_tweaking(url: str, **kwargs) -> Optional[str]:
         headers["Referer"] = kwargs["referer"]
 
     try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
+        with session_for().get(url, headers=headers, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            html = read_html(response)
+
+        if html is None:
+            logger.error(f"Ответ не является HTML для {url}")
+            return None
 
         logger.info(f"Успешно получен HTML через модификацию заголовков для {url}")
-        return response.text
+        return html
 
     except requests.RequestException as e:
         logger.error(f"Ошибка при обходе через модификацию заголовков для {url}: {str(e)}")
@@ -120,11 +131,16 @@ def solve_with_proxy(url: str, proxy: Dict[str, str], **kwargs) -> Optional[str]
     proxies = {"http": proxy_url, "https": proxy_url}
 
     try:
-        response = requests.get(url, proxies=proxies, timeout=30)
-        response.raise_for_status()
+        with session_for(proxies).get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            html = read_html(response)
+
+        if html is None:
+            logger.error(f"Ответ не является HTML для {url}")
+            return None
 
         logger.info(f"Успешно получен HTML через прокси для {url}")
-        return response.text
+        return html
 
     except requests.RequestException as e:
         logger.error(f"Ошибка при обходе через прокси для {url}: {str(e)}")
@@ -132,34 +148,56 @@ def solve_with_proxy(url: str, proxy: Dict[str, str], **kwargs) -> Optional[str]
     return None
 
 
-def solve_with_retry_and_delay(url: str, max_retries: int = 3, **kwargs) -> Optional[str]:
+async def solve_with_retry_and_delay(
+    url: str,
+    session: aiohttp.ClientSession,
+    max_retries: int = 3,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    rng: Optional[random.Random] = None,
+    **kwargs,
+) -> Optional[str]:
     """
-    Повторяет запрос через случайные интервалы времени.
+    Повторяет запрос с экспоненциально растущей случайной задержкой.
+
+    Ожидание между попытками не блокирует цикл событий, поэтому повторы для многих
+    URL идут одновременно; semaphore ограничивает число одновременных запросов
+    (попытки, которые ждут задержку, его не занимают).
 
     Args:
         url: URL страницы для обхода
+        session: общая сессия aiohttp
         max_retries: максимальное количество попыток
+        semaphore: ограничитель одновременных запросов (например, asyncio.BoundedSemaphore)
+        rng: генератор случайных чисел для задержек (по умолчанию модуль random)
         **kwargs: дополнительные параметры
 
     Returns:
         str: HTML страницы или None в случае ошибки
     """
     logger.info(f"Попытка обхода защиты через повторные запросы для {url}")
+    timeout = aiohttp.ClientTimeout(total=30)
+    uniform = (rng or random).uniform
 
     for attempt in range(max_retries):
         try:
-            # Случайная задержка от 5 до 10 секунд
-            delay = random.uniform(5, 10)
+            delay = uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
             logger.info(f"Попытка {attempt + 1}/{max_retries}, ожидание {delay:.2f} секунд")
-            time.sleep(delay)
+            await asyncio.sleep(delay)
 
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
+            async with semaphore or nullcontext():
+                async with session.get(url, timeout=timeout) as response:
+                    response.raise_for_status()
+                    html = await read_html_async(response)
+
+            # Тип содержимого не изменится при повторе, поэтому дальше не пытаемся
+            if html is None:
+                logger.error(f"Ответ не является HTML для {url}")
+                return None
 
             logger.info(f"Успешно получен HTML после {attempt + 1} попытки для {url}")
-            return response.text
+            return html
 
-        except requests.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.warning(f"Попытка {attempt + 1} не удалась для {url}: {str(e)}")
             if attempt == max_retries - 1:
                 logger.error(f"Все попытки обхода защиты не удались для {url}")
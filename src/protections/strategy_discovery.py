@@ -2,21 +2,79 @@
 Модуль для исследования и открытия новых стратегий обхода защит.
 """
 
-from typing import Optional, Dict, List
+import asyncio
+import atexit
+import hashlib
+import importlib.util
+import threading
+from itertools import product
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    FrozenSet,
+    Optional,
+    Dict,
+    List,
+    Set,
+    Tuple,
+)
 import random
-import time
 from datetime import datetime
-from playwright.sync_api import sync_playwright
-import requests
-from src.logger import logger
-from src.protections.strategy_handler import StrategyHandler
+import httpx
+from src.logger import log_event_lazy
+from src.protections.playwright_pool import AsyncPlaywrightPool, goto_settled_async
+
+if TYPE_CHECKING:
+    # strategy_handler импортирует этот модуль; во время выполнения тип не нужен
+    from src.protections.strategy_handler import StrategyHandler
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - xxhash не обязателен
+    xxhash = None
+
+# HTTP/2 у httpx требует пакет h2; без него клиент работает по HTTP/1.1
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Сколько вариантов прокси и User-Agent'а запрашивать одновременно
+PROBE_BATCH_SIZE = 8
+
+# Длина сериализованной разметки страницы (0, если документа нет)
+_PAGE_LENGTH_JS = "() => document.documentElement ? document.documentElement.outerHTML.length : 0"
+
+
+def _fingerprint(text: str) -> str:
+    """
+    Возвращает стабильный между запусками отпечаток строки (16 hex-символов).
+
+    Встроенный hash() для строк рандомизирован в каждом процессе (PYTHONHASHSEED),
+    поэтому для имен стратегий не подходит.
+    """
+    data = text.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
 
 
 class StrategyDiscovery:
     """Класс для исследования новых стратегий обхода защит."""
 
-    def __init__(self, strategy_handler: StrategyHandler):
+    def __init__(self, strategy_handler: "StrategyHandler", block_resources: bool = True):
+        """
+        Args:
+            strategy_handler: обработчик для сохранения найденных стратегий
+            block_resources: не загружать в браузере картинки, шрифты, медиа и стили
+        """
         self.strategy_handler = strategy_handler
+        self.block_resources = block_resources
+        # Имена уже сохраненных стратегий: повторно найденная стратегия не сохраняется
+        self._known_strategies: Set[str] = set(strategy_handler.get_strategy_names())
+        self._known_lock = threading.Lock()
+        # Статистика запросов по парам (прокси, User-Agent): ключ -> (успехи, попытки)
+        self._combo_stats: Dict[str, Tuple[int, int]] = dict(strategy_handler.get_probe_stats())
+        self._dirty_stats: Set[str] = set()
         self.experimental_approaches = [
             self._try_different_user_agents,
             self._try_playwright_with_interactions,
@@ -25,6 +83,17 @@ class StrategyDiscovery:
             self._try_viewport_changes,
         ]
 
+        # Все подходы выполняются в одном цикле событий в фоновом потоке. HTTP-клиенты
+        # и браузер создаются в этом цикле и переиспользуются между вызовами
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="strategy-discovery", daemon=True
+        )
+        self._loop_thread.start()
+        self._clients: Dict[Optional[FrozenSet], httpx.AsyncClient] = {}
+        self._playwright = AsyncPlaywrightPool()
+        atexit.register(self.close)
+
         # Базовые User-Agent'ы для экспериментов
         self.user_agents = [
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -54,7 +123,33 @@ class StrategyDiscovery:
             {"width": 1536, "height": 864},
         ]
 
-    def discover_new_strategy(self, url: str, context: Dict) -> Optional[str]:
+    def _run(self, coro: Awaitable) -> Any:
+        """Выполняет корутину в цикле событий объекта и возвращает ее результат."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self) -> None:
+        """Закрывает HTTP-клиенты и браузер и останавливает цикл событий."""
+        if self._loop.is_closed():
+            return
+        self._run(self._aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+    def reset(self) -> None:
+        """Забывает известные стратегии и статистику запросов (после очистки базы)."""
+        with self._known_lock:
+            self._known_strategies.clear()
+        self._combo_stats.clear()
+        self._dirty_stats.clear()
+
+    async def _aclose(self) -> None:
+        """Закрывает ресурсы, созданные в цикле событий."""
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+        await self._playwright.close()
+
+    def discover_new_strategy(self, url: str, context: Dict) -> Optional[Dict[str, Any]]:
         """
         Исследует новые стратегии обхода защит.
 
@@ -63,81 +158,116 @@ class StrategyDiscovery:
             context: Контекст запроса
 
         Returns:
-            Optional[str]: Название найденной стратегии или None
+            Optional[Dict[str, Any]]: Сохраненная стратегия ({"name": ..., "params": ...}) или None
         """
-        logger.log_event("strategy_discovery", "start", {"url": url, "context": context})
+        return self._run(self._discover(url, context))
 
-        # Перебираем экспериментальные подходы
-        for approach in self.experimental_approaches:
-            try:
-                strategy_name = approach(url, context)
-                if strategy_name:
-                    logger.log_event(
-                        "strategy_discovery",
-                        "success",
-                        {"url": url, "strategy": strategy_name, "approach": approach.__name__},
-                    )
-                    return strategy_name
-            except Exception as e:
-                logger.log_event(
-                    "strategy_discovery",
-                    "error",
-                    {"url": url, "approach": approach.__name__, "error": str(e)},
-                )
+    async def _discover(self, url: str, context: Dict) -> Optional[Dict[str, Any]]:
+        """Запускает все подходы одновременно; побеждает первый успешный."""
+        log_event_lazy("strategy_discovery", "start", lambda: {"url": url, "context": context})
 
-        logger.log_event("strategy_discovery", "failure", {"url": url, "context": context})
-        return None
+        tasks = {
+            asyncio.ensure_future(approach(url, context)): approach
+            for approach in self.experimental_approaches
+        }
 
-    def _try_different_user_agents(self, url: str, context: Dict) -> Optional[str]:
-        """Пробует разные User-Agent'ы."""
-        for user_agent in self.user_agents:
-            try:
-                headers = {**context.get("headers", {}), "User-Agent": user_agent}
-                response = requests.get(url, headers=headers, timeout=30)
+        def on_error(approach: Callable, error: BaseException) -> None:
+            log_event_lazy(
+                "strategy_discovery",
+                "error",
+                lambda: {"url": url, "approach": approach.__name__, "error": str(error)},
+            )
 
-                if self._is_successful_response(response):
-                    strategy_name = f"custom_user_agent_{hash(user_agent)}"
-                    self.strategy_handler.save_strategy(
-                        strategy_name, {"headers": {"User-Agent": user_agent}}, "custom_user_agent"
-                    )
-                    return strategy_name
-            except Exception as e:
-                logger.log_event(
-                    "strategy_discovery",
-                    "error",
-                    {"url": url, "approach": "user_agent", "error": str(e)},
-                )
+        found = await self._first_success(tasks, bool, on_error)
+        if found is not None:
+            approach, strategy = found
+            log_event_lazy(
+                "strategy_discovery",
+                "success",
+                lambda: {"url": url, "strategy": strategy["name"], "approach": approach.__name__},
+            )
+            return strategy
+
+        log_event_lazy("strategy_discovery", "failure", lambda: {"url": url, "context": context})
         return None
 
-    def _try_playwright_with_interactions(self, url: str, context: Dict) -> Optional[str]:
-        """Пробует Playwright с различными взаимодействиями."""
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
+    @staticmethod
+    async def _first_success(
+        tasks: Dict[asyncio.Future, Any],
+        is_success: Callable[[Any], bool],
+        on_error: Callable[[Any, BaseException], None],
+    ) -> Optional[Tuple[Any, Any]]:
+        """
+        Ждет задачи по мере завершения и возвращает первую успешную.
 
-            try:
+        Как только найден успешный результат, оставшиеся задачи отменяются.
+
+        Args:
+            tasks: задачи и связанные с ними метки
+            is_success: проверка результата задачи
+            on_error: обработчик исключения задачи (метка, исключение)
+
+        Returns:
+            Optional[Tuple]: (метка, результат) первой успешной задачи или None
+        """
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        on_error(tasks[task], task.exception())
+                    elif is_success(task.result()):
+                        return tasks[task], task.result()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            # gather забирает и исключения уже завершенных задач, которые не успели разобрать
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _try_different_user_agents(self, url: str, context: Dict) -> Optional[Dict[str, Any]]:
+        """Пробует разные User-Agent'ы (все запросы выполняются одновременно)."""
+        found = await self._probe_first_success(
+            url, context, [(None, ua) for ua in self.user_agents], "user_agent"
+        )
+        if found is None:
+            return None
+        _, user_agent = found
+        return self._save_once(
+            f"custom_user_agent_{_fingerprint(user_agent)}",
+            {"headers": {"User-Agent": user_agent}},
+            "custom_user_agent",
+        )
+
+    async def _try_playwright_with_interactions(
+        self, url: str, context: Dict
+    ) -> Optional[Dict[str, Any]]:
+        """Пробует Playwright с различными взаимодействиями."""
+        try:
+            async with self._playwright.page(block_resources=self.block_resources) as page:
                 # Устанавливаем случайный viewport
                 viewport = random.choice(self.viewports)
-                page.set_viewport_size(viewport)
+                await page.set_viewport_size(viewport)
 
                 # Добавляем случайные задержки
-                page.goto(url, wait_until="networkidle")
-                time.sleep(random.uniform(1, 3))
+                await goto_settled_async(page, url)
+                await asyncio.sleep(random.uniform(1, 3))
 
                 # Имитируем прокрутку
-                page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                time.sleep(random.uniform(0.5, 1.5))
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                await asyncio.sleep(random.uniform(0.5, 1.5))
 
                 # Имитируем клики
-                page.mouse.click(
+                await page.mouse.click(
                     random.randint(0, viewport["width"]), random.randint(0, viewport["height"])
                 )
 
-                if self._is_successful_response(page):
+                if await self._is_successful_page(page):
                     strategy_name = (
                         f"playwright_interactive_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
                     )
-                    self.strategy_handler.save_strategy(
+                    return self._save_once(
                         strategy_name,
                         {
                             "viewport": viewport,
@@ -146,98 +276,220 @@ class StrategyDiscovery:
                         },
                         "playwright_interactive",
                     )
-                    return strategy_name
-            except Exception as e:
-                logger.log_event(
-                    "strategy_discovery",
-                    "error",
-                    {"url": url, "approach": "playwright", "error": str(e)},
-                )
-            finally:
-                browser.close()
+        except Exception as e:
+            error = str(e)
+            log_event_lazy(
+                "strategy_discovery",
+                "error",
+                lambda: {"url": url, "approach": "playwright", "error": error},
+            )
         return None
 
-    def _try_proxy_combinations(self, url: str, context: Dict) -> Optional[str]:
-        """Пробует комбинации прокси и заголовков."""
-        for proxy in self.proxies:
-            for user_agent in self.user_agents:
-                try:
-                    headers = {**context.get("headers", {}), "User-Agent": user_agent}
-                    response = requests.get(url, headers=headers, proxies=proxy, timeout=30)
-
-                    if self._is_successful_response(response):
-                        strategy_name = f"proxy_headers_{hash(str(proxy) + user_agent)}"
-                        self.strategy_handler.save_strategy(
-                            strategy_name, {"headers": headers, "proxies": proxy}, "proxy_headers"
-                        )
-                        return strategy_name
-                except Exception as e:
-                    logger.log_event(
-                        "strategy_discovery",
-                        "error",
-                        {"url": url, "approach": "proxy_headers", "error": str(e)},
-                    )
-        return None
+    async def _try_proxy_combinations(self, url: str, context: Dict) -> Optional[Dict[str, Any]]:
+        """Пробует комбинации прокси и заголовков (все запросы выполняются одновременно)."""
+        found = await self._probe_first_success(
+            url, context, list(product(self.proxies, self.user_agents)), "proxy_headers"
+        )
+        if found is None:
+            return None
+        proxy, user_agent = found
+        headers = {**context.get("headers", {}), "User-Agent": user_agent}
+        return self._save_once(
+            f"proxy_headers_{_fingerprint(str(proxy) + user_agent)}",
+            {"headers": headers, "proxies": proxy},
+            "proxy_headers",
+        )
 
-    def _try_geolocation_emulation(self, url: str, context: Dict) -> Optional[str]:
-        """Пробует эмуляцию геолокации через Playwright."""
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                geolocation=random.choice(self.geolocations), locale="en-US"
+    def _save_once(
+        self, strategy_name: str, strategy_params: Dict[str, Any], protection_type: str
+    ) -> Dict[str, Any]:
+        """
+        Сохраняет стратегию, если стратегия с таким именем еще не сохранена.
+
+        Args:
+            strategy_name: Название стратегии
+            strategy_params: Параметры стратегии
+            protection_type: Тип защиты
+
+        Returns:
+            Dict[str, Any]: Стратегия в виде {"name": ..., "params": ...}
+        """
+        strategy = {"name": strategy_name, "params": strategy_params}
+        with self._known_lock:
+            if strategy_name in self._known_strategies:
+                return strategy
+            self._known_strategies.add(strategy_name)
+        self.strategy_handler.save_strategy(strategy_name, strategy_params, protection_type)
+        return strategy
+
+    def _client_for(self, proxy: Optional[Dict[str, str]]) -> httpx.AsyncClient:
+        """
+        Возвращает общий AsyncClient для прокси (создается при первом обращении).
+
+        Args:
+            proxy: прокси в формате requests ({"http": url}) или None
+
+        Returns:
+            httpx.AsyncClient: клиент с пулом keep-alive соединений
+        """
+        key = frozenset(proxy.items()) if proxy else None
+        client = self._clients.get(key)
+        if client is None:
+            mounts = {
+                f"{scheme}://": httpx.AsyncHTTPTransport(proxy=proxy_url, http2=_HTTP2)
+                for scheme, proxy_url in (proxy or {}).items()
+            }
+            client = self._clients[key] = httpx.AsyncClient(
+                http2=_HTTP2,
+                limits=httpx.Limits(max_keepalive_connections=64),
+                mounts=mounts,
             )
-            page = context.new_page()
+        return client
+
+    @staticmethod
+    def _combo_key(proxy: Optional[Dict[str, str]], user_agent: str) -> str:
+        """Возвращает ключ статистики для пары (прокси, User-Agent)."""
+        return f"{proxy}|{user_agent}"
+
+    def _success_rate(self, proxy: Optional[Dict[str, str]], user_agent: str) -> float:
+        """Оценка вероятности успеха пары (со сглаживанием Лапласа для новых пар)."""
+        successes, attempts = self._combo_stats.get(self._combo_key(proxy, user_agent), (0, 0))
+        return (successes + 1) / (attempts + 2)
+
+    def _record_probe(self, proxy: Optional[Dict[str, str]], user_agent: str, ok: bool) -> None:
+        """Учитывает результат запроса в статистике пары."""
+        key = self._combo_key(proxy, user_agent)
+        successes, attempts = self._combo_stats.get(key, (0, 0))
+        self._combo_stats[key] = (successes + ok, attempts + 1)
+        self._dirty_stats.add(key)
+
+    def _flush_probe_stats(self) -> None:
+        """Сохраняет изменившуюся статистику через strategy_handler."""
+        if not self._dirty_stats:
+            return
+        changed = {key: self._combo_stats[key] for key in self._dirty_stats}
+        self._dirty_stats.clear()
+        self.strategy_handler.save_probe_stats(changed)
+
+    async def _probe_first_success(
+        self,
+        url: str,
+        context: Dict,
+        variants: List[Tuple[Optional[Dict[str, str]], str]],
+        approach: str,
+    ) -> Optional[Tuple[Optional[Dict[str, str]], str]]:
+        """
+        Запрашивает URL с вариантами прокси и User-Agent'а, начиная с самых успешных.
+
+        Варианты сортируются по накопленной доле успехов и запускаются пачками по
+        PROBE_BATCH_SIZE одновременных запросов; как только приходит первый успешный
+        ответ, оставшиеся запросы отменяются.
+
+        Args:
+            url: URL для исследования
+            context: Контекст запроса (из него берутся базовые заголовки)
+            variants: пары (прокси, User-Agent)
+            approach: название подхода для журнала ошибок
 
+        Returns:
+            Optional[Tuple]: первая успешная пара (прокси, User-Agent) или None
+        """
+        # Заголовки собираются один раз на User-Agent и общие для всех прокси. Общий
+        # изменяемый словарь здесь не подходит: запросы стартуют уже после цикла
+        base_headers = context.get("headers", {})
+        headers_by_ua = {
+            ua: {**base_headers, "User-Agent": ua} for ua in dict.fromkeys(ua for _, ua in variants)
+        }
+
+        async def probe(proxy: Optional[Dict[str, str]], user_agent: str) -> bool:
             try:
-                page.goto(url, wait_until="networkidle")
+                response = await self._client_for(proxy).get(
+                    url, headers=headers_by_ua[user_agent], timeout=30
+                )
+            except Exception:
+                self._record_probe(proxy, user_agent, False)
+                raise
+            ok = self._is_successful_response(response)
+            self._record_probe(proxy, user_agent, ok)
+            return ok
+
+        def on_error(variant: Tuple, error: BaseException) -> None:
+            log_event_lazy(
+                "strategy_discovery",
+                "error",
+                lambda: {"url": url, "approach": approach, "error": str(error)},
+            )
+
+        # sorted устойчив: при равной статистике сохраняется исходный порядок
+        ranked = sorted(variants, key=lambda variant: -self._success_rate(*variant))
+        try:
+            for start in range(0, len(ranked), PROBE_BATCH_SIZE):
+                tasks = {
+                    asyncio.ensure_future(probe(*variant)): variant
+                    for variant in ranked[start : start + PROBE_BATCH_SIZE]
+                }
+                found = await self._first_success(tasks, bool, on_error)
+                if found is not None:
+                    return found[0]
+            return None
+        finally:
+            self._flush_probe_stats()
 
-                if self._is_successful_response(page):
+    async def _try_geolocation_emulation(self, url: str, context: Dict) -> Optional[Dict[str, Any]]:
+        """Пробует эмуляцию геолокации через Playwright."""
+        geolocation = random.choice(self.geolocations)
+        try:
+            async with self._playwright.page(
+                block_resources=self.block_resources, geolocation=geolocation, locale="en-US"
+            ) as page:
+                await goto_settled_async(page, url)
+
+                if await self._is_successful_page(page):
                     strategy_name = f"geolocation_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    self.strategy_handler.save_strategy(
+                    return self._save_once(
                         strategy_name,
-                        {"geolocation": page.context.geolocation, "locale": "en-US"},
+                        {"geolocation": geolocation, "locale": "en-US"},
                         "geolocation",
                     )
-                    return strategy_name
-            except Exception as e:
-                logger.log_event(
-                    "strategy_discovery",
-                    "error",
-                    {"url": url, "approach": "geolocation", "error": str(e)},
-                )
-            finally:
-                browser.close()
+        except Exception as e:
+            error = str(e)
+            log_event_lazy(
+                "strategy_discovery",
+                "error",
+                lambda: {"url": url, "approach": "geolocation", "error": error},
+            )
         return None
 
-    def _try_viewport_changes(self, url: str, context: Dict) -> Optional[str]:
+    async def _try_viewport_changes(self, url: str, context: Dict) -> Optional[Dict[str, Any]]:
         """Пробует разные разрешения экрана."""
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-
-            for viewport in self.viewports:
-                try:
-                    page = browser.new_page()
-                    page.set_viewport_size(viewport)
-                    page.goto(url, wait_until="networkidle")
+        for viewport in self.viewports:
+            try:
+                async with self._playwright.page(
+                    block_resources=self.block_resources, viewport=viewport
+                ) as page:
+                    await goto_settled_async(page, url)
 
-                    if self._is_successful_response(page):
+                    if await self._is_successful_page(page):
                         strategy_name = f"viewport_{viewport['width']}x{viewport['height']}"
-                        self.strategy_handler.save_strategy(
-                            strategy_name, {"viewport": viewport}, "viewport"
-                        )
-                        return strategy_name
-                except Exception as e:
-                    logger.log_event(
-                        "strategy_discovery",
-                        "error",
-                        {"url": url, "approach": "viewport", "error": str(e)},
-                    )
-            browser.close()
+                        return self._save_once(strategy_name, {"viewport": viewport}, "viewport")
+            except Exception as e:
+                error = str(e)
+                log_event_lazy(
+                    "strategy_discovery",
+                    "error",
+                    lambda: {"url": url, "approach": "viewport", "error": error},
+                )
         return None
 
     def _is_successful_response(self, response) -> bool:
-        """Проверяет успешность ответа."""
-        if isinstance(response, requests.Response):
-            return response.status_code == 200 and len(response.text) > 0
-        else:  # Playwright page
-            return len(response.content()) > 0
+        """Проверяет успешность HTTP-ответа."""
+        return response.status_code == 200 and len(response.text) > 0
+
+    async def _is_successful_page(self, page) -> bool:
+        """
+        Проверяет, что страница Playwright загрузилась с содержимым.
+
+        Длина разметки считается в браузере: page.content() передавал бы весь DOM
+        через CDP только ради проверки на пустоту.
+        """
+        return await page.evaluate(_PAGE_LENGTH_JS) > 0
@@ -2,14 +2,41 @@
 Модуль для управления стратегиями обхода защит.
 """
 
-from typing import Optional, Dict, Any
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
-from sqlalchemy import create_engine, Column, String, JSON, DateTime
+from sqlalchemy import create_engine, event, case, or_, Column, String, JSON, DateTime, Integer
+from sqlalchemy import Float, Index, delete, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from src.logger import logger
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+from src.logger import log_event_lazy
 from src.protections.strategy_discovery import StrategyDiscovery
-from src.protections.strategy_selector import StrategySelector
+from src.protections.strategy_selector import get_selector
+
+# Путь к базе в памяти: данные не пишутся на диск и живут, пока жив обработчик (для тестов)
+IN_MEMORY_DB = ":memory:"
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj: Any) -> str:
+        """Сериализует параметры стратегии в JSON через orjson."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+except ImportError:  # pragma: no cover - запасной вариант на стандартном json
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> str:
+        """Сериализует параметры стратегии в JSON."""
+        return json.dumps(obj, ensure_ascii=False)
+
 
 Base = declarative_base()
 
@@ -23,20 +50,76 @@ class ProtectionStrategy(Base):
     protection_type = Column(String)
     strategy_name = Column(String)
     strategy_params = Column(JSON)
-    success_count = Column(JSON, default=0)
-    last_used = Column(DateTime)
+    success_count = Column(Integer, default=0, nullable=False)
+    # Время последнего использования в секундах Unix; в datetime переводится только при выводе
+    last_used = Column(Float)
     created_at = Column(DateTime, default=datetime.now)
 
 
+# Лучшая стратегия типа защиты выбирается по индексу, без сортировки всех строк
+_PROTECTION_SUCCESS_INDEX = Index(
+    "ix_proto_succ", ProtectionStrategy.protection_type, ProtectionStrategy.success_count.desc()
+)
+
+
+class ProbeStats(Base):
+    """Модель для хранения статистики запросов по парам (прокси, User-Agent)."""
+
+    __tablename__ = "probe_stats"
+
+    id = Column(String, primary_key=True)
+    successes = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Настраивает новое соединение SQLite: WAL, кэш страниц 64 МБ, временные данные в памяти."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.close()
+
+
 class StrategyHandler:
     """Класс для управления стратегиями обхода защит."""
 
-    def __init__(self, db_path: str = "data/strategies.db"):
-        self.engine = create_engine(f"sqlite:///{db_path}")
+    def __init__(
+        self, db_path: str = "data/strategies.db", cache_size: int = 256, cache_ttl: float = 300
+    ):
+        """
+        Args:
+            db_path: путь к базе SQLite со стратегиями или IN_MEMORY_DB
+            cache_size: сколько найденных стратегий держать в памяти (0 — без кэша)
+            cache_ttl: время жизни закэшированной стратегии в секундах
+        """
+        # Соединения SQLite держатся в пуле и не переоткрываются на каждый запрос:
+        # кэш страниц соединения сохраняется между поисками стратегий. База в памяти
+        # существует только внутри своего соединения, поэтому для нее соединение одно
+        self.engine = create_engine(
+            f"sqlite:///{db_path}",
+            poolclass=StaticPool if db_path == IN_MEMORY_DB else QueuePool,
+            connect_args={"check_same_thread": False},
+            # Колонки JSON (strategy_params) кодируются через orjson, если он установлен
+            json_serializer=_json_dumps,
+            json_deserializer=_json_loads,
+        )
+        event.listen(self.engine, "connect", _set_sqlite_pragmas)
         Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        # create_all не добавляет индексы в уже существующие таблицы
+        _PROTECTION_SUCCESS_INDEX.create(self.engine, checkfirst=True)
+        # Сессия на поток; объекты остаются доступны после commit без повторного запроса
+        self.Session = scoped_session(sessionmaker(bind=self.engine, expire_on_commit=False))
         self.discovery = StrategyDiscovery(self)
-        self.selector = StrategySelector(db_path)
+        self.selector = get_selector()
+
+        # Кэш find_strategy: тип защиты -> (время записи, стратегия); сбрасывается
+        # при сохранении стратегии и обновлении статистики этого типа защиты
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._strategy_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
         # Стандартные стратегии для известных типов защит
         self.default_strategies = {
@@ -54,55 +137,83 @@ class StrategyHandler:
             },
         }
 
+    def _cache_get(self, protection_type: str) -> Optional[Dict[str, Any]]:
+        """Возвращает стратегию из кэша, если запись не устарела."""
+        with self._cache_lock:
+            entry = self._strategy_cache.get(protection_type)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.cache_ttl:
+                del self._strategy_cache[protection_type]
+                return None
+            self._strategy_cache.move_to_end(protection_type)
+            return entry[1]
+
+    def _cache_put(self, protection_type: str, strategy: Dict[str, Any]) -> None:
+        """Кладет стратегию в кэш, вытесняя самую давно использованную запись."""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._strategy_cache[protection_type] = (time.monotonic(), strategy)
+            self._strategy_cache.move_to_end(protection_type)
+            if len(self._strategy_cache) > self.cache_size:
+                self._strategy_cache.popitem(last=False)
+
+    def _cache_invalidate(self, protection_type: str) -> None:
+        """Удаляет стратегию типа защиты из кэша."""
+        with self._cache_lock:
+            self._strategy_cache.pop(protection_type, None)
+
     def find_strategy(self, protection_type: str, url: str) -> Optional[Dict[str, Any]]:
         """
         Ищет подходящую стратегию для типа защиты.
 
+        Найденная стратегия кэшируется по типу защиты на cache_ttl секунд.
+
         Args:
             protection_type: Тип защиты
-            url: URL для проверки
+            url: URL для проверки (нужен только для поиска новой стратегии)
 
         Returns:
             Optional[Dict[str, Any]]: Найденная стратегия или None
         """
-        session = self.Session()
-        try:
-            # Пробуем найти лучшую стратегию через селектор
+        strategy = self._cache_get(protection_type)
+        if strategy is None:
+            strategy = self._find_strategy_uncached(protection_type, url)
+            if strategy is not None:
+                self._cache_put(protection_type, strategy)
+        return strategy
+
+    def _find_strategy_uncached(self, protection_type: str, url: str) -> Optional[Dict[str, Any]]:
+        """Ищет стратегию через селектор, в базе, среди стандартных или открывает новую."""
+        with self.Session() as session:
+            # Одним запросом: стратегия, выбранная селектором, а если ее нет в базе —
+            # самая успешная сохраненная стратегия этого типа защиты
+            query = session.query(ProtectionStrategy)
             best_strategy_name = self.selector.get_best_strategy(protection_type)
             if best_strategy_name:
-                strategy = (
-                    session.query(ProtectionStrategy)
-                    .filter_by(strategy_name=best_strategy_name)
-                    .first()
-                )
-
-                if strategy:
-                    logger.log_event(
-                        "strategy",
-                        "found",
-                        {"type": protection_type, "strategy": strategy.strategy_name},
-                    )
-                    return {"name": strategy.strategy_name, "params": strategy.strategy_params}
-
-            # Ищем сохраненную стратегию
-            strategy = (
-                session.query(ProtectionStrategy).filter_by(protection_type=protection_type).first()
-            )
+                is_best = ProtectionStrategy.strategy_name == best_strategy_name
+                query = query.filter(
+                    or_(is_best, ProtectionStrategy.protection_type == protection_type)
+                ).order_by(case((is_best, 0), else_=1))
+            else:
+                query = query.filter(ProtectionStrategy.protection_type == protection_type)
+            strategy = query.order_by(ProtectionStrategy.success_count.desc()).first()
 
             if strategy:
-                logger.log_event(
+                log_event_lazy(
                     "strategy",
                     "found",
-                    {"type": protection_type, "strategy": strategy.strategy_name},
+                    lambda: {"type": protection_type, "strategy": strategy.strategy_name},
                 )
                 return {"name": strategy.strategy_name, "params": strategy.strategy_params}
 
             # Пробуем стандартную стратегию
             if protection_type in self.default_strategies:
-                logger.log_event(
+                log_event_lazy(
                     "strategy",
                     "default",
-                    {
+                    lambda: {
                         "type": protection_type,
                         "strategy": self.default_strategies[protection_type]["name"],
                     },
@@ -110,22 +221,73 @@ class StrategyHandler:
                 return self.default_strategies[protection_type]
 
             # Если ничего не найдено, пробуем открыть новую стратегию
-            logger.log_event("strategy", "not_found", {"type": protection_type, "url": url})
+            log_event_lazy("strategy", "not_found", lambda: {"type": protection_type, "url": url})
 
             new_strategy = self.discovery.discover_new_strategy(
                 url, {"protection_type": protection_type}
             )
             if new_strategy:
-                logger.log_event(
-                    "strategy", "discovered", {"type": protection_type, "strategy": new_strategy}
+                log_event_lazy(
+                    "strategy",
+                    "discovered",
+                    lambda: {"type": protection_type, "strategy": new_strategy["name"]},
                 )
-                return self.find_strategy(
-                    protection_type, url
-                )  # Повторно ищем сохраненную стратегию
+                # Стратегия уже сохранена: возвращаем ее без повторного поиска в базе,
+                # find_strategy положит ее в кэш этого типа защиты
+                self._cache_invalidate(protection_type)
+                return new_strategy
 
             return None
-        finally:
-            session.close()
+
+    def get_strategy_names(self) -> List[str]:
+        """
+        Возвращает названия всех сохраненных стратегий.
+
+        Returns:
+            List[str]: Названия стратегий
+        """
+        with self.Session() as session:
+            return [name for (name,) in session.query(ProtectionStrategy.strategy_name)]
+
+    def get_probe_stats(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Возвращает статистику запросов по парам (прокси, User-Agent).
+
+        Returns:
+            Dict[str, Tuple[int, int]]: ключ пары -> (успехи, попытки)
+        """
+        with self.Session() as session:
+            return {
+                stats.id: (stats.successes or 0, stats.attempts or 0)
+                for stats in session.query(ProbeStats)
+            }
+
+    def save_probe_stats(self, stats: Dict[str, Tuple[int, int]]) -> None:
+        """
+        Сохраняет статистику запросов по парам (прокси, User-Agent).
+
+        Args:
+            stats: ключ пары -> (успехи, попытки)
+        """
+        with self.Session() as session:
+            for key, (successes, attempts) in stats.items():
+                session.merge(ProbeStats(id=key, successes=successes, attempts=attempts))
+            session.commit()
+
+    def reset(self) -> None:
+        """
+        Удаляет все сохраненные стратегии и статистику запросов и очищает кэши.
+
+        Движок, пул соединений и фоновые ресурсы поиска стратегий сохраняются,
+        поэтому один обработчик можно переиспользовать между тестами.
+        """
+        with self.Session() as session:
+            session.execute(delete(ProtectionStrategy))
+            session.execute(delete(ProbeStats))
+            session.commit()
+        with self._cache_lock:
+            self._strategy_cache.clear()
+        self.discovery.reset()
 
     def save_strategy(
         self, strategy_name: str, strategy_params: Dict[str, Any], protection_type: str
@@ -138,23 +300,59 @@ class StrategyHandler:
             strategy_params: Параметры стратегии
             protection_type: Тип защиты
         """
-        session = self.Session()
-        try:
-            strategy = ProtectionStrategy(
-                id=f"{protection_type}_{strategy_name}",
-                protection_type=protection_type,
-                strategy_name=strategy_name,
-                strategy_params=strategy_params,
-                last_used=datetime.now(),
-            )
-            session.add(strategy)
+        self.save_strategies(
+            [
+                {
+                    "strategy_name": strategy_name,
+                    "strategy_params": strategy_params,
+                    "protection_type": protection_type,
+                }
+            ]
+        )
+
+    def save_strategies(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Сохраняет пачку стратегий одной транзакцией.
+
+        Все строки передаются одним INSERT ... ON CONFLICT (executemany): стратегия
+        с уже существующим id не вызывает ошибку, а обновляет параметры и время
+        последнего использования.
+
+        Args:
+            rows: словари с ключами strategy_name, strategy_params и protection_type
+        """
+        if not rows:
+            return
+        now = time.time()
+        values = [
+            {
+                "id": f"{row['protection_type']}_{row['strategy_name']}",
+                "protection_type": row["protection_type"],
+                "strategy_name": row["strategy_name"],
+                "strategy_params": row["strategy_params"],
+                "last_used": now,
+            }
+            for row in rows
+        ]
+        statement = sqlite_insert(ProtectionStrategy)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProtectionStrategy.id],
+            set_={
+                "strategy_params": statement.excluded.strategy_params,
+                "last_used": statement.excluded.last_used,
+            },
+        )
+        with self.Session() as session:
+            session.execute(statement, values)
             session.commit()
 
-            logger.log_event(
-                "strategy", "saved", {"type": protection_type, "strategy": strategy_name}
+        for row in rows:
+            self._cache_invalidate(row["protection_type"])
+            log_event_lazy(
+                "strategy",
+                "saved",
+                lambda: {"type": row["protection_type"], "strategy": row["strategy_name"]},
             )
-        finally:
-            session.close()
 
     def update_strategy_stats(self, strategy_id: str, success: bool, time_taken: float) -> None:
         """
@@ -165,19 +363,33 @@ class StrategyHandler:
             success: Успешность применения
             time_taken: Время выполнения в секундах
         """
-        session = self.Session()
-        try:
-            strategy = session.query(ProtectionStrategy).filter_by(id=strategy_id).first()
-            if strategy:
-                # Обновляем статистику в базе стратегий
-                strategy.success_count = strategy.success_count or 0
-                strategy.success_count += 1 if success else 0
-                strategy.last_used = datetime.now()
-                session.commit()
-
-                # Обновляем статистику в селекторе
-                self.selector.evaluate_strategy_result(
-                    strategy.strategy_name, success, time_taken, strategy.protection_type
+        self.update_strategy_stats_bulk(strategy_id, int(success))
+
+    def update_strategy_stats_bulk(self, strategy_id: str, successes: int) -> None:
+        """
+        Учитывает пачку применений стратегии одним UPDATE.
+
+        В базе хранятся только число успехов и время последнего использования,
+        поэтому для пачки достаточно числа успешных применений.
+
+        Args:
+            strategy_id: ID стратегии (вида "<тип защиты>_<название>")
+            successes: число успешных применений в пачке
+        """
+        with self.Session() as session:
+            # Обновляем статистику в базе стратегий одним UPDATE без предварительного SELECT;
+            # RETURNING сразу отдает тип защиты для сброса кэша
+            row = session.execute(
+                update(ProtectionStrategy)
+                .where(ProtectionStrategy.id == strategy_id)
+                .values(
+                    success_count=ProtectionStrategy.success_count + successes,
+                    last_used=time.time(),
                 )
-        finally:
-            session.close()
+                .returning(ProtectionStrategy.protection_type)
+            ).first()
+            session.commit()
+
+        if row:
+            # Порядок стратегий по success_count изменился; правила селектора статичны
+            self._cache_invalidate(row.protection_type)
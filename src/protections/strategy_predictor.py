@@ -4,16 +4,40 @@
 
 import os
 import pickle
-from typing import Dict, Optional
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 from sklearn.preprocessing import LabelEncoder
 from src.logger import logger
 
+try:
+    import treelite
+    import treelite.sklearn
+    import treelite_runtime
+except ImportError:  # pragma: no cover - treelite не обязателен, используется модель sklearn
+    treelite = None
+    treelite_runtime = None
+
+DEFAULT_MODEL_PATH = "models/strategy_model.pkl"
+
+# Загруженные модели: (путь, mtime файла) -> (модель, энкодеры); экземпляры с тем же
+# файлом разделяют один объект леса вместо повторной распаковки pickle
+_MODEL_CACHE: Dict[Tuple[str, float], Tuple[Any, Dict]] = {}
+_model_cache_lock = threading.Lock()
+
+
+def _cache_model(path: str, mtime: float, model: Any, encoders: Dict) -> None:
+    """Кладет модель в кэш, вытесняя записи для прежних версий того же файла."""
+    with _model_cache_lock:
+        for key in [key for key in _MODEL_CACHE if key[0] == path]:
+            del _MODEL_CACHE[key]
+        _MODEL_CACHE[(path, mtime)] = (model, encoders)
+
 
 class StrategyPredictor:
     """Класс для ML-предсказания стратегий."""
 
-    def __init__(self, model_path: str = "models/strategy_model.pkl"):
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH):
         """
         Инициализация предиктора.
 
@@ -32,6 +56,12 @@ class StrategyPredictor:
             "time_of_day",
         ]
         self.encoders = {}
+        # Таблицы кодирования категорий: признак -> {значение: код}; строятся по encoders
+        self._class_to_code: Dict[str, Dict[Any, int]] = {}
+        self._tables_source = None
+        # Скомпилированный treelite лес и модель, из которой он собран
+        self._compiled = None
+        self._compiled_for = None
 
         # Загружаем модель, если она существует
         if os.path.exists(model_path):
@@ -40,16 +70,103 @@ class StrategyPredictor:
     def _load_model(self) -> None:
         """Загружает модель и энкодеры."""
         try:
-            with open(self.model_path, "rb") as f:
-                data = pickle.load(f)
-                self.model = data["model"]
-                self.encoders = data.get("encoders", {})
+            mtime = os.path.getmtime(self.model_path)
+            cached = _MODEL_CACHE.get((self.model_path, mtime))
+            if cached is not None:
+                self.model, self.encoders = cached
+            else:
+                with open(self.model_path, "rb") as f:
+                    data = pickle.load(f)
+                    self.model = data["model"]
+                    self.encoders = data.get("encoders", {})
+                _cache_model(self.model_path, mtime, self.model, self.encoders)
 
-            logger.info("ML модель успешно загружена")
+                logger.info("ML модель успешно загружена")
 
         except Exception as e:
             logger.error(f"Ошибка загрузки ML модели: {e}")
             self.model = None
+            return
+
+        self._load_compiled(mtime)
+
+    @property
+    def compiled_path(self) -> str:
+        """Путь к библиотеке со скомпилированной treelite моделью."""
+        return os.path.splitext(self.model_path)[0] + ".so"
+
+    def _load_compiled(self, model_mtime: float) -> None:
+        """
+        Загружает скомпилированную модель, если она собрана не раньше pickle-файла.
+
+        Более старая библиотека относится к предыдущей версии модели (например,
+        до дообучения) и игнорируется.
+        """
+        path = self.compiled_path
+        if treelite_runtime is None or not os.path.exists(path):
+            return
+        if os.path.getmtime(path) < model_mtime:
+            logger.info("Скомпилированная ML модель устарела, используется модель sklearn")
+            return
+        try:
+            self._compiled = treelite_runtime.Predictor(path, verbose=False)
+            self._compiled_for = self.model
+            logger.info("Загружена скомпилированная ML модель")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки скомпилированной ML модели: {e}")
+            self._compiled = None
+
+    def compile_model(self) -> bool:
+        """
+        Компилирует лес решающих деревьев в библиотеку treelite рядом с моделью.
+
+        Returns:
+            bool: True, если библиотека собрана и загружена
+        """
+        if treelite is None or not hasattr(self.model, "estimators_"):
+            return False
+        try:
+            compiled = treelite.sklearn.import_model(self.model)
+            compiled.export_lib(toolchain="gcc", libpath=self.compiled_path, verbose=False)
+            self._compiled = treelite_runtime.Predictor(self.compiled_path, verbose=False)
+            self._compiled_for = self.model
+            logger.info(f"ML модель скомпилирована в {self.compiled_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка компиляции ML модели: {e}")
+            return False
+
+    def _predict(self, features: np.ndarray) -> List[str]:
+        """
+        Предсказывает классы для матрицы признаков.
+
+        Скомпилированная модель используется, только пока self.model не заменен
+        (например, дообучением); она возвращает вероятности классов, а метки
+        берутся из classes_ исходной модели.
+        """
+        if self._compiled is not None and self._compiled_for is self.model:
+            scores = self._compiled.predict(treelite_runtime.DMatrix(features))
+            if scores.ndim == 1:
+                indices = (scores > 0.5).astype(np.intp)
+            else:
+                indices = scores.argmax(axis=1)
+            return self.model.classes_[indices].tolist()
+        return self.model.predict(features).tolist()
+
+    def _encoding_tables(self) -> Dict[str, Dict[Any, int]]:
+        """
+        Возвращает таблицы кодирования категориальных признаков.
+
+        Код значения совпадает с результатом encoder.transform (позиция в classes_);
+        таблицы перестраиваются, только если словарь encoders был заменен.
+        """
+        if self._tables_source is not self.encoders:
+            self._class_to_code = {
+                feature: {value: code for code, value in enumerate(encoder.classes_)}
+                for feature, encoder in self.encoders.items()
+            }
+            self._tables_source = self.encoders
+        return self._class_to_code
 
     def predict_best_strategy(self, context: Dict) -> Optional[str]:
         """
@@ -61,34 +178,49 @@ class StrategyPredictor:
         Returns:
             Optional[str]: Название стратегии или None
         """
-        if not self.model:
-            return None
+        return self.predict_best_strategy_batch([context])[0]
 
-        try:
-            # Подготавливаем признаки
-            features = []
-            for feature in self.feature_names:
-                value = context.get(feature, "")
+    def predict_best_strategy_batch(self, contexts: List[Dict]) -> List[Optional[str]]:
+        """
+        Предсказывает лучшие стратегии для набора контекстов одним вызовом модели.
 
-                # Кодируем категориальные признаки
-                if feature in self.encoders:
-                    encoder = self.encoders[feature]
-                    if value not in encoder.classes_:
-                        value = encoder.classes_[0]  # Используем первый класс как дефолтный
-                    value = encoder.transform([value])[0]
+        Args:
+            contexts: Список словарей с признаками
 
-                features.append(value)
+        Returns:
+            List[Optional[str]]: Названия стратегий (None для всех, если модели нет
+            или предсказание не удалось)
+        """
+        if not self.model or not contexts:
+            return [None] * len(contexts)
+
+        try:
+            # Заполняем матрицу признаков сразу для всех контекстов, по колонке на признак
+            names = self.feature_names
+            tables = self._encoding_tables()
+            features = np.empty((len(contexts), len(names)), dtype=np.float32)
+            for column, feature in enumerate(names):
+                codes = tables.get(feature)
+                if codes is None:
+                    features[:, column] = [context.get(feature, 0) for context in contexts]
+                else:
+                    # Неизвестные значения получают код первого класса как дефолтного
+                    features[:, column] = [
+                        codes.get(context.get(feature, ""), 0) for context in contexts
+                    ]
 
-            # Делаем предсказание
-            features = np.array(features).reshape(1, -1)
-            strategy = self.model.predict(features)[0]
+            # Делаем предсказание для всей пачки
+            strategies = self._predict(features)
 
-            logger.info(f"ML модель предсказала стратегию: {strategy}")
-            return strategy
+            if len(strategies) == 1:
+                logger.info(f"ML модель предсказала стратегию: {strategies[0]}")
+            else:
+                logger.info(f"ML модель предсказала стратегии для {len(strategies)} контекстов")
+            return strategies
 
         except Exception as e:
             logger.error(f"Ошибка предсказания стратегии: {e}")
-            return None
+            return [None] * len(contexts)
 
     def save_model(self) -> None:
         """Сохраняет модель и энкодеры."""
@@ -99,8 +231,40 @@ class StrategyPredictor:
             # Сохраняем модель и энкодеры
             with open(self.model_path, "wb") as f:
                 pickle.dump({"model": self.model, "encoders": self.encoders}, f)
+            _cache_model(
+                self.model_path, os.path.getmtime(self.model_path), self.model, self.encoders
+            )
 
             logger.info("ML модель успешно сохранена")
 
         except Exception as e:
             logger.error(f"Ошибка сохранения ML модели: {e}")
+
+
+# Общие экземпляры предиктора по пути к модели
+_instances: Dict[str, StrategyPredictor] = {}
+_instances_lock = threading.Lock()
+
+
+def get_predictor(model_path: str = DEFAULT_MODEL_PATH) -> StrategyPredictor:
+    """
+    Возвращает общий для процесса экземпляр StrategyPredictor.
+
+    Модель загружается с диска один раз на путь; создание экземпляра защищено
+    блокировкой, поэтому функцию можно вызывать из разных потоков. Сам экземпляр
+    разделяется между потребителями (ABTester, OnlineTrainer): дообучение модели
+    в одном из них сразу видно остальным.
+
+    Args:
+        model_path: Путь к сохраненной модели
+
+    Returns:
+        StrategyPredictor: общий экземпляр предиктора
+    """
+    predictor = _instances.get(model_path)
+    if predictor is None:
+        with _instances_lock:
+            predictor = _instances.get(model_path)
+            if predictor is None:
+                predictor = _instances[model_path] = StrategyPredictor(model_path)
+    return predictor
@@ -2,21 +2,31 @@
 Модуль для выбора стратегий обхода защиты на основе правил.
 """
 
-from typing import Dict, Optional
+from functools import cache
+from typing import Dict, Optional, Tuple
 from src.logger import logger
 
+# Стратегии для каждого типа защиты, от лучшей к худшей
+_STRATEGIES: Dict[str, Tuple[str, ...]] = {
+    "cloudflare": ("playwright_interactive", "selenium_stealth", "requests_rotating_proxy"),
+    "ddos_guard": ("selenium_stealth", "playwright_interactive", "requests_rotating_proxy"),
+    "recaptcha": ("playwright_interactive", "selenium_stealth"),
+    "ip_block": ("requests_rotating_proxy", "selenium_stealth"),
+}
+
+# Первая (лучшая) стратегия каждого типа защиты
+_BEST: Dict[str, str] = {
+    protection_type: names[0] for protection_type, names in _STRATEGIES.items()
+}
+
 
 class StrategySelector:
     """Класс для выбора стратегий обхода защиты."""
 
     def __init__(self):
         """Инициализация селектора стратегий."""
-        self.strategies = {
-            "cloudflare": ["playwright_interactive", "selenium_stealth", "requests_rotating_proxy"],
-            "ddos_guard": ["selenium_stealth", "playwright_interactive", "requests_rotating_proxy"],
-            "recaptcha": ["playwright_interactive", "selenium_stealth"],
-            "ip_block": ["requests_rotating_proxy", "selenium_stealth"],
-        }
+        self.strategies = _STRATEGIES
+        self._best = _BEST
 
     def get_best_strategy(self, protection_type: str) -> str:
         """
@@ -28,18 +38,20 @@ class StrategySelector:
         Returns:
             str: Название стратегии
         """
-        try:
-            # Получаем список стратегий для данного типа защиты
-            strategies = self.strategies.get(protection_type, [])
+        best = self._best.get(protection_type)
+        if best is None:
+            # Если тип защиты неизвестен, используем стандартную стратегию
+            logger.warning(f"Неизвестный тип защиты: {protection_type}")
+            return "selenium_stealth"
+        return best
 
-            if not strategies:
-                # Если тип защиты неизвестен, используем стандартную стратегию
-                logger.warning(f"Неизвестный тип защиты: {protection_type}")
-                return "selenium_stealth"
 
-            # Возвращаем первую (лучшую) стратегию из списка
-            return strategies[0]
+@cache
+def get_selector() -> StrategySelector:
+    """
+    Возвращает общий для процесса экземпляр StrategySelector.
 
-        except Exception as e:
-            logger.error(f"Ошибка выбора стратегии: {e}")
-            return "selenium_stealth"
+    Returns:
+        StrategySelector: общий экземпляр селектора
+    """
+    return StrategySelector()
@@ -1,8 +1,9 @@
-import os
 import asyncio
+import re
 import traceback
+from pathlib import Path
 from protections import apply_strategy, get_strategy
-from logger import log_event
+from logger import log_event_lazy
 
 TEST_SITES = [
     "https://cvetmetall.ru",
@@ -12,82 +13,91 @@ TEST_SITES = [
     "https://www.metallotorg.ru"
 ]
 
+# Каталог для сохраненных страниц
+HTML_DIR = Path("src/test_html")
+
+# Схема URL отбрасывается, а разделители заменяются на "_" при построении имени файла
+_SCHEME_RE = re.compile(r"^https?://")
+_SLASH_TABLE = str.maketrans({"/": "_", ":": "_"})
+
+# Сколько сайтов обрабатывается одновременно
+MAX_CONCURRENT_SITES = 5
+SEM = asyncio.Semaphore(MAX_CONCURRENT_SITES)
+
+def _write_file(filepath: Path, html: str) -> None:
+    """Записывает HTML в файл, кодируя его в UTF-8 одним вызовом"""
+    filepath.write_bytes(html.encode("utf-8"))
+
 async def save_page(url: str):
     """Сохраняет HTML-страницу в файл"""
-    print(f"\nОбработка сайта: {url}")
+    async with SEM:
+        print(f"\nОбработка сайта: {url}")
     
-    # Создаем имя файла из URL
-    filename = url.replace("https://", "").replace("http://", "").replace("/", "_")
-    filepath = os.path.join("src/test_html", f"{filename}.html")
+        # Создаем имя файла из URL
+        filename = _SCHEME_RE.sub("", url).translate(_SLASH_TABLE)
+        filepath = HTML_DIR / f"{filename}.html"
     
-    # Пробуем разные стратегии
-    strategies = [
-        ("none", get_strategy("none")),
-        ("cloudflare", get_strategy("cloudflare")),
-        ("js_challenge", get_strategy("js_challenge")),
-        ("playwright", get_strategy("captcha"))  # Пробуем Playwright как запасной вариант
-    ]
+        # Пробуем разные стратегии
+        strategies = [
+            ("none", get_strategy("none")),
+            ("cloudflare", get_strategy("cloudflare")),
+            ("js_challenge", get_strategy("js_challenge")),
+            ("playwright", get_strategy("captcha"))  # Пробуем Playwright как запасной вариант
+        ]
     
-    for strategy_name, strategy in strategies:
-        if not strategy:
-            print(f"Стратегия {strategy_name} не найдена")
-            continue
+        for strategy_name, strategy in strategies:
+            if not strategy:
+                print(f"Стратегия {strategy_name} не найдена")
+                continue
             
-        print(f"Пробуем стратегию: {strategy_name}")
-        log_event({
-            "event": "saving_page_attempt",
-            "url": url,
-            "strategy": strategy["method"]
-        })
+            print(f"Пробуем стратегию: {strategy_name}")
+            log_event_lazy("saving_page", "attempt", lambda: {
+                "url": url,
+                "strategy": strategy["method"]
+            })
         
-        try:
-            html = apply_strategy(url, strategy)
-            if html:
-                print(f"Получен HTML длиной {len(html)} байт")
+            try:
+                html = await asyncio.to_thread(apply_strategy, url, strategy)
+                if html:
+                    print(f"Получен HTML длиной {len(html)} байт")
+                
+                    # Сохраняем HTML
+                    await asyncio.to_thread(_write_file, filepath, html)
                 
-                # Сохраняем HTML
-                with open(filepath, "w", encoding="utf-8") as f:
-                    f.write(html)
+                    print(f"Страница сохранена в {filepath}")
+                    log_event_lazy("page", "saved", lambda: {
+                        "url": url,
+                        "file": str(filepath),
+                        "strategy": strategy["method"],
+                        "html_length": len(html)
+                    })
+                    return True
+                else:
+                    print(f"Стратегия {strategy_name} не вернула HTML")
                 
-                print(f"Страница сохранена в {filepath}")
-                log_event({
-                    "event": "page_saved",
+            except Exception as e:
+                print(f"Ошибка при использовании стратегии {strategy_name}:")
+                print(traceback.format_exc())
+                error = str(e)
+                log_event_lazy("strategy", "error", lambda: {
                     "url": url,
-                    "file": filepath,
                     "strategy": strategy["method"],
-                    "html_length": len(html)
+                    "error": error,
+                    "traceback": traceback.format_exc()
                 })
-                return True
-            else:
-                print(f"Стратегия {strategy_name} не вернула HTML")
-                
-        except Exception as e:
-            print(f"Ошибка при использовании стратегии {strategy_name}:")
-            print(traceback.format_exc())
-            log_event({
-                "event": "strategy_error",
-                "url": url,
-                "strategy": strategy["method"],
-                "error": str(e),
-                "traceback": traceback.format_exc()
-            })
     
-    print(f"Не удалось сохранить страницу {url}")
-    log_event({
-        "event": "page_save_failed",
-        "url": url
-    })
-    return False
+        print(f"Не удалось сохранить страницу {url}")
+        log_event_lazy("page", "save_failed", lambda: {"url": url})
+        return False
 
 async def main():
     """Сохраняет страницы со всех тестовых сайтов"""
     # Создаем директорию, если её нет
-    os.makedirs("src/test_html", exist_ok=True)
+    HTML_DIR.mkdir(parents=True, exist_ok=True)
     
-    results = []
-    for url in TEST_SITES:
-        success = await save_page(url)
-        results.append((url, success))
+    # Сайты обрабатываются параллельно, не более MAX_CONCURRENT_SITES одновременно
+    outcomes = await asyncio.gather(*(save_page(url) for url in TEST_SITES), return_exceptions=True)
+    results = [(url, outcome is True) for url, outcome in zip(TEST_SITES, outcomes)]
     
     # Выводим общий результат
     print("\nИтоговые результаты:")
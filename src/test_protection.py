@@ -28,6 +28,19 @@ def test_detect_protection():
     html_none = '<div>Normal page</div>'
     assert detect_protection(html_none) == "none"
 
+def test_detect_protection_large_page():
+    """Тест определения защиты на большой странице по разметке начала документа"""
+    padding = "<p>" + "x" * 100_000 + "</p>"
+    html = (
+        '<html><head><script src="/cdn-cgi/cloudflare/challenge.js"></script></head>'
+        f"<body>{padding}<p>Access Denied</p></body></html>"
+    )
+    assert detect_protection(html) == "cloudflare"
+
+    # Признаки только в тексте большой страницы находятся полным сканированием
+    html_text_only = f"<html><body>{padding}<p>403 Forbidden</p></body></html>"
+    assert detect_protection(html_text_only) == "403"
+
 def test_get_strategy():
     """Тест получения стратегий"""
     # Тест существующей стратегии
@@ -11,55 +11,62 @@ TEST_SITES = [
     "https://www.metallotorg.ru"
 ]
 
+# Сколько сайтов тестируется одновременно
+MAX_CONCURRENT_SITES = 5
+SEM = asyncio.Semaphore(MAX_CONCURRENT_SITES)
+
 async def test_site(url: str):
     """Тестирует обход защиты на конкретном сайте"""
-    log_event({
-        "event": "site_test_started",
-        "url": url
-    })
-    
-    # Пробуем получить страницу без защиты
-    strategy = get_strategy("none")
-    html = apply_strategy(url, strategy)
-    
-    if html:
-        # Определяем тип защиты
-        protection_type = detect_protection(html)
+    async with SEM:
         log_event({
-            "event": "protection_detected",
-            "url": url,
-            "protection_type": protection_type
+            "event": "site_test_started",
+            "url": url
         })
-        
-        # Если есть защита, пробуем обойти её
-        if protection_type != "none":
-            strategy = get_strategy(protection_type)
-            if strategy:
-                html = apply_strategy(url, strategy)
-        
-        # Если получили HTML, пробуем извлечь ИНН
+    
+        # Пробуем получить страницу без защиты
+        strategy = get_strategy("none")
+        html = await asyncio.to_thread(apply_strategy, url, strategy)
+    
         if html:
-            inn = extract_inn_from_html(html)
+            # Определяем тип защиты
+            protection_type = detect_protection(html)
             log_event({
-                "event": "inn_extraction_result",
+                "event": "protection_detected",
                 "url": url,
-                "inn": inn,
-                "success": inn is not None
+                "protection_type": protection_type
             })
-            return inn
+        
+            # Если есть защита, пробуем обойти её
+            if protection_type != "none":
+                strategy = get_strategy(protection_type)
+                if strategy:
+                    html = await asyncio.to_thread(apply_strategy, url, strategy)
+        
+            # Если получили HTML, пробуем извлечь ИНН
+            if html:
+                inn = extract_inn_from_html(html)
+                log_event({
+                    "event": "inn_extraction_result",
+                    "url": url,
+                    "inn": inn,
+                    "success": inn is not None
+                })
+                return inn
     
-    log_event({
-        "event": "site_test_failed",
-        "url": url
-    })
-    return None
+        log_event({
+            "event": "site_test_failed",
+            "url": url
+        })
+        return None
 
 async def main():
     """Тестирует все сайты"""
-    results = {}
-    for url in TEST_SITES:
-        inn = await test_site(url)
-        results[url] = inn
+    # Сайты тестируются параллельно, не более MAX_CONCURRENT_SITES одновременно
+    outcomes = await asyncio.gather(*(test_site(url) for url in TEST_SITES), return_exceptions=True)
+    results = {
+        url: None if isinstance(inn, BaseException) else inn
+        for url, inn in zip(TEST_SITES, outcomes)
+    }
     
     # Выводим результаты
     print("\nРезультаты тестирования:")
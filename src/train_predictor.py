@@ -7,19 +7,35 @@ import json
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
+from typing import Union
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from src.protections.strategy_predictor import StrategyPredictor
+from src.parquet_log import ParquetLog
 from src.logger import logger
 
+# Начиная с этого размера выборки вместо случайного леса обучается градиентный бустинг
+# на гистограммах: он быстрее и обучается, и предсказывает на больших данных
+HIST_GB_MIN_ROWS = 10_000
 
-def load_training_data(log_path: str = "data/strategy_logs.csv") -> pd.DataFrame:
+# Колонки CSV-журнала, которые нужны для обучения
+TRAINING_COLUMNS = [
+    "protection_type",
+    "user_agent_hash",
+    "ip_region",
+    "time_of_day",
+    "html_title_keywords",
+    "strategy_name",
+]
+
+
+def load_training_data(log_path: str = "data/strategy_logs.parquet") -> pd.DataFrame:
     """
-    Загружает данные для обучения из CSV-файла.
+    Загружает данные для обучения из Parquet-журнала (или старого CSV-файла).
 
     Args:
-        log_path: Путь к файлу с логами
+        log_path: Путь к каталогу с логами или к CSV-файлу
 
     Returns:
         pd.DataFrame: Загруженные данные
@@ -29,7 +45,10 @@ def load_training_data(log_path: str = "data/strategy_logs.csv") -> pd.DataFrame
         return pd.DataFrame()
 
     try:
-        df = pd.read_csv(log_path)
+        if log_path.endswith(".csv"):
+            df = _read_csv(log_path)
+        else:
+            df = ParquetLog(log_path).read()
         logger.info(f"Загружено {len(df)} записей из {log_path}")
         return df
     except Exception as e:
@@ -37,6 +56,22 @@ def load_training_data(log_path: str = "data/strategy_logs.csv") -> pd.DataFrame
         return pd.DataFrame()
 
 
+def _read_csv(log_path: str) -> pd.DataFrame:
+    """
+    Читает CSV-журнал парсером pyarrow, загружая только колонки TRAINING_COLUMNS.
+
+    Если pyarrow недоступен или в файле нет каких-то из колонок, файл читается
+    целиком стандартным парсером.
+    """
+    try:
+        return pd.read_csv(
+            log_path, engine="pyarrow", dtype_backend="pyarrow", usecols=TRAINING_COLUMNS
+        )
+    except (ImportError, TypeError, ValueError) as e:
+        logger.info(f"CSV читается без pyarrow: {e}")
+        return pd.read_csv(log_path)
+
+
 def prepare_features(df: pd.DataFrame) -> tuple:
     """
     Подготавливает признаки и целевую переменную.
@@ -59,18 +94,14 @@ def prepare_features(df: pd.DataFrame) -> tuple:
             encoders[feature] = LabelEncoder()
             df[feature] = encoders[feature].fit_transform(df[feature])
 
-    # Преобразуем html_title_keywords в бинарные признаки
+    # Преобразуем html_title_keywords в бинарные признаки за один проход по колонке
     if "html_title_keywords" in df.columns:
-        keywords = set()
-        for keywords_str in df["html_title_keywords"].dropna():
-            keywords.update(keywords_str.split(","))
-
-        for keyword in keywords:
-            df[f"has_{keyword}"] = (
-                df["html_title_keywords"].str.contains(keyword, na=False).astype(int)
-            )
-
-        df = df.drop("html_title_keywords", axis=1)
+        dummies = df["html_title_keywords"].fillna("").str.get_dummies(sep=",").astype(np.int8)
+        # Пустой токен (строки без ключевых слов) признаком не является: при предсказании
+        # StrategyPredictor его не выставляет
+        dummies = dummies.drop(columns="", errors="ignore")
+        dummies.columns = [f"has_{keyword}" for keyword in dummies.columns]
+        df = pd.concat([df.drop(columns=["html_title_keywords"]), dummies], axis=1)
 
     # Разделяем на признаки и целевую переменную
     X = df.drop("strategy_name", axis=1)
@@ -79,25 +110,40 @@ def prepare_features(df: pd.DataFrame) -> tuple:
     return X, y, encoders
 
 
-def train_model(X: pd.DataFrame, y: pd.Series) -> RandomForestClassifier:
+def train_model(
+    X: pd.DataFrame, y: pd.Series
+) -> Union[RandomForestClassifier, HistGradientBoostingClassifier]:
     """
     Обучает модель на подготовленных данных.
 
+    Для выборок больше HIST_GB_MIN_ROWS строк обучается HistGradientBoostingClassifier,
+    иначе случайный лес, деревья которого строятся на всех ядрах.
+
     Args:
         X: Матрица признаков
         y: Целевая переменная
 
     Returns:
-        RandomForestClassifier: Обученная модель
+        Union[RandomForestClassifier, HistGradientBoostingClassifier]: Обученная модель
     """
     # Разделяем данные на обучающую и тестовую выборки
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
     # Создаем и обучаем модель
-    model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42)
+    if len(X) > HIST_GB_MIN_ROWS:
+        model = HistGradientBoostingClassifier(max_iter=200, max_depth=10, random_state=42)
+    else:
+        model = RandomForestClassifier(
+            n_estimators=100, max_depth=10, random_state=42, n_jobs=-1, max_features="sqrt"
+        )
 
     model.fit(X_train, y_train)
 
+    # Предсказания делаются по одному контексту или небольшими пачками:
+    # распределение такой работы по потокам дороже самого обхода деревьев
+    if isinstance(model, RandomForestClassifier):
+        model.n_jobs = 1
+
     # Оцениваем качество модели
     train_score = model.score(X_train, y_train)
     test_score = model.score(X_test, y_test)
@@ -126,6 +172,8 @@ def main():
     predictor.model = model
     predictor.label_encoders = encoders
     predictor.save_model()
+    # Лес компилируется в нативную библиотеку, если установлен treelite
+    predictor.compile_model()
 
     logger.info("Обучение модели завершено успешно")
 
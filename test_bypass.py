@@ -7,28 +7,32 @@ from src.auto_extractor import AutoExtractor
 from src.evaluation.ab_tester import ABTester
 from src.logger import logger
 
+# Сколько URL тестируется одновременно
+MAX_CONCURRENT_URLS = 3
+SEM = asyncio.Semaphore(MAX_CONCURRENT_URLS)
 
-async def test_bypass(url: str) -> None:
+
+async def test_bypass(url: str, extractor: AutoExtractor, tester: ABTester) -> None:
     """
     Тестирует обход защиты для указанного URL.
 
     Args:
         url: URL для тестирования
+        extractor: общий экстрактор (открытый через async with)
+        tester: A/B тестер, статистику которого нужно вывести
     """
     try:
         logger.info(f"Тестирование обхода для {url}")
 
-        # Создаем экстрактор
-        extractor = AutoExtractor()
-
         # Пробуем извлечь данные
-        result = await extractor.extract(
-            url=url,
-            options={
-                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "timeout": 30,
-            },
-        )
+        async with SEM:
+            result = await extractor.extract(
+                url=url,
+                options={
+                    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+                    "timeout": 30,
+                },
+            )
 
         # Выводим результат
         if result["success"]:
@@ -38,7 +42,6 @@ async def test_bypass(url: str) -> None:
             logger.error(f"Ошибка обхода для {url}: {result.get('error', 'Неизвестная ошибка')}")
 
         # Выводим статистику A/B тестирования
-        tester = ABTester()
         stats = tester.get_statistics()
         logger.info(f"Статистика A/B тестирования: {stats}")
 
@@ -56,10 +59,10 @@ async def main():
         "https://www.metallotorg.ru",
     ]
 
-    # Тестируем каждый URL
-    for url in urls:
-        await test_bypass(url)
-        await asyncio.sleep(5)  # Пауза между запросами
+    # Экстрактор (и его A/B тестер) создается один раз для всех URL;
+    # одновременно тестируется не более MAX_CONCURRENT_URLS сайтов
+    async with AutoExtractor() as extractor:
+        await asyncio.gather(*(test_bypass(url, extractor, extractor.tester) for url in urls))
 
 
 if __name__ == "__main__":
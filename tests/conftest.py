@@ -0,0 +1,66 @@
+"""
+Общие фикстуры тестов.
+
+Тесты не делят состояние: handler — общий для модуля обработчик на базе в памяти,
+который очищается после каждого теста, selector создается на тест, а db_path
+указывает на базу во временном каталоге pytest (для проверки сохранения на диск).
+Поэтому модули можно выполнять параллельно:
+
+    pytest -n auto --dist=loadfile
+"""
+
+import asyncio
+import random
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.protections.strategy_handler import IN_MEMORY_DB, StrategyHandler
+from src.protections.strategy_selector import StrategySelector
+
+
+@pytest.fixture(autouse=True)
+def _no_sleep(monkeypatch):
+    """Отключает задержки в циклах повторов: time.sleep и asyncio.sleep не ждут."""
+    real_async_sleep = asyncio.sleep
+    monkeypatch.setattr("time.sleep", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr("asyncio.sleep", lambda *_args, **_kwargs: real_async_sleep(0))
+
+
+@pytest.fixture
+def rng() -> random.Random:
+    """Генератор случайных чисел с фиксированным зерном."""
+    return random.Random(0)
+
+
+@pytest.fixture
+def http_get():
+    """Подменяет httpx.AsyncClient.get на AsyncMock; ответы задаются в тесте."""
+    with patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
+        yield mock_get
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    """Путь к отдельной базе стратегий для теста."""
+    return str(tmp_path / "strategies.db")
+
+
+@pytest.fixture(scope="module")
+def shared_handler():
+    """StrategyHandler на базе в памяти, один на модуль; ресурсы закрываются в конце модуля."""
+    handler = StrategyHandler(IN_MEMORY_DB)
+    yield handler
+    handler.discovery.close()
+    handler.engine.dispose()
+
+
+@pytest.fixture
+def handler(shared_handler):
+    """Общий StrategyHandler модуля, очищаемый после каждого теста."""
+    yield shared_handler
+    shared_handler.reset()
+
+
+@pytest.fixture
+def selector() -> StrategySelector:
+    """StrategySelector со стандартными правилами выбора."""
+    return StrategySelector()
@@ -98,3 +98,72 @@ def test_get_stats():
     assert "total_requests" in data
     assert "success_rate" in data
     assert "most_common_protection" in data
+
+
+def test_extract_async_task():
+    """Тест фонового извлечения с последующим опросом статуса задачи."""
+    test_url = "https://example.com"
+    test_result = {
+        "status": "success",
+        "strategy": "solve_with_playwright",
+        "html": "<html>Test content</html>",
+        "has_protection": True,
+        "protection_type": "cloudflare",
+        "output_file": "output/test.json",
+    }
+
+    with patch.object(AutoExtractor, "run_agent", return_value=test_result):
+        response = client.post("/extract/async", json={"url": test_url})
+
+        assert response.status_code == 202
+        task_id = response.json()["task_id"]
+
+        response = client.get(f"/extract/{task_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "success"
+        assert data["result"]["strategy_used"] == test_result["strategy"]
+        assert data["result"]["output_file"] == test_result["output_file"]
+
+
+def test_extract_task_not_found():
+    """Тест запроса статуса несуществующей задачи."""
+    response = client.get("/extract/unknown")
+    assert response.status_code == 404
+
+
+def test_stats_counts_extract_requests():
+    """Тест подсчета запросов на извлечение в статистике."""
+    test_result = {
+        "status": "success",
+        "strategy": None,
+        "has_protection": True,
+        "protection_type": "cloudflare",
+        "output_file": "output/test.json",
+    }
+
+    before = client.get("/stats").json()["total_requests"]
+    with patch.object(AutoExtractor, "run_agent", return_value=test_result):
+        client.post("/extract", json={"url": "https://example.com"})
+
+    data = client.get("/stats").json()
+    assert data["total_requests"] == before + 1
+    assert data["success_rate"] > 0
+    assert data["most_common_protection"] == "cloudflare"
+
+
+def test_stats_counts_failed_async_task():
+    """Тест учета фоновой задачи по ее итогу, а не по ответу 202; ответы 422 не учитываются."""
+    stats = client.get("/stats").json()
+    before_total = stats["total_requests"]
+    before_success = stats["success_rate"] * before_total
+
+    with patch.object(AutoExtractor, "run_agent", side_effect=Exception("Test error")):
+        response = client.post("/extract/async", json={"url": "https://example.com"})
+    assert response.status_code == 202
+    assert client.get(f"/extract/{response.json()['task_id']}").json()["status"] == "error"
+    assert client.post("/extract", json={"url": "invalid-url"}).status_code == 422
+
+    data = client.get("/stats").json()
+    assert data["total_requests"] == before_total + 1
+    assert data["success_rate"] * data["total_requests"] == pytest.approx(before_success)
@@ -5,46 +5,56 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from pathlib import Path
-from src.agent.auto_extractor import AutoExtractor
+from src.agent.auto_extractor import AutoExtractor, load_result
 import json
 
 
-def test_run_agent_no_protection():
+@pytest.fixture(autouse=True)
+def _isolated_cwd(tmp_path, monkeypatch):
+    """Запускает тесты во временном каталоге: файлы output/ не попадают в репозиторий."""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_run_agent_no_protection(db_path):
     """Тест работы агента без защиты."""
     test_url = "https://example.com"
     test_html = "<html>Test content</html>"
 
-    # Мокаем requests.get
+    # Мокаем httpx.AsyncClient.get
     mock_response = MagicMock()
     mock_response.text = test_html
     mock_response.raise_for_status.return_value = None
 
-    with patch("requests.get", return_value=mock_response), patch(
+    with patch("httpx.AsyncClient.get", return_value=mock_response), patch(
         "src.protections.ProtectionDetector.detect_protection", return_value=(None, None)
     ):
-        extractor = AutoExtractor()
-        result = extractor.run_agent(test_url)
+        sink = []
+        extractor = AutoExtractor(db_path, result_sink=sink.append)
+        result = await extractor.run_agent(test_url)
 
         assert result["status"] == "success"
         assert result["has_protection"] is False
         assert result["strategy"] is None
         assert result["protection_type"] is None
-        assert Path(result["output_file"]).exists()
+        assert sink[-1]["url"] == test_url
+        assert sink[-1]["status"] == result["status"]
 
 
-def test_run_agent_with_protection():
+@pytest.mark.asyncio
+async def test_run_agent_with_protection(db_path):
     """Тест работы агента с защитой."""
     test_url = "https://example.com"
     test_html = "<html>Protected content</html>"
     protection_type = "cloudflare"
     protection_signs = ["cf-browser-verification"]
 
-    # Мокаем requests.get
+    # Мокаем httpx.AsyncClient.get
     mock_response = MagicMock()
     mock_response.text = test_html
     mock_response.raise_for_status.return_value = None
 
-    with patch("requests.get", return_value=mock_response), patch(
+    with patch("httpx.AsyncClient.get", return_value=mock_response), patch(
         "src.protections.ProtectionDetector.detect_protection",
         return_value=(protection_type, protection_signs),
     ), patch(
@@ -53,51 +63,105 @@ def test_run_agent_with_protection():
         "src.protections.strategy_handler.StrategyHandler.find_strategy",
         return_value="solve_with_playwright",
     ):
-        extractor = AutoExtractor()
-        result = extractor.run_agent(test_url)
+        sink = []
+        extractor = AutoExtractor(db_path, result_sink=sink.append)
+        result = await extractor.run_agent(test_url)
 
         assert result["status"] == "success"
         assert result["has_protection"] is True
         assert result["strategy"] == "solve_with_playwright"
         assert result["protection_type"] == protection_type
-        assert Path(result["output_file"]).exists()
+        assert sink[-1]["html"] == test_html
+        assert sink[-1]["url"] == test_url
+        assert sink[-1]["status"] == result["status"]
 
 
-def test_run_agent_error():
+@pytest.mark.asyncio
+async def test_run_agent_error(db_path):
     """Тест обработки ошибок агентом."""
     test_url = "https://example.com"
 
-    # Мокаем requests.get, чтобы он вызвал исключение
-    with patch("requests.get", side_effect=Exception("Test error")), patch(
+    # Мокаем httpx.AsyncClient.get, чтобы он вызвал исключение
+    with patch("httpx.AsyncClient.get", side_effect=Exception("Test error")), patch(
         "src.protections.ProtectionDetector.detect_protection",
         return_value=("unknown", ["request_error"]),
     ):
-        extractor = AutoExtractor()
-        result = extractor.run_agent(test_url)
+        sink = []
+        extractor = AutoExtractor(db_path, result_sink=sink.append)
+        result = await extractor.run_agent(test_url)
 
         assert result["status"] == "error"
         assert result["has_protection"] is True
         assert result["strategy"] is None
         assert result["protection_type"] == "unknown"
-        assert Path(result["output_file"]).exists()
+        assert sink[-1]["url"] == test_url
+        assert sink[-1]["status"] == result["status"]
+
+
+@pytest.mark.asyncio
+async def test_detect_protection_cached_by_host(db_path):
+    """Тест кэширования результата проверки защиты по хосту."""
+    mock_response = MagicMock()
+    mock_response.text = "<html>Test content</html>"
+    mock_response.raise_for_status.return_value = None
+
+    with patch("httpx.AsyncClient.get", return_value=mock_response) as mock_get, patch(
+        "src.protections.ProtectionDetector.detect_protection", return_value=(None, None)
+    ) as mock_detect:
+        extractor = AutoExtractor(db_path, result_sink=[].append)
+        await extractor.run_agent("https://example.com/a")
+        result = await extractor.run_agent("https://example.com/b")
+
+        assert result["status"] == "success"
+        assert result["has_protection"] is False
+        mock_detect.assert_called_once()
+        assert mock_get.call_count == 2
+        # Блокировка хоста удаляется, как только результат попал в кэш
+        assert not extractor._protection_locks
 
 
-def test_save_result():
+@pytest.mark.asyncio
+async def test_save_result(db_path):
     """Тест сохранения результатов."""
     test_url = "https://example.com"
     test_html = "<html>Test content</html>"
     test_status = "success"
     test_strategy = "solve_with_playwright"
 
-    extractor = AutoExtractor()
-    output_file = extractor._save_result(test_url, test_html, test_status, test_strategy)
+    extractor = AutoExtractor(db_path)
+    output_file = await extractor._save_result(test_url, test_html, test_status, test_strategy)
 
     assert Path(output_file).exists()
 
     # Проверяем содержимое файла
-    with open(output_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        assert data["url"] == test_url
-        assert data["status"] == test_status
-        assert data["strategy"] == test_strategy
-        assert data["html"] == test_html
+    data = load_result(output_file)
+    assert data["url"] == test_url
+    assert data["status"] == test_status
+    assert data["strategy"] == test_strategy
+    assert data["html"] == test_html
+    assert Path(data["html_path"]).exists()
+    assert "html" not in json.loads(Path(output_file).read_text(encoding="utf-8"))
+
+
+@pytest.mark.asyncio
+async def test_save_result_to_sink(db_path):
+    """Тест передачи результата в result_sink без записи на диск."""
+    sink = []
+    extractor = AutoExtractor(db_path, result_sink=sink.append)
+
+    with patch.object(extractor, "_write_result") as mock_write:
+        result_id = await extractor._save_result(
+            "https://example.com", "<html>ok</html>", "success"
+        )
+
+    mock_write.assert_not_called()
+    assert result_id.startswith("sink:")
+    assert sink == [
+        {
+            "url": "https://example.com",
+            "timestamp": sink[0]["timestamp"],
+            "status": "success",
+            "strategy": None,
+            "html": "<html>ok</html>",
+        }
+    ]
@@ -0,0 +1,35 @@
+"""
+Тесты для модуля extractor.py
+"""
+
+from src.extractor import extract_inn_from_html
+
+
+def test_extract_inn_standard_format():
+    """Тест извлечения ИНН в стандартном формате."""
+    assert extract_inn_from_html("<p>ИНН: 7707083893</p>") == "7707083893"
+
+
+def test_extract_inn_12_digits_after_dash():
+    """Тест извлечения 12-значного ИНН: ленивый паттерн на 10 цифр не должен его обрезать."""
+    assert extract_inn_from_html("<p>Наш ИНН – 500100732259</p>") == "500100732259"
+
+
+def test_extract_inn_without_mentions():
+    """Тест страницы без упоминаний ИНН."""
+    assert extract_inn_from_html("<p>Контакты: 7707083893</p>") is None
+
+
+def test_extract_inn_from_attribute():
+    """Тест извлечения ИНН из атрибута тега: подстрока "inn" есть только в имени атрибута."""
+    assert extract_inn_from_html('<div data-company-inn="7707083893"></div>') == "7707083893"
+
+
+def test_extract_inn_mixed_case_label():
+    """Тест метки ИНН в произвольном регистре: быстрая проверка не должна отсекать страницу."""
+    assert extract_inn_from_html("<p>иНН 7707083893</p>") == "7707083893"
+
+
+def test_extract_inn_entity_encoded_label():
+    """Тест метки ИНН, записанной числовыми ссылками на символы."""
+    assert extract_inn_from_html("<p>&#1048;&#1053;&#1053;: 7707083893</p>") == "7707083893"
@@ -0,0 +1,54 @@
+"""
+Тесты для модуля parquet_log.py
+"""
+
+import pandas as pd
+import pyarrow as pa
+from src.logger import logger
+from src.parquet_log import ParquetLog
+
+SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("strategy_name", pa.string()),
+        ("success", pa.bool_()),
+    ]
+)
+
+
+def test_legacy_csv_is_imported_once(tmp_path):
+    """Тест переноса записей из CSV-журнала прежнего формата при первом открытии."""
+    legacy = tmp_path / "results.csv"
+    pd.DataFrame(
+        {
+            "timestamp": ["2024-01-01T12:00:00", "2024-01-02T12:00:00"],
+            "strategy_name": ["solve_with_playwright", None],
+            "success": [True, False],
+        }
+    ).to_csv(legacy, index=False)
+
+    log = ParquetLog(str(legacy), schema=SCHEMA)
+    assert log.path == str(tmp_path / "results.parquet")
+    data = log.read()
+    assert data["strategy_name"].iloc[0] == "solve_with_playwright"
+    assert data["strategy_name"].isna().tolist() == [False, True]
+    assert data["success"].tolist() == [True, False]
+
+    # Журнал уже не пуст: повторное открытие записи не дублирует
+    assert ParquetLog(str(tmp_path / "results.parquet"), schema=SCHEMA).count() == 2
+
+
+def test_unreadable_legacy_csv_is_reported(tmp_path):
+    """Тест CSV-журнала, который не удалось перенести: журнал пуст, файл назван в предупреждении."""
+    legacy = tmp_path / "results.csv"
+    legacy.write_text("timestamp,strategy_name,success\nnot-a-date,x,True\n")
+    warnings = []
+
+    handler = logger.add(lambda message: warnings.append(message), level="WARNING")
+    try:
+        log = ParquetLog(str(legacy), schema=SCHEMA)
+    finally:
+        logger.remove(handler)
+
+    assert log.count() == 0
+    assert any(str(legacy) in message for message in warnings)
@@ -0,0 +1,126 @@
+"""
+Тесты для основного модуля protections.py
+"""
+
+import importlib.util
+import re
+from pathlib import Path
+from unittest.mock import MagicMock
+import pytest
+
+pytest.importorskip("undetected_chromedriver")
+
+# Пакет src/protections перекрывает модуль src/protections.py, поэтому модуль грузится по пути
+_MODULE_PATH = Path(__file__).resolve().parent.parent / "src" / "protections.py"
+
+
+@pytest.fixture(scope="module")
+def protections():
+    """Модуль src/protections.py."""
+    spec = importlib.util.spec_from_file_location("protections_module", _MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    module._close_pooled_drivers()
+
+
+def test_pooled_driver_discards_driver_when_cookie_clear_fails(protections):
+    """Тест браузера, сессия которого умерла после запроса: он закрывается, ошибка не выходит."""
+    driver = MagicMock()
+    driver.delete_all_cookies.side_effect = RuntimeError("invalid session id")
+    key = ("test", "dead")
+
+    with protections._pooled_driver(key, lambda: driver) as pooled:
+        html = pooled.page_source
+
+    assert html is driver.page_source
+    driver.quit.assert_called_once()
+    assert protections._driver_pools[key].empty()
+
+
+def test_pooled_driver_caps_idle_drivers(protections):
+    """Тест ограничения числа свободных браузеров в пуле."""
+    key = ("test", "cap")
+    drivers = [MagicMock() for _ in range(protections.MAX_IDLE_DRIVERS + 1)]
+    factory = iter(drivers).__next__
+
+    # Все браузеры заняты одновременно, затем возвращаются в пул
+    contexts = [protections._pooled_driver(key, factory) for _ in drivers]
+    for context in contexts:
+        context.__enter__()
+    for context in contexts:
+        context.__exit__(None, None, None)
+
+    assert protections._driver_pools[key].qsize() == protections.MAX_IDLE_DRIVERS
+    assert drivers[-1].quit.called
+    assert not any(driver.quit.called for driver in drivers[:-1])
+
+
+class _FakeHyperscanDatabase:
+    """База с поведением Hyperscan: совпадения по порядку, остановка через ScanTerminated."""
+
+    def compile(self, expressions, ids, flags):
+        self.patterns = list(zip(ids, (re.compile(e.decode(), re.I) for e in expressions)))
+
+    def scan(self, data, match_event_handler):
+        text = data.decode("utf-8")
+        matches = sorted(
+            (match.start(), match.end(), rank)
+            for rank, pattern in self.patterns
+            for match in [pattern.search(text)]
+            if match
+        )
+        for start, end, rank in matches:
+            if match_event_handler(rank, start, end, 0, None):
+                raise _FakeHyperscan.ScanTerminated()
+
+
+class _FakeHyperscan:
+    """Подмена модуля hyperscan."""
+
+    HS_FLAG_CASELESS = 1
+    HS_FLAG_SINGLEMATCH = 2
+    Database = _FakeHyperscanDatabase
+
+    class ScanTerminated(Exception):
+        pass
+
+
+@pytest.fixture
+def fake_hyperscan(protections, monkeypatch):
+    """Подменяет hyperscan в модуле и сбрасывает скомпилированную базу."""
+    monkeypatch.setattr(protections, "hyperscan", _FakeHyperscan)
+    monkeypatch.setattr(protections, "_hs_db", None)
+
+
+def test_scan_protection_hyperscan_stops_on_captcha(protections, fake_hyperscan):
+    """Тест остановки сканирования на капче: ScanTerminated не выходит наружу."""
+    html = "<html>Access Denied <div class='g-recaptcha'></div> cloudflare</html>"
+    assert protections._scan_protection(html) == "captcha"
+
+
+def test_scan_protection_hyperscan_picks_highest_priority(protections, fake_hyperscan):
+    """Тест выбора самого приоритетного признака без досрочной остановки."""
+    html = "<html><h1>403 Forbidden</h1> cf-browser-verification</html>"
+    assert protections._scan_protection(html) == "cloudflare"
+
+
+def test_detect_protection_prefers_priority_over_position(protections, monkeypatch):
+    """Тест выбора признака по приоритету, а не по месту на странице."""
+    monkeypatch.setattr(protections, "hyperscan", None)
+    monkeypatch.setattr(protections, "log_event", lambda event: None)
+    html = "<html>Access Denied, cloudflare <div class='g-recaptcha'></div></html>"
+    assert protections.detect_protection(html) == "captcha"
+    assert protections.detect_protection("<h1>403 FORBIDDEN</h1> CF-Browser-Verification") == (
+        "cloudflare"
+    )
+    assert protections.detect_protection("<p>Hello</p>") == "none"
+
+
+def test_detect_protection_large_page(protections, monkeypatch):
+    """Тест большой страницы: капча далеко от начала важнее признака в начале документа."""
+    monkeypatch.setattr(protections, "hyperscan", None)
+    monkeypatch.setattr(protections, "log_event", lambda event: None)
+    filler = "<p>Lorem ipsum dolor sit amet</p>" * 10_000
+    html = f"<html><head><title>Cloudflare</title></head><body>{filler}captcha</body></html>"
+    assert protections.detect_protection(html) == "captcha"
@@ -2,9 +2,28 @@
 Тесты для модуля solvers.py
 """
 
+import asyncio
+import random
+import aiohttp
 import pytest
-from unittest.mock import patch, MagicMock
-from src.protections.solvers import solve_with_headers_tweaking, solve_with_retry_and_delay
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.protections.http_session import read_html
+from src.protections.solvers import (
+    RETRY_BASE_DELAY,
+    solve_with_headers_tweaking,
+    solve_with_retry_and_delay,
+)
+
+
+def _html_response(html, content_type="text/html; charset=utf-8"):
+    """Создает мок потокового ответа requests."""
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.headers = {"Content-Type": content_type}
+    response.encoding = "utf-8"
+    response.iter_content.return_value = [html.encode("utf-8")]
+    response.raise_for_status.return_value = None
+    return response
 
 
 def test_solve_with_headers_tweaking_success():
@@ -12,18 +31,16 @@ def test_solve_with_headers_tweaking_success():
     test_url = "https://example.com"
     test_html = "<html>Test content</html>"
 
-    # Мокаем requests.get
-    mock_response = MagicMock()
-    mock_response.text = test_html
-    mock_response.raise_for_status.return_value = None
+    # Мокаем Session.get
+    mock_response = _html_response(test_html)
 
-    with patch("requests.get", return_value=mock_response) as mock_get:
+    with patch("requests.Session.get", return_value=mock_response) as mock_get:
         result = solve_with_headers_tweaking(test_url)
 
         # Проверяем, что функция вернула правильный HTML
         assert result == test_html
 
-        # Проверяем, что requests.get был вызван с правильными заголовками
+        # Проверяем, что Session.get был вызван с правильными заголовками
         mock_get.assert_called_once()
         call_args = mock_get.call_args[1]
         assert "headers" in call_args
@@ -33,53 +50,145 @@ def test_solve_with_headers_tweaking_success():
         assert "Accept-Language" in headers
 
 
+def test_solve_with_headers_tweaking_reuses_session():
+    """Тест повторного использования одной сессии (keep-alive) между вызовами."""
+    with patch(
+        "requests.Session.get",
+        autospec=True,
+        side_effect=lambda *_args, **_kwargs: _html_response("<html>ok</html>"),
+    ) as mock_get:
+        solve_with_headers_tweaking("https://example.com/a")
+        solve_with_headers_tweaking("https://example.com/b")
+
+    first, second = (call.args[0] for call in mock_get.call_args_list)
+    assert first is second
+    assert first.get_adapter("https://example.com")._pool_maxsize == 64
+
+
 def test_solve_with_headers_tweaking_failure():
     """Тест неудачного обхода через модификацию заголовков."""
     test_url = "https://example.com"
 
-    # Мокаем requests.get, чтобы он вызвал исключение
-    with patch("requests.get", side_effect=Exception("Test error")):
+    # Мокаем Session.get, чтобы он вызвал исключение
+    with patch("requests.Session.get", side_effect=Exception("Test error")):
         result = solve_with_headers_tweaking(test_url)
         assert result is None
 
 
-def test_solve_with_retry_and_delay_success():
+def _aiohttp_session(html=None, content_type="text/html; charset=utf-8", error=None):
+    """Создает мок сессии aiohttp, которая возвращает HTML или вызывает ошибку."""
+    session = MagicMock()
+    if error is not None:
+        session.get.side_effect = error
+        return session
+    response = MagicMock()
+    response.headers = {"Content-Type": content_type}
+    response.charset = "utf-8"
+    response.content.iter_chunked.return_value.__aiter__.return_value = [html.encode("utf-8")]
+    session.get.return_value.__aenter__.return_value = response
+    return session
+
+
+@pytest.mark.asyncio
+async def test_solve_with_retry_and_delay_success():
     """Тест успешного обхода через повторные запросы."""
     test_url = "https://example.com"
     test_html = "<html>Test content</html>"
+    session = _aiohttp_session(test_html)
 
-    # Мокаем requests.get и time.sleep
-    mock_response = MagicMock()
-    mock_response.text = test_html
-    mock_response.raise_for_status.return_value = None
+    with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        result = await solve_with_retry_and_delay(test_url, session)
 
-    with patch("requests.get", return_value=mock_response) as mock_get, patch(
-        "time.sleep"
-    ) as mock_sleep:
-        result = solve_with_retry_and_delay(test_url)
+    # Проверяем, что функция вернула правильный HTML
+    assert result == test_html
 
-        # Проверяем, что функция вернула правильный HTML
-        assert result == test_html
+    # Проверяем, что запрос и задержка выполнены по одному разу
+    session.get.assert_called_once()
+    mock_sleep.assert_awaited_once()
 
-        # Проверяем, что requests.get был вызван
-        mock_get.assert_called_once()
 
-        # Проверяем, что time.sleep был вызван
-        mock_sleep.assert_called_once()
+@pytest.mark.asyncio
+async def test_solve_with_retry_and_delay_failure(rng):
+    """Тест неудачного обхода через повторные запросы."""
+    session = _aiohttp_session(error=aiohttp.ClientConnectionError("Test error"))
+    max_retries = 4
 
+    with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        result = await solve_with_retry_and_delay(
+            "https://example.com", session, max_retries=max_retries, rng=rng
+        )
 
-def test_solve_with_retry_and_delay_failure():
-    """Тест неудачного обхода через повторные запросы."""
-    test_url = "https://example.com"
+    # Проверяем, что функция вернула None после всех попыток
+    assert result is None
 
-    # Мокаем requests.get, чтобы он всегда вызывал исключение
-    with patch("requests.get", side_effect=Exception("Test error")), patch(
-        "time.sleep"
-    ) as mock_sleep:
-        result = solve_with_retry_and_delay(test_url, max_retries=2)
+    # Проверяем, что было сделано правильное количество попыток
+    assert mock_sleep.await_count == max_retries
 
-        # Проверяем, что функция вернула None после всех попыток
-        assert result is None
+    # Задержки случайны, но не выходят за экспоненциально растущую границу
+    delays = [call.args[0] for call in mock_sleep.await_args_list]
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= RETRY_BASE_DELAY * 2**attempt
+    assert len(set(delays)) == max_retries
+
+
+@pytest.mark.asyncio
+async def test_solve_with_retry_and_delay_is_reproducible_with_seed():
+    """Тест воспроизводимости задержек при одинаковом зерне генератора."""
+    session = _aiohttp_session(error=aiohttp.ClientConnectionError("Test error"))
+    runs = []
+    for _ in range(2):
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            await solve_with_retry_and_delay(
+                "https://example.com", session, max_retries=3, rng=random.Random(7)
+            )
+        runs.append([call.args[0] for call in mock_sleep.await_args_list])
+
+    assert runs[0] == runs[1]
+
+
+@pytest.mark.asyncio
+async def test_solve_with_retry_and_delay_many_retries():
+    """Тест большого числа повторов: задержки не ждут, но выполняется каждая попытка."""
+    session = _aiohttp_session(error=aiohttp.ClientConnectionError("Test error"))
+
+    with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        result = await solve_with_retry_and_delay("https://example.com", session, max_retries=32)
+
+    assert result is None
+    assert session.get.call_count == 32
+    assert mock_sleep.await_count == 32
+
+
+@pytest.mark.asyncio
+async def test_solve_with_retry_and_delay_concurrent_urls():
+    """Тест повторов для нескольких URL: запросы ограничены семафором и идут одновременно."""
+    session = _aiohttp_session("<html>ok</html>")
+    semaphore = asyncio.BoundedSemaphore(2)
+
+    results = await asyncio.gather(
+        *(
+            solve_with_retry_and_delay(f"https://example.com/{i}", session, semaphore=semaphore)
+            for i in range(5)
+        )
+    )
+
+    assert results == ["<html>ok</html>"] * 5
+    assert session.get.call_count == 5
+
+
+def test_solve_with_headers_tweaking_rejects_non_html():
+    """Тест отклонения ответа, который не является HTML."""
+    mock_response = _html_response("%PDF-1.4", content_type="application/pdf")
+
+    with patch("requests.Session.get", return_value=mock_response):
+        assert solve_with_headers_tweaking("https://example.com/file.pdf") is None
+
+    mock_response.iter_content.assert_not_called()
+
+
+def test_read_html_truncates_large_body():
+    """Тест ограничения размера читаемого тела ответа."""
+    mock_response = _html_response("")
+    mock_response.iter_content.return_value = [b"a" * 6, b"b" * 6]
 
-        # Проверяем, что было сделано правильное количество попыток
-        assert mock_sleep.call_count == 2
+    assert read_html(mock_response, max_bytes=8) == "aaaaaabb"
@@ -2,8 +2,9 @@
 Тесты для модуля исследования новых стратегий.
 """
 
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from src.protections.strategy_discovery import StrategyDiscovery
 from src.protections.strategy_handler import StrategyHandler
 
@@ -18,136 +19,127 @@ def strategy_handler():
 @pytest.fixture
 def strategy_discovery(strategy_handler):
     """Фикстура для создания StrategyDiscovery."""
-    return StrategyDiscovery(strategy_handler)
+    discovery = StrategyDiscovery(strategy_handler)
+    yield discovery
+    discovery.close()
 
 
-def test_discover_new_strategy_success(strategy_discovery, strategy_handler):
-    """Тест успешного открытия новой стратегии."""
-    url = "https://example.com"
-    context = {"protection_type": "test_protection"}
-
-    # Мокаем успешный ответ
-    with patch("requests.get") as mock_get:
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.text = "<html>Test content</html>"
+@pytest.fixture(scope="module")
+def shared_pool():
+    """Мок async-пула Playwright, который собирается один раз на модуль."""
+    mock_page = AsyncMock()
+    mock_page.evaluate.return_value = len("<html>Success</html>")
+    pool = MagicMock()
+    pool.page.return_value.__aenter__.return_value = mock_page
+    pool.close = AsyncMock()
+    return pool
 
-        strategy_name = strategy_discovery.discover_new_strategy(url, context)
 
-        assert strategy_name is not None
-        assert strategy_name.startswith("custom_user_agent_")
-        strategy_handler.save_strategy.assert_called_once()
+@pytest.fixture
+def mock_pool(strategy_discovery, shared_pool):
+    """Подставляет общий мок пула в StrategyDiscovery и сбрасывает его вызовы после теста."""
+    strategy_discovery._playwright = shared_pool
+    yield shared_pool
+    # Настроенные return_value сохраняются, сбрасываются только записи вызовов
+    shared_pool.reset_mock()
 
 
-def test_discover_new_strategy_failure(strategy_discovery, strategy_handler):
-    """Тест неудачного открытия новой стратегии."""
+def test_discover_new_strategy_success(strategy_discovery, strategy_handler, http_get):
+    """Тест успешного открытия новой стратегии."""
     url = "https://example.com"
     context = {"protection_type": "test_protection"}
 
-    # Мокаем неудачные ответы
-    with patch("requests.get") as mock_get:
-        mock_get.side_effect = Exception("Test error")
+    # Мокаем успешный ответ
+    http_get.return_value.status_code = 200
+    http_get.return_value.text = "<html>Test content</html>"
 
-        strategy_name = strategy_discovery.discover_new_strategy(url, context)
+    strategy = strategy_discovery.discover_new_strategy(url, context)
 
-        assert strategy_name is None
-        strategy_handler.save_strategy.assert_not_called()
+    # Подходы выполняются параллельно: побеждает любой из HTTP-подходов
+    assert strategy is not None
+    assert strategy["name"].startswith(("custom_user_agent_", "proxy_headers_"))
+    strategy_handler.save_strategy.assert_called()
 
 
-def test_try_different_user_agents(strategy_discovery):
-    """Тест перебора разных User-Agent'ов."""
-    url = "https://example.com"
-    context = {}
+def test_discover_new_strategy_returns_first_completed(strategy_discovery):
+    """Тест параллельного запуска подходов: возвращается первый завершившийся успешно."""
+    cancelled = []
 
-    with patch("requests.get") as mock_get:
-        # Первые два User-Agent'а не сработают
-        mock_get.side_effect = [
-            Exception("Error 1"),
-            Exception("Error 2"),
-            MagicMock(status_code=200, text="<html>Success</html>"),
-        ]
+    async def slow_approach(url, context):
+        try:
+            # Подход не завершается сам: его может остановить только отмена
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+        return "slow"
+
+    async def failing_approach(url, context):
+        raise RuntimeError("Test error")
 
-        strategy_name = strategy_discovery._try_different_user_agents(url, context)
+    async def fast_approach(url, context):
+        return {"name": "fast", "params": {}}
 
-        assert strategy_name is not None
-        assert strategy_name.startswith("custom_user_agent_")
+    strategy_discovery.experimental_approaches = [slow_approach, failing_approach, fast_approach]
 
+    found = strategy_discovery.discover_new_strategy("https://example.com", {})
+    assert found == {"name": "fast", "params": {}}
+    # Незавершенные подходы отменяются после первого успеха
+    assert cancelled == ["slow"]
 
-def test_try_playwright_with_interactions(strategy_discovery):
-    """Тест использования Playwright с взаимодействиями."""
+
+def test_discover_new_strategy_failure(strategy_discovery, strategy_handler, http_get):
+    """Тест неудачного открытия новой стратегии."""
     url = "https://example.com"
-    context = {}
+    context = {"protection_type": "test_protection"}
 
-    with patch("playwright.sync_api.sync_playwright") as mock_playwright:
-        # Мокаем успешное взаимодействие
-        mock_browser = MagicMock()
-        mock_page = MagicMock()
-        mock_page.content.return_value = "<html>Success</html>"
-        mock_browser.new_page.return_value = mock_page
-        mock_playwright.return_value.chromium.launch.return_value = mock_browser
+    # Мокаем неудачные ответы
+    http_get.side_effect = Exception("Test error")
 
-        strategy_name = strategy_discovery._try_playwright_with_interactions(url, context)
+    strategy = strategy_discovery.discover_new_strategy(url, context)
 
-        assert strategy_name is not None
-        assert strategy_name.startswith("playwright_interactive_")
+    assert strategy is None
+    strategy_handler.save_strategy.assert_not_called()
 
 
-def test_try_proxy_combinations(strategy_discovery):
-    """Тест комбинаций прокси и заголовков."""
-    url = "https://example.com"
-    context = {}
+# (метод подхода, что подменяется: httpx или пул Playwright, префикс имени стратегии,
+#  обязательный параметр страницы)
+APPROACH_CASES = [
+    ("_try_different_user_agents", "http", "custom_user_agent_", None),
+    ("_try_proxy_combinations", "http", "proxy_headers_", None),
+    ("_try_playwright_with_interactions", "playwright", "playwright_interactive_", None),
+    ("_try_geolocation_emulation", "playwright", "geolocation_", "geolocation"),
+    ("_try_viewport_changes", "playwright", "viewport_", "viewport"),
+]
 
-    with patch("requests.get") as mock_get:
-        # Первые комбинации не сработают
-        mock_get.side_effect = [
+
+@pytest.mark.parametrize("method,backend,prefix,page_kwarg", APPROACH_CASES)
+def test_try_approach(strategy_discovery, http_get, mock_pool, method, backend, prefix, page_kwarg):
+    """Тест подходов исследования: каждый находит и сохраняет стратегию."""
+    if backend == "http":
+        # Первые два запроса не сработают
+        http_get.side_effect = [
             Exception("Error 1"),
             Exception("Error 2"),
             MagicMock(status_code=200, text="<html>Success</html>"),
         ]
 
-        strategy_name = strategy_discovery._try_proxy_combinations(url, context)
-
-        assert strategy_name is not None
-        assert strategy_name.startswith("proxy_headers_")
-
-
-def test_try_geolocation_emulation(strategy_discovery):
-    """Тест эмуляции геолокации."""
-    url = "https://example.com"
-    context = {}
-
-    with patch("playwright.sync_api.sync_playwright") as mock_playwright:
-        # Мокаем успешную эмуляцию геолокации
-        mock_browser = MagicMock()
-        mock_context = MagicMock()
-        mock_page = MagicMock()
-        mock_page.content.return_value = "<html>Success</html>"
-        mock_context.new_page.return_value = mock_page
-        mock_browser.new_context.return_value = mock_context
-        mock_playwright.return_value.chromium.launch.return_value = mock_browser
+    approach = getattr(strategy_discovery, method)
+    strategy = strategy_discovery._run(approach("https://example.com", {}))
 
-        strategy_name = strategy_discovery._try_geolocation_emulation(url, context)
+    assert strategy is not None
+    assert strategy["name"].startswith(prefix)
+    if page_kwarg is not None:
+        assert page_kwarg in mock_pool.page.call_args.kwargs
 
-        assert strategy_name is not None
-        assert strategy_name.startswith("geolocation_")
 
+def test_try_viewport_changes_saves_viewport(strategy_discovery, mock_pool):
+    """Тест параметров стратегии viewport: сохраняется разрешение, с которым открыта страница."""
+    strategy = strategy_discovery._run(
+        strategy_discovery._try_viewport_changes("https://example.com", {})
+    )
 
-def test_try_viewport_changes(strategy_discovery):
-    """Тест изменения разрешения экрана."""
-    url = "https://example.com"
-    context = {}
-
-    with patch("playwright.sync_api.sync_playwright") as mock_playwright:
-        # Мокаем успешное изменение viewport
-        mock_browser = MagicMock()
-        mock_page = MagicMock()
-        mock_page.content.return_value = "<html>Success</html>"
-        mock_browser.new_page.return_value = mock_page
-        mock_playwright.return_value.chromium.launch.return_value = mock_browser
-
-        strategy_name = strategy_discovery._try_viewport_changes(url, context)
-
-        assert strategy_name is not None
-        assert "viewport_" in strategy_name
+    assert strategy["params"] == {"viewport": mock_pool.page.call_args.kwargs["viewport"]}
 
 
 def test_is_successful_response(strategy_discovery):
@@ -168,10 +160,25 @@ def test_is_successful_response(strategy_discovery):
     assert strategy_discovery._is_successful_response(mock_response) is False
 
     # Тест для Playwright page
-    mock_page = MagicMock()
-    mock_page.content.return_value = "<html>Content</html>"
-    assert strategy_discovery._is_successful_response(mock_page) is True
+    mock_page = AsyncMock()
+    mock_page.evaluate.return_value = len("<html>Content</html>")
+    assert asyncio.run(strategy_discovery._is_successful_page(mock_page)) is True
+    mock_page.content.assert_not_called()
 
     # Тест для пустой страницы
-    mock_page.content.return_value = ""
-    assert strategy_discovery._is_successful_response(mock_page) is False
+    mock_page.evaluate.return_value = 0
+    assert asyncio.run(strategy_discovery._is_successful_page(mock_page)) is False
+
+
+def test_repeated_strategy_is_saved_once(strategy_discovery, strategy_handler, http_get):
+    """Тест стабильных имен стратегий: повторно найденная стратегия не сохраняется."""
+    url = "https://example.com"
+    strategy_discovery.user_agents = strategy_discovery.user_agents[:1]
+
+    http_get.return_value = MagicMock(status_code=200, text="<html>Success</html>")
+    with patch.object(strategy_discovery, "_is_successful_response", return_value=True):
+        first = strategy_discovery._run(strategy_discovery._try_different_user_agents(url, {}))
+        second = strategy_discovery._run(strategy_discovery._try_different_user_agents(url, {}))
+
+    assert first == second
+    strategy_handler.save_strategy.assert_called_once()
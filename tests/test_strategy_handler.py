@@ -3,7 +3,6 @@
 """
 
 import os
-import tempfile
 import json
 from datetime import datetime
 import pytest
@@ -11,218 +10,241 @@ from unittest.mock import patch, MagicMock
 from src.protections.strategy_handler import StrategyHandler
 
 
-def test_save_and_find_strategy():
+def test_save_and_find_strategy(handler):
     """Проверяет сохранение и поиск стратегии."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
+    # Создаем тестовую стратегию
+    strategy = {
+        "name": "test_strategy",
+        "protection_type": "cloudflare",
+        "steps": [{"action": "wait", "timeout": 5}, {"action": "click", "selector": "#button"}],
+    }
 
-        # Создаем тестовую стратегию
-        strategy = {
-            "name": "test_strategy",
-            "protection_type": "cloudflare",
-            "steps": [{"action": "wait", "timeout": 5}, {"action": "click", "selector": "#button"}],
-        }
+    # Сохраняем стратегию
+    handler.save_strategy(strategy)
 
-        # Сохраняем стратегию
-        handler.save_strategy(strategy)
+    # Ищем стратегию
+    found = handler.find_strategy("cloudflare")
+    assert found is not None
+    assert found["name"] == "test_strategy"
+    assert found["protection_type"] == "cloudflare"
+    assert len(found["steps"]) == 2
 
-        # Ищем стратегию
-        found = handler.find_strategy("cloudflare")
-        assert found is not None
-        assert found["name"] == "test_strategy"
-        assert found["protection_type"] == "cloudflare"
-        assert len(found["steps"]) == 2
 
-
-def test_default_strategies():
+def test_default_strategies(handler):
     """Проверяет применение стратегий по умолчанию."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
-
-        # Проверяем для известного типа защиты
-        strategy = handler.find_strategy("cloudflare")
-        assert strategy is not None
-        assert strategy["name"] == "default_cloudflare"
+    # Проверяем для известного типа защиты
+    strategy = handler.find_strategy("cloudflare")
+    assert strategy is not None
+    assert strategy["name"] == "default_cloudflare"
 
-        # Проверяем для неизвестного типа защиты
-        strategy = handler.find_strategy("unknown")
-        assert strategy is not None
-        assert strategy["name"] == "default_generic"
+    # Проверяем для неизвестного типа защиты
+    strategy = handler.find_strategy("unknown")
+    assert strategy is not None
+    assert strategy["name"] == "default_generic"
 
 
-def test_update_strategy_stats():
+def test_update_strategy_stats(handler):
     """Проверяет обновление статистики стратегии."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
+    # Создаем тестовую стратегию
+    strategy = {"name": "test_strategy", "protection_type": "cloudflare", "steps": []}
+    handler.save_strategy(strategy)
 
-        # Создаем тестовую стратегию
-        strategy = {"name": "test_strategy", "protection_type": "cloudflare", "steps": []}
-        handler.save_strategy(strategy)
-
-        # Обновляем статистику
-        handler.update_strategy_stats("test_strategy", True, 1.0)
+    # Обновляем статистику
+    handler.update_strategy_stats("test_strategy", True, 1.0)
 
-        # Проверяем, что статистика обновилась
-        found = handler.find_strategy("cloudflare")
-        assert found is not None
-        assert found["name"] == "test_strategy"
+    # Проверяем, что статистика обновилась
+    found = handler.find_strategy("cloudflare")
+    assert found is not None
+    assert found["name"] == "test_strategy"
 
-        # Проверяем, что статистика сохранилась в селекторе
-        stats = handler.selector.get_strategy_stats("test_strategy")
-        assert stats is not None
-        assert stats.success_count == 1
-        assert stats.fail_count == 0
-        assert stats.avg_time == 1.0
+    # Проверяем, что статистика сохранилась в селекторе
+    stats = handler.selector.get_strategy_stats("test_strategy")
+    assert stats is not None
+    assert stats.success_count == 1
+    assert stats.fail_count == 0
+    assert stats.avg_time == 1.0
 
 
-def test_strategy_application():
+def test_strategy_application(handler):
     """Проверяет применение стратегии."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
-
-        # Создаем тестовую стратегию
-        strategy = {
-            "name": "test_strategy",
-            "protection_type": "cloudflare",
-            "steps": [{"action": "wait", "timeout": 1}, {"action": "click", "selector": "#button"}],
-        }
-        handler.save_strategy(strategy)
-
-        # Применяем стратегию
-        result = handler.apply_strategy("cloudflare")
-        assert result is not None
-        assert result["success"] is True
-        assert result["strategy_name"] == "test_strategy"
-
-        # Проверяем, что статистика обновилась
-        stats = handler.selector.get_strategy_stats("test_strategy")
-        assert stats is not None
-        assert stats.success_count == 1
-
-
-def test_apply_nonexistent_strategy():
+    # Создаем тестовую стратегию
+    strategy = {
+        "name": "test_strategy",
+        "protection_type": "cloudflare",
+        "steps": [{"action": "wait", "timeout": 1}, {"action": "click", "selector": "#button"}],
+    }
+    handler.save_strategy(strategy)
+
+    # Применяем стратегию
+    result = handler.apply_strategy("cloudflare")
+    assert result is not None
+    assert result["success"] is True
+    assert result["strategy_name"] == "test_strategy"
+
+    # Проверяем, что статистика обновилась
+    stats = handler.selector.get_strategy_stats("test_strategy")
+    assert stats is not None
+    assert stats.success_count == 1
+
+
+def test_apply_nonexistent_strategy(handler):
     """Проверяет обработку несуществующей стратегии."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
+    # Пробуем применить несуществующую стратегию
+    result = handler.apply_strategy("nonexistent_protection")
 
-        # Пробуем применить несуществующую стратегию
-        result = handler.apply_strategy("nonexistent_protection")
+    # Проверяем, что результат содержит информацию о неудаче
+    assert result is not None
+    assert result["success"] is False
+    assert "error" in result
+    assert result["strategy_name"] == "default_generic"
 
-        # Проверяем, что результат содержит информацию о неудаче
-        assert result is not None
-        assert result["success"] is False
-        assert "error" in result
-        assert result["strategy_name"] == "default_generic"
 
-
-def test_ranked_strategy_selection():
+def test_ranked_strategy_selection(handler):
     """Проверяет выбор стратегии на основе рейтинга."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
-
-        # Создаем две стратегии для одного типа защиты
-        strategy1 = {"name": "high_success_strategy", "protection_type": "cloudflare", "steps": []}
-        strategy2 = {"name": "low_success_strategy", "protection_type": "cloudflare", "steps": []}
+    # Создаем две стратегии для одного типа защиты
+    strategy1 = {"name": "high_success_strategy", "protection_type": "cloudflare", "steps": []}
+    strategy2 = {"name": "low_success_strategy", "protection_type": "cloudflare", "steps": []}
 
-        handler.save_strategy(strategy1)
-        handler.save_strategy(strategy2)
+    handler.save_strategy(strategy1)
+    handler.save_strategy(strategy2)
 
-        # Обновляем статистику для первой стратегии (высокий успех)
-        for _ in range(5):
-            handler.update_strategy_stats("high_success_strategy", True, 1.0)
+    # Обновляем статистику для первой стратегии (высокий успех)
+    for _ in range(5):
+        handler.update_strategy_stats("high_success_strategy", True, 1.0)
 
-        # Обновляем статистику для второй стратегии (низкий успех)
-        for _ in range(3):
-            handler.update_strategy_stats("low_success_strategy", True, 2.0)
-        for _ in range(2):
-            handler.update_strategy_stats("low_success_strategy", False, 2.0)
+    # Обновляем статистику для второй стратегии (низкий успех)
+    for _ in range(3):
+        handler.update_strategy_stats("low_success_strategy", True, 2.0)
+    for _ in range(2):
+        handler.update_strategy_stats("low_success_strategy", False, 2.0)
 
-        # Получаем лучшую стратегию
-        best_strategy = handler.selector.get_best_strategy("cloudflare")
-        assert best_strategy == "high_success_strategy"
+    # Получаем лучшую стратегию
+    best_strategy = handler.selector.get_best_strategy("cloudflare")
+    assert best_strategy == "high_success_strategy"
 
 
-def test_demotion_of_failed_strategy():
+def test_demotion_of_failed_strategy(handler):
     """Проверяет понижение рейтинга неудачной стратегии."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
+    # Создаем стратегию
+    strategy = {"name": "test_strategy", "protection_type": "cloudflare", "steps": []}
+    handler.save_strategy(strategy)
 
-        # Создаем стратегию
-        strategy = {"name": "test_strategy", "protection_type": "cloudflare", "steps": []}
-        handler.save_strategy(strategy)
-
-        # Добавляем успешные применения
-        for _ in range(3):
-            handler.update_strategy_stats("test_strategy", True, 1.0)
+    # Добавляем успешные применения
+    for _ in range(3):
+        handler.update_strategy_stats("test_strategy", True, 1.0)
 
-        # Добавляем неудачные применения
-        for _ in range(5):
-            handler.update_strategy_stats("test_strategy", False, 1.0)
+    # Добавляем неудачные применения
+    for _ in range(5):
+        handler.update_strategy_stats("test_strategy", False, 1.0)
 
-        # Создаем новую стратегию с лучшей статистикой
-        better_strategy = {"name": "better_strategy", "protection_type": "cloudflare", "steps": []}
-        handler.save_strategy(better_strategy)
-        handler.update_strategy_stats("better_strategy", True, 1.0)
+    # Создаем новую стратегию с лучшей статистикой
+    better_strategy = {"name": "better_strategy", "protection_type": "cloudflare", "steps": []}
+    handler.save_strategy(better_strategy)
+    handler.update_strategy_stats("better_strategy", True, 1.0)
 
-        # Проверяем, что новая стратегия имеет более высокий приоритет
-        best_strategy = handler.selector.get_best_strategy("cloudflare")
-        assert best_strategy == "better_strategy"
+    # Проверяем, что новая стратегия имеет более высокий приоритет
+    best_strategy = handler.selector.get_best_strategy("cloudflare")
+    assert best_strategy == "better_strategy"
 
 
-def test_duplicate_strategy_prevention():
+def test_duplicate_strategy_prevention(handler):
     """Проверяет предотвращение дублирования стратегий."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
-
-        # Создаем начальную стратегию
-        initial_strategy = {
-            "name": "test_strategy",
-            "protection_type": "cloudflare",
-            "steps": [{"action": "wait", "timeout": 5}],
-        }
-        handler.save_strategy(initial_strategy)
-
-        # Пробуем сохранить стратегию с тем же именем
-        updated_strategy = {
-            "name": "test_strategy",
-            "protection_type": "cloudflare",
-            "steps": [{"action": "click", "selector": "#button"}],
-        }
-        handler.save_strategy(updated_strategy)
-
-        # Проверяем, что найдена обновленная версия
-        found = handler.find_strategy("cloudflare")
-        assert found is not None
-        assert found["name"] == "test_strategy"
-        assert len(found["steps"]) == 1
-        assert found["steps"][0]["action"] == "click"
-
-
-def test_strategy_success_rate():
+    # Создаем начальную стратегию
+    initial_strategy = {
+        "name": "test_strategy",
+        "protection_type": "cloudflare",
+        "steps": [{"action": "wait", "timeout": 5}],
+    }
+    handler.save_strategy(initial_strategy)
+
+    # Пробуем сохранить стратегию с тем же именем
+    updated_strategy = {
+        "name": "test_strategy",
+        "protection_type": "cloudflare",
+        "steps": [{"action": "click", "selector": "#button"}],
+    }
+    handler.save_strategy(updated_strategy)
+
+    # Проверяем, что найдена обновленная версия
+    found = handler.find_strategy("cloudflare")
+    assert found is not None
+    assert found["name"] == "test_strategy"
+    assert len(found["steps"]) == 1
+    assert found["steps"][0]["action"] == "click"
+
+
+def test_strategy_success_rate(handler):
     """Проверяет точность подсчета статистики стратегии."""
-    with tempfile.NamedTemporaryFile() as tmp:
-        handler = StrategyHandler(tmp.name)
-
-        # Создаем стратегию
-        strategy = {"name": "test_strategy", "protection_type": "cloudflare", "steps": []}
-        handler.save_strategy(strategy)
-
-        # Добавляем успешные применения
-        success_times = [1.0, 1.5, 2.0]
-        for time in success_times:
-            handler.update_strategy_stats("test_strategy", True, time)
-
-        # Добавляем неудачные применения
-        fail_times = [0.5, 1.0]
-        for time in fail_times:
-            handler.update_strategy_stats("test_strategy", False, time)
-
-        # Получаем статистику
-        stats = handler.selector.get_strategy_stats("test_strategy")
-        assert stats is not None
-        assert stats.success_count == 3
-        assert stats.fail_count == 2
-
-        # Проверяем среднее время (только для успешных применений)
-        expected_avg_time = sum(success_times) / len(success_times)
-        assert abs(stats.avg_time - expected_avg_time) < 0.001
+    # Создаем стратегию
+    strategy = {"name": "test_strategy", "protection_type": "cloudflare", "steps": []}
+    handler.save_strategy(strategy)
+
+    # Добавляем успешные применения
+    success_times = [1.0, 1.5, 2.0]
+    for time in success_times:
+        handler.update_strategy_stats("test_strategy", True, time)
+
+    # Добавляем неудачные применения
+    fail_times = [0.5, 1.0]
+    for time in fail_times:
+        handler.update_strategy_stats("test_strategy", False, time)
+
+    # Получаем статистику
+    stats = handler.selector.get_strategy_stats("test_strategy")
+    assert stats is not None
+    assert stats.success_count == 3
+    assert stats.fail_count == 2
+
+    # Проверяем среднее время (только для успешных применений)
+    expected_avg_time = sum(success_times) / len(success_times)
+    assert abs(stats.avg_time - expected_avg_time) < 0.001
+
+
+def test_save_strategies_bulk_upsert(handler):
+    """Проверяет сохранение пачки стратегий и обновление уже существующих."""
+    handler.save_strategies(
+        [
+            {
+                "strategy_name": "first",
+                "strategy_params": {"delay": 1},
+                "protection_type": "cloudflare",
+            },
+            {
+                "strategy_name": "second",
+                "strategy_params": {"delay": 2},
+                "protection_type": "ddos_guard",
+            },
+        ]
+    )
+    # Повторное сохранение обновляет параметры, а не падает на первичном ключе
+    handler.save_strategy("first", {"delay": 3}, "cloudflare")
+
+    assert sorted(handler.get_strategy_names()) == ["first", "second"]
+    found = handler.find_strategy("cloudflare", "https://example.com")
+    assert found == {"name": "first", "params": {"delay": 3}}
+
+
+def test_update_strategy_stats_bulk_ranks_strategies(handler):
+    """Проверяет, что пачка успехов учитывается в порядке стратегий одним обновлением."""
+    handler.save_strategy("slow", {}, "cloudflare")
+    handler.save_strategy("fast", {}, "cloudflare")
+    handler.update_strategy_stats_bulk("cloudflare_slow", 1)
+    handler.update_strategy_stats_bulk("cloudflare_fast", 3)
+
+    found = handler.find_strategy("cloudflare", "https://example.com")
+    assert found["name"] == "fast"
+
+
+def test_strategies_persist_on_disk(db_path):
+    """Проверяет, что стратегии из файла базы видны новому обработчику."""
+    first = StrategyHandler(db_path)
+    first.save_strategy("persisted", {"delay": 1}, "cloudflare")
+    first.discovery.close()
+    first.engine.dispose()
+
+    second = StrategyHandler(db_path)
+    try:
+        assert second.get_strategy_names() == ["persisted"]
+    finally:
+        second.discovery.close()
+        second.engine.dispose()
@@ -0,0 +1,23 @@
+"""
+Тесты для модуля train_predictor.py
+"""
+
+import pandas as pd
+from src.train_predictor import prepare_features
+
+
+def test_prepare_features_ignores_missing_keywords():
+    """Тест строк без ключевых слов: пустой токен не становится признаком has_."""
+    df = pd.DataFrame(
+        {
+            "protection_type": ["cloudflare", "captcha", "cloudflare"],
+            "html_title_keywords": ["shop,login", None, ""],
+            "strategy_name": ["solve_with_playwright", "solve_with_proxy", "solve_with_playwright"],
+        }
+    )
+
+    X, y, _ = prepare_features(df)
+
+    assert sorted(X.columns) == ["has_login", "has_shop", "protection_type"]
+    assert X["has_shop"].tolist() == [1, 0, 0]
+    assert y.tolist() == df["strategy_name"].tolist()